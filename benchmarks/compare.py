@@ -0,0 +1,74 @@
+"""Compares benchmark results with a stored baseline, and reports the metrics that got worse by more than a tolerance.
+
+Results are JSON files written by run_benchmarks, whose "results" map a benchmark name (like
+"default_instance/twituser/128") to its metrics. Metrics in only one of the files are ignored, so a baseline
+stays usable when benchmarks are added or left out.
+
+Run from the repository root with `python -m benchmarks.compare baseline.json results.json [--tolerance 0.2]`.
+The exit status is 1 if there are any regressions, so this can be used as a check in scripts.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+# Whether a larger value of each metric is better. Metrics not listed here are reported but never compared.
+HIGHER_IS_BETTER = {
+    "load_seconds": False,
+    "rss_mib": False,
+    "rss_increase_mib": False,
+    "p50_us": False,
+    "p99_us": False,
+    "mean_us": False,
+    "texts_per_second": True,
+    "chars_per_second": True,
+}
+DEFAULT_TOLERANCE = 0.2
+
+
+def find_regressions(baseline: Dict, results: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Returns a description of each metric in results that is worse than in baseline by more than the tolerance, as
+    a proportion of the baseline value."""
+    regressions = []
+    for name, metrics in sorted(results["results"].items()):
+        baseline_metrics = baseline["results"].get(name, {})
+        for metric, value in sorted(metrics.items()):
+            baseline_value = baseline_metrics.get(metric)
+            if metric not in HIGHER_IS_BETTER or value is None or not baseline_value:
+                continue
+            change = (value - baseline_value) / baseline_value
+            if (-change if HIGHER_IS_BETTER[metric] else change) > tolerance:
+                regressions.append(f"{name} {metric}: {baseline_value:0.4g} -> {value:0.4g} ({change:+0.1%})")
+    return regressions
+
+
+def report_regressions(baseline: Dict, results: Dict, tolerance: float = DEFAULT_TOLERANCE) -> bool:
+    """Prints any regressions, and returns True if there were none."""
+    regressions = find_regressions(baseline, results, tolerance)
+    if regressions:
+        print(f"Metrics that got worse by more than {tolerance:0.0%} against the baseline:")
+        for regression in regressions:
+            print(f"\t{regression}")
+    else:
+        print(f"No regressions of more than {tolerance:0.0%} against the baseline.")
+    return not regressions
+
+
+def read_results(path: str) -> Dict:
+    with open(path, encoding="utf-8") as results_file:
+        return json.load(results_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline", help="Results file to compare against.")
+    parser.add_argument("results", help="Results file to check.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Largest change for the worse that is not a regression, as a proportion of the baseline.")
+    args = parser.parse_args()
+    if not report_regressions(read_results(args.baseline), read_results(args.results), args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
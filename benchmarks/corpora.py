@@ -0,0 +1,83 @@
+"""Corpora of texts at several message lengths for the benchmarks, built offline from data in the repository.
+
+- synthetic: texts made of terms sampled from a classifier's own term tables, one language per text, with each term
+  chosen with probability proportional to 1 / rank, so that common words appear about as often as in real text.
+- twituser: texts from the twituser data in experiments/twituser_data, cut or joined to each length. Short lengths
+  keep the start of single messages, and long lengths join messages in the same language.
+
+Texts are cut at the last space before the length where there is one, so lengths are approximate. Both corpora are
+seeded, so the same texts are built on every run, which keeps results comparable with a stored baseline.
+"""
+import itertools
+import json
+import os
+import random
+from collections import defaultdict
+from typing import Dict, List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TWITUSER_DATA = os.path.join(REPO_DIR, "experiments", "twituser_data", "twituser")
+
+# Message lengths in characters: a short reply, a typical message, a paragraph, and a short document.
+MESSAGE_LENGTHS = (16, 128, 1024, 8192)
+CORPUS_NAMES = ("synthetic", "twituser")
+# Only this many of the top ranked terms for each language are sampled by the synthetic corpus.
+MAX_SAMPLED_RANK = 2000
+
+
+def cut_to_length(text: str, length: int) -> str:
+    """Returns the text cut to at most length chars, at the last space before that if there is one."""
+    if len(text) <= length:
+        return text
+    cut = text.rfind(" ", 0, length + 1)
+    return text[:cut] if cut > 0 else text[:length]
+
+
+def synthetic_corpus(term_ranks: Dict[str, Dict[str, int]], length: int, num_texts: int,
+                     seed: int = 0) -> List[str]:
+    """Returns num_texts texts of about length chars, cycling through the languages in term_ranks."""
+    rng = random.Random(seed)
+    languages = sorted(term_ranks)
+    sampled_terms = {}
+    for lang in languages:
+        ranked = sorted((rank, term) for term, rank in term_ranks[lang].items() if rank <= MAX_SAMPLED_RANK)
+        sampled_terms[lang] = ([term for _, term in ranked],
+                               list(itertools.accumulate(1 / rank for rank, _ in ranked)))
+    texts = []
+    for lang in itertools.islice(itertools.cycle(languages), num_texts):
+        terms, cum_weights = sampled_terms[lang]
+        words: List[str] = []
+        text_length = -1
+        while terms and text_length < length:
+            words.extend(rng.choices(terms, cum_weights=cum_weights, k=8))
+            text_length = sum(len(word) + 1 for word in words) - 1
+        texts.append(cut_to_length(" ".join(words), length))
+    return texts
+
+
+def twituser_corpus(length: int, num_texts: int, seed: int = 0) -> List[str]:
+    """Returns num_texts texts of about length chars made from the twituser messages."""
+    texts_by_lang = defaultdict(list)
+    with open(TWITUSER_DATA, encoding="utf-8") as twituser_data:
+        for line in twituser_data:
+            record = json.loads(line)
+            texts_by_lang[record["lang"]].append(record["text"])
+    rng = random.Random(seed)
+    languages = sorted(texts_by_lang)
+    texts = []
+    while len(texts) < num_texts:
+        messages = texts_by_lang[rng.choice(languages)]
+        text = rng.choice(messages)
+        while len(text) < length:
+            text += "\n" + rng.choice(messages)
+        texts.append(cut_to_length(text, length))
+    return texts
+
+
+def build_corpus(name: str, term_ranks: Dict[str, Dict[str, int]], length: int, num_texts: int) -> List[str]:
+    """Returns the texts of the named corpus at the given length."""
+    if name == "synthetic":
+        return synthetic_corpus(term_ranks, length, num_texts)
+    if name == "twituser":
+        return twituser_corpus(length, num_texts)
+    raise ValueError(f"Unknown corpus: {name}. Choose from {', '.join(CORPUS_NAMES)}")
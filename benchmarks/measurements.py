@@ -0,0 +1,74 @@
+"""Functions for measuring load time, memory, latency and throughput.
+
+Load time and memory are measured in a fresh Python process for each instance (see load_probe in run_benchmarks),
+since tables loaded earlier in the same process, and memory that the allocator keeps after freeing, would distort
+them. Memory is the resident set size (RSS) of that process, which is what matters for deployment, rather than the
+Python allocations that tracemalloc counts in experiments/memory_report.py.
+"""
+import math
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Returns the resident set size of this process in bytes, or None where it can't be measured.
+
+    On Linux, this is the current RSS. On other Unix systems, it is the peak RSS, which is the same while memory is
+    only growing, as it is when loading a classifier. On Windows, it is None."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    try:
+        # Imported here because the resource module is only available on Unix.
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Returns the given percentile (as a fraction, like 0.99) of sorted values, interpolating between neighbours."""
+    position = (len(sorted_values) - 1) * fraction
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def measure_latency(classify: Callable[[str], object], texts: Sequence[str], repeats: int = 3) -> Dict[str, float]:
+    """Returns the p50, p99 and mean latency in microseconds of single calls to classify.
+
+    Each text is timed separately, after one untimed pass over all the texts to warm up. Each text's latency is its
+    best over the repeats, so that a garbage collection or other process interrupting one call doesn't count as
+    that text being slow."""
+    for text in texts:
+        classify(text)
+    best = [math.inf] * len(texts)
+    perf_counter_ns = time.perf_counter_ns
+    for _ in range(repeats):
+        for i, text in enumerate(texts):
+            start = perf_counter_ns()
+            classify(text)
+            elapsed = perf_counter_ns() - start
+            if elapsed < best[i]:
+                best[i] = elapsed
+    latencies: List[float] = sorted(elapsed / 1000 for elapsed in best)
+    return {"p50_us": percentile(latencies, 0.5), "p99_us": percentile(latencies, 0.99),
+            "mean_us": sum(latencies) / len(latencies)}
+
+
+def measure_throughput(classify_batch: Callable[[List[str]], object], texts: List[str],
+                       repeats: int = 3) -> Dict[str, float]:
+    """Returns the number of texts and chars per second for classifying all the texts in one batch call, using the
+    best time over the repeats."""
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        classify_batch(texts)
+        best = min(best, time.perf_counter() - start)
+    return {"texts_per_second": len(texts) / best, "chars_per_second": sum(len(text) for text in texts) / best}
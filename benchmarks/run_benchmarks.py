@@ -0,0 +1,115 @@
+"""Measures load time, memory, single call latency and batch throughput of the bundled classifiers, and writes the
+results as JSON.
+
+For each instance, this measures:
+- load: the time taken by the instance's constructor and the RSS of a fresh process after loading it.
+- <corpus>/<length>: the p50, p99 and mean latency of get_winner, and the throughput of get_winners, on texts of
+  about each length from each corpus (see corpora).
+
+Run from the repository root with `python -m benchmarks.run_benchmarks`, which needs only the lplangid package and
+the data in this repository, so it can run offline. Use --baseline to compare the results with an earlier results
+file, as benchmarks.compare does, and exit with status 1 if there are regressions. Timings vary between machines,
+so baselines should be made on the machine they are compared on.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict
+
+from benchmarks.compare import DEFAULT_TOLERANCE, read_results, report_regressions
+from benchmarks.corpora import CORPUS_NAMES, MESSAGE_LENGTHS, REPO_DIR, build_corpus
+from benchmarks.measurements import current_rss_bytes, measure_latency, measure_throughput
+from lplangid import language_classifier as lc
+
+INSTANCES = {
+    "default_instance": lc.RRCLanguageClassifier.default_instance,
+    "many_language_bible_instance": lc.RRCLanguageClassifier.many_language_bible_instance,
+}
+DEFAULT_OUTPUT = "benchmark_results.json"
+
+
+def load_probe(instance_name: str):
+    """Loads the instance in this process and prints its load time and memory as JSON. Run by measure_load."""
+    rss_before = current_rss_bytes()
+    start = time.perf_counter()
+    classifier = INSTANCES[instance_name]()
+    load_seconds = time.perf_counter() - start
+    rss_after = current_rss_bytes()
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "rss_mib": rss_after / 2 ** 20 if rss_after is not None else None,
+        "rss_increase_mib": (rss_after - rss_before) / 2 ** 20 if rss_after is not None else None,
+        "languages": len(classifier.term_ranks),
+    }))
+
+
+def measure_load(instance_name: str, repeats: int) -> Dict:
+    """Returns the load metrics for the instance from the fastest of several fresh processes."""
+    probes = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-m", "benchmarks.run_benchmarks", "--load-probe", instance_name],
+                                cwd=REPO_DIR, check=True, capture_output=True, text=True).stdout
+        probes.append(json.loads(output.strip().splitlines()[-1]))
+    return min(probes, key=lambda probe: probe["load_seconds"])
+
+
+def run_benchmarks(args) -> Dict:
+    results = {}
+    for instance_name in args.instances:
+        load_metrics = measure_load(instance_name, args.load_repeats)
+        results[f"{instance_name}/load"] = load_metrics
+        print(f"{instance_name}: loaded in {load_metrics['load_seconds']:0.2f}s, "
+              f"RSS {load_metrics['rss_mib'] or 0:0.1f}MiB")
+        classifier = INSTANCES[instance_name]()
+        for corpus_name in args.corpora:
+            for length in args.lengths:
+                texts = build_corpus(corpus_name, classifier.term_ranks, length, args.texts)
+                metrics = measure_latency(classifier.get_winner, texts, args.repeats)
+                metrics.update(measure_throughput(classifier.get_winners, texts, args.repeats))
+                results[f"{instance_name}/{corpus_name}/{length}"] = metrics
+                print(f"\t{corpus_name:>10} {length:>6} chars: p50 {metrics['p50_us']:9.1f}us, "
+                      f"p99 {metrics['p99_us']:9.1f}us, {metrics['texts_per_second']:9.0f} texts/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--instances", nargs="+", choices=sorted(INSTANCES), default=list(INSTANCES))
+    parser.add_argument("--corpora", nargs="+", choices=CORPUS_NAMES, default=list(CORPUS_NAMES))
+    parser.add_argument("--lengths", nargs="+", type=int, default=list(MESSAGE_LENGTHS),
+                        help="Message lengths in chars.")
+    parser.add_argument("--texts", type=int, default=300, help="Number of texts for each corpus and length.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed passes over each corpus.")
+    parser.add_argument("--load-repeats", type=int, default=3, help="Number of fresh processes to load each instance.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="File to write the results to.")
+    parser.add_argument("--baseline", help="Results file to compare the results with.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Largest change for the worse that is not a regression, as a proportion of the baseline.")
+    parser.add_argument("--load-probe", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.load_probe:
+        load_probe(args.load_probe)
+        return
+
+    results = {
+        "metadata": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {key: value for key, value in vars(args).items()
+                         if key in ("instances", "corpora", "lengths", "texts", "repeats", "load_repeats")},
+        },
+        "results": run_benchmarks(args),
+    }
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Wrote results to {args.output}")
+    if args.baseline and not report_regressions(read_results(args.baseline), results, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Reports accuracy and latency for budgeted classification (RRCLanguageClassifier.set_budget) of long documents.
+
+The documents are made by joining randomly chosen twituser texts in the same language, so each has a known label,
+using only the languages that each classifier supports. For each budget, this prints the accuracy, and the mean and
+worst time per document, so that a budget can be picked that caps worst-case latency without losing much accuracy.
+
+Run from the repository root with `python -m experiments.budget_report`. Only needs the lplangid package itself.
+"""
+import json
+import random
+import time
+from collections import defaultdict
+
+from experiments.scoring_benchmark import TWITUSER_DATA
+from lplangid import language_classifier as lc
+
+CHAR_BUDGETS = [None, 16384, 4096, 1024, 512, 256, 128]
+TOKEN_BUDGETS = [2048, 512, 128, 32]
+
+
+def make_documents(languages, texts_per_document=200, documents_per_language=5, seed=0):
+    """Returns (document, language) pairs for the given languages, each joining texts_per_document texts."""
+    texts_by_lang = defaultdict(list)
+    with open(TWITUSER_DATA, encoding="utf-8") as twituser_data:
+        for line in twituser_data:
+            record = json.loads(line)
+            if record["lang"] in languages:
+                texts_by_lang[record["lang"]].append(record["text"])
+    rng = random.Random(seed)
+    documents = []
+    for lang, texts in sorted(texts_by_lang.items()):
+        for _ in range(documents_per_language):
+            documents.append(("\n".join(rng.choices(texts, k=texts_per_document)), lang))
+    return documents
+
+
+def evaluate(classifier, documents):
+    correct = 0
+    times = []
+    for document, lang in documents:
+        start = time.perf_counter()
+        winner = classifier.get_winner(document)
+        times.append(time.perf_counter() - start)
+        correct += winner == lang
+    return correct / len(documents), sum(times) / len(times), max(times)
+
+
+def report(classifier, name):
+    documents = make_documents(set(classifier.term_ranks))
+    mean_length = sum(len(document) for document, _ in documents) / len(documents)
+    print(f"{name}: {len(documents)} documents with a mean length of {mean_length:0.0f} chars.")
+    budgets = [(max_chars, None) for max_chars in CHAR_BUDGETS] + [(None, max_tokens) for max_tokens in TOKEN_BUDGETS]
+    for max_chars, max_tokens in budgets:
+        classifier.set_budget(max_chars=max_chars, max_tokens=max_tokens)
+        accuracy, mean_time, max_time = evaluate(classifier, documents)
+        budget = f"max_chars={max_chars}" if max_tokens is None else f"max_tokens={max_tokens}"
+        print(f"\t{budget:>16}: accuracy {accuracy:0.3f}, mean time {mean_time * 1e3:6.2f}ms, "
+              f"worst time {max_time * 1e3:6.2f}ms")
+
+
+def main():
+    report(lc.RRCLanguageClassifier.default_instance(), "default_instance")
+    report(lc.RRCLanguageClassifier.many_language_bible_instance(), "many_language_bible_instance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Reports accuracy against the number of languages term scored and latency, for different limits on the char contenders
+that go on to term scoring (RRCLanguageClassifier.set_term_candidates), using the bible test split.
+
+The test split is the directory of per-language text files (named like "en.txt") that bible_eval.py extracts from
+https://github.com/christos-c/bible-corpus into the "test" directory under its BIBLE_TXT_ROOT. For each setting, this
+prints the accuracy, the mean number of languages that were term scored per text (0 when the char scores alone
+decide), and the mean time per text, and can plot accuracy against both, to help choose an operating point.
+
+Run from the repository root with `python -m experiments.candidate_cap_report test_dir [--plot out.png]`.
+Plotting needs matplotlib.
+"""
+import argparse
+import os
+import random
+import time
+
+from lplangid import language_classifier as lc
+
+SETTINGS = ([(None, None)] + [(max_term_candidates, None) for max_term_candidates in [1, 2, 3, 5, 8, 13, 21]]
+            + [(None, max_char_gap) for max_char_gap in [0.01, 0.02, 0.05, 0.1, 0.2]])
+
+
+def load_test_lines(test_dir, languages, lines_per_language=200, seed=0):
+    """Returns (line, language) pairs, sampling up to lines_per_language lines for each of the languages."""
+    rng = random.Random(seed)
+    test_lines = []
+    for filename in sorted(os.listdir(test_dir)):
+        lang = filename.split(".")[0]
+        if lang not in languages:
+            continue
+        with open(os.path.join(test_dir, filename), encoding="utf-8") as test_file:
+            lines = [line.strip() for line in test_file if line.strip()]
+        test_lines.extend((line, lang) for line in rng.sample(lines, min(lines_per_language, len(lines))))
+    return test_lines
+
+
+def evaluate(classifier, test_lines, max_term_candidates, max_char_gap):
+    """Returns the accuracy, mean number of term scored languages, and mean time in seconds for one setting."""
+    classifier.set_term_candidates(max_term_candidates=max_term_candidates, max_char_gap=max_char_gap)
+    start = time.perf_counter()
+    winners = [classifier.get_winner(line) for line, _ in test_lines]
+    mean_time = (time.perf_counter() - start) / len(test_lines)
+    classifier.set_term_candidates()
+
+    term_scored = 0
+    for line, _ in test_lines:
+        if not lc.is_computerese(line):
+            char_scores, _ = lc.score_char_contenders(classifier.char_weights, line,
+                                                      max_term_candidates=max_term_candidates,
+                                                      max_char_gap=max_char_gap)
+            term_scored += len(char_scores) if len(char_scores) > 1 else 0
+    accuracy = sum(winner == lang for winner, (_, lang) in zip(winners, test_lines)) / len(test_lines)
+    return accuracy, term_scored / len(test_lines), mean_time
+
+
+def setting_label(max_term_candidates, max_char_gap):
+    if max_term_candidates is not None:
+        return f"max_term_candidates={max_term_candidates}"
+    if max_char_gap is not None:
+        return f"max_char_gap={max_char_gap}"
+    return "no limit"
+
+
+def plot_results(results, filename):
+    # Imported here because matplotlib is only needed for plotting.
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    figure, (candidates_axes, time_axes) = plt.subplots(1, 2, figsize=(12, 5), sharey=True)
+    for label, accuracy, mean_candidates, mean_time in results:
+        candidates_axes.scatter(mean_candidates, accuracy)
+        candidates_axes.annotate(label, (mean_candidates, accuracy), fontsize=7)
+        time_axes.scatter(mean_time * 1e6, accuracy)
+        time_axes.annotate(label, (mean_time * 1e6, accuracy), fontsize=7)
+    candidates_axes.set_xlabel("Mean languages term scored per text")
+    candidates_axes.set_ylabel("Accuracy")
+    time_axes.set_xlabel("Mean time per text (microseconds)")
+    figure.tight_layout()
+    figure.savefig(filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("test_dir", help="The directory with the bible test split, one file per language.")
+    parser.add_argument("--lines-per-language", type=int, default=200)
+    parser.add_argument("--plot", help="File to save a plot of the results to.")
+    args = parser.parse_args()
+
+    classifier = lc.RRCLanguageClassifier.many_language_bible_instance()
+    test_lines = load_test_lines(args.test_dir, set(classifier.term_ranks), args.lines_per_language)
+    print(f"{len(test_lines)} test lines in {len({lang for _, lang in test_lines})} languages.")
+    results = []
+    for max_term_candidates, max_char_gap in SETTINGS:
+        label = setting_label(max_term_candidates, max_char_gap)
+        accuracy, mean_candidates, mean_time = evaluate(classifier, test_lines, max_term_candidates, max_char_gap)
+        results.append((label, accuracy, mean_candidates, mean_time))
+        print(f"{label:>24}: accuracy {accuracy:0.3f}, mean languages term scored {mean_candidates:5.2f}, "
+              f"mean time {mean_time * 1e6:6.1f}us")
+    if args.plot:
+        plot_results(results, args.plot)
+
+
+if __name__ == "__main__":
+    main()
@@ -60,8 +60,8 @@ def run_tests():
     hg_classifier_xlm = huggingface_client.HuggingfaceLangID(huggingface_client.HUGGINGFACE_XLM_MODEL_PATH)
 
     fn_tags = [
-        [lambda texts: [rrc_bibles.get_winner(text) for text in texts], "RRC bibles"],
-        [lambda texts: [rrc_smallwiki.get_winner(text) for text in texts], "RRC smallwiki"],
+        [rrc_bibles.get_winners, "RRC bibles"],
+        [rrc_smallwiki.get_winners, "RRC smallwiki"],
         [lambda texts: [ft_classifier.predict_lang(text) for text in texts], "FastText"],
         [lambda texts: [langid_classify(text) for text in texts], "LangID"],
         [hg_classifier.predict_lang_batch, "DistilMBert Lang ID"],
@@ -0,0 +1,49 @@
+"""Reports how much memory the scoring tables use in the usual dict layout and in the compact_tables layout.
+
+Run from the repository root with `python -m experiments.memory_report`. Only needs the lplangid package itself.
+Memory is measured with tracemalloc, as the bytes still allocated after building each classifier, so the
+temporary dicts used while building the compact tables are not counted.
+"""
+import gc
+import time
+import tracemalloc
+
+from lplangid import language_classifier as lc
+
+
+def measure(build_classifier):
+    """Returns the classifier built by the given function, the bytes it holds, and the time taken to build it."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    classifier = build_classifier()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return classifier, allocated, elapsed
+
+
+def time_texts(classifier, texts, repeats=200):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for text in texts:
+            classifier.get_winner(text)
+    return (time.perf_counter() - start) / (repeats * len(texts))
+
+
+def main():
+    texts = ["This is English", "Esto es español", "Obrigada, bom dia!", "掃除機が壊れた", "kindly update me once done"]
+    instances = [("default_instance", lc.RRCLanguageClassifier.default_instance),
+                 ("many_language_bible_instance", lc.RRCLanguageClassifier.many_language_bible_instance)]
+    for name, build_instance in instances:
+        print(f"{name}:")
+        for layout, compact in [("dict layout", False), ("compact layout", True)]:
+            classifier, allocated, elapsed = measure(lambda: build_instance(compact=compact))
+            print(f"\t{layout:>15}: {allocated / 2 ** 20:7.1f} MiB. Load time {elapsed:0.2f}s. "
+                  f"Mean time per text {time_texts(classifier, texts) * 1e6:0.1f}us.")
+            del classifier
+
+
+if __name__ == "__main__":
+    main()
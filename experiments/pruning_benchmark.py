@@ -0,0 +1,79 @@
+"""Compares finding the winner with and without branch-and-bound pruning (get_pruned_winner) on long documents, and
+checks that the winners are identical.
+
+Documents are made by joining twituser texts, as in budget_report. Times are for term scoring alone, given the char
+contenders and token counts, since char scoring and tokenizing are the same either way, followed by the time for
+whole documents.
+
+Run from the repository root with `python -m experiments.pruning_benchmark`. Only needs the lplangid package itself.
+"""
+import time
+
+from experiments.budget_report import make_documents
+from lplangid import language_classifier as lc
+
+
+def best_time(fn, repeats=5):
+    """Returns the best time over several repeats for calling fn, and its result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def full_term_winners(classifier, prepared):
+    winners = []
+    for char_scores, term_counts in prepared:
+        if classifier.term_index is None:
+            term_scores = lc.score_language_term_counts(classifier.term_ranks, term_counts, char_scores)
+        else:
+            term_scores = lc.score_term_counts(classifier.term_index, term_counts, tuple(char_scores))
+        winners.append(lc.winner_from_scores(lc.combine_scores(char_scores, term_scores))[0])
+    return winners
+
+
+def pruned_term_winners(classifier, prepared):
+    return [lc.prune_term_scores(classifier.term_ranks, classifier.term_index, term_counts, char_scores)
+            for char_scores, term_counts in prepared]
+
+
+def run_benchmark(classifier: lc.RRCLanguageClassifier, name: str):
+    documents = [document for document, _ in make_documents(set(classifier.term_ranks), texts_per_document=1000,
+                                                            documents_per_language=1)]
+    prepared = []
+    for document in documents:
+        char_scores, term_text = lc.score_char_contenders(classifier.char_weights, document)
+        if len(char_scores) > 1:
+            prepared.append((char_scores, lc.count_terms(term_text)))
+    full_time, full_winners = best_time(lambda: full_term_winners(classifier, prepared))
+    pruned_time, pruned_winners = best_time(lambda: pruned_term_winners(classifier, prepared))
+    if full_winners != pruned_winners:
+        raise ValueError(f"Pruned and full winners differ for the {name} instance.")
+
+    whole_time, whole_winners = best_time(lambda: [classifier.get_winner(document) for document in documents])
+    classifier.enable_pruning()
+    pruned_whole_time, pruned_whole_winners = best_time(lambda: [classifier.get_winner(document)
+                                                                 for document in documents])
+    classifier.disable_pruning()
+    if whole_winners != pruned_whole_winners:
+        raise ValueError(f"Pruned and full winners differ for the {name} instance.")
+
+    mean_contenders = sum(len(char_scores) for char_scores, _ in prepared) / len(prepared)
+    print(f"{name}: {len(prepared)} documents with {mean_contenders:0.1f} contending languages on average.")
+    print(f"\tTerm scoring: full {full_time / len(prepared) * 1e3:0.3f}ms, "
+          f"pruned {pruned_time / len(prepared) * 1e3:0.3f}ms per document.")
+    print(f"\tWhole documents: full {whole_time / len(documents) * 1e3:0.3f}ms, "
+          f"pruned {pruned_whole_time / len(documents) * 1e3:0.3f}ms per document.")
+
+
+def main():
+    run_benchmark(lc.RRCLanguageClassifier.default_instance(), "default_instance")
+    run_benchmark(lc.RRCLanguageClassifier.many_language_bible_instance(), "many_language_bible_instance")
+    run_benchmark(lc.RRCLanguageClassifier.lazy_instance(), "lazy_instance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Compares the speed of scoring with and without the inverted term index, and checks that the scores are identical.
+
+Run from the repository root with `python -m experiments.scoring_benchmark`. Only needs the lplangid package itself.
+"""
+import json
+import os
+import time
+
+from lplangid import language_classifier as lc
+
+TWITUSER_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "twituser_data", "twituser")
+
+
+def load_texts(max_texts=5000):
+    with open(TWITUSER_DATA, encoding="utf-8") as twituser_data:
+        return [json.loads(line)["text"] for line, _ in zip(twituser_data, range(max_texts))]
+
+
+def time_scoring(score_fn, texts, repeats=3):
+    """Returns the best time over several repeats for scoring all the texts, and the results of the last repeat."""
+    best = float("inf")
+    results = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = [score_fn(text) for text in texts]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def run_benchmark(classifier: lc.RRCLanguageClassifier, name: str, texts):
+    unindexed_time, unindexed_results = time_scoring(
+        lambda text: lc.score_text(classifier.term_ranks, classifier.char_weights, text), texts)
+    indexed_time, indexed_results = time_scoring(classifier.get_language_scores, texts)
+    if unindexed_results != indexed_results:
+        raise ValueError(f"Indexed and unindexed scores differ for the {name} instance.")
+    print(f"{name}: {len(texts)} texts. Per-language term lookups: {unindexed_time:0.3f}s. "
+          f"Inverted term index: {indexed_time:0.3f}s. Speedup: {unindexed_time / indexed_time:0.2f}x")
+
+
+def main():
+    texts = load_texts()
+    run_benchmark(lc.RRCLanguageClassifier.default_instance(), "default_instance", texts)
+    run_benchmark(lc.RRCLanguageClassifier.many_language_bible_instance(), "many_language_bible_instance", texts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Compares the speed of tokenize_fast with the original character-by-character tokenizer, for messages of
+different lengths built from the twituser data, and checks that the tokens are identical.
+
+Run from the repository root with `python -m experiments.tokenizer_benchmark`. Only needs the lplangid package itself.
+"""
+import timeit
+
+from experiments.scoring_benchmark import load_texts
+from lplangid.tokenizer import tokenize_fast
+from lplangid.tokenizer_test import reference_tokenize
+
+MESSAGE_LENGTHS = [16, 64, 256, 1024, 4096]
+
+
+def make_messages(texts, length, count=500):
+    """Returns count messages of about the given length, made by joining consecutive texts."""
+    joined = " ".join(texts)
+    step = max(1, (len(joined) - length) // count)
+    return [joined[i:i + length] for i in range(0, step * count, step)]
+
+
+def time_per_message(tokenize_fn, messages, repeats=5):
+    runs = timeit.repeat(lambda: [tokenize_fn(message) for message in messages], number=1, repeat=repeats)
+    return min(runs) / len(messages)
+
+
+def main():
+    texts = load_texts()
+    for length in MESSAGE_LENGTHS:
+        messages = make_messages(texts, length)
+        if [tokenize_fast(message) for message in messages] != [reference_tokenize(message) for message in messages]:
+            raise ValueError(f"Tokens differ for messages of length {length}.")
+        reference_time = time_per_message(reference_tokenize, messages)
+        fast_time = time_per_message(tokenize_fast, messages)
+        print(f"{length:>5} chars: reference {reference_time * 1e6:8.1f}us, tokenize_fast {fast_time * 1e6:8.1f}us. "
+              f"Speedup: {reference_time / fast_time:0.1f}x")
+
+
+if __name__ == "__main__":
+    main()
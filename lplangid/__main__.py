@@ -0,0 +1,3 @@
+from lplangid.cli import main
+
+main()
@@ -0,0 +1,105 @@
+"""An asyncio wrapper for RRCLanguageClassifier that batches concurrent requests and runs them off the event loop.
+
+Requests that arrive within max_delay seconds of each other (or until max_batch_size requests are waiting) are
+coalesced into a single get_language_scores_batch call, which runs in an executor so that long texts don't block
+the event loop. At most max_pending requests are accepted at once; further callers wait until there is room.
+
+Example:
+
+    async_classifier = AsyncRRCClassifier(RRCLanguageClassifier.default_instance())
+    language = await async_classifier.classify("Esto es español")
+"""
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from lplangid import language_classifier as lc
+
+
+class AsyncRRCClassifier:
+    def __init__(self, classifier: lc.RRCLanguageClassifier, max_batch_size: int = 64, max_delay: float = 0.002,
+                 max_pending: int = 10000, executor: Optional[Executor] = None):
+        """
+        :param classifier: the classifier that does the work. It is shared by all batches.
+        :param max_batch_size: a batch is sent as soon as this many requests are waiting.
+        :param max_delay: otherwise a batch is sent this many seconds after its first request arrived.
+        :param max_pending: the most requests that can be queued or running at once, for backpressure.
+        :param executor: where batches run. Defaults to a single worker thread owned by this object. An executor
+            passed in is not shut down by close().
+        """
+        if max_batch_size < 1 or max_pending < 1:
+            raise ValueError("max_batch_size and max_pending must be positive")
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="lplangid")
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._running: set = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.batches_run = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def get_language_scores(self, text: str) -> List[Tuple[str, float]]:
+        """Returns the (language code, score) list for the text, as RRCLanguageClassifier.get_language_scores."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            future = asyncio.get_running_loop().create_future()
+            self._pending.append((text, future))
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+            return await future
+
+    async def classify(self, text: str) -> Optional[str]:
+        """Returns the winning language for the text, or None, as RRCLanguageClassifier.get_winner."""
+        return lc.winner_from_scores(await self.get_language_scores(text))[0]
+
+    async def classify_score(self, text: str) -> Tuple[Optional[str], float]:
+        """Returns the winning language for the text and its score, as RRCLanguageClassifier.get_winner_score."""
+        return lc.winner_from_scores(await self.get_language_scores(text))
+
+    def _flush(self):
+        """Sends the waiting requests to the executor as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.classifier.get_language_scores_batch, texts)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        self.batches_run += 1
+        for (_, future), result in zip(batch, results):
+            # Callers that were cancelled while waiting have already given up on their result.
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """Sends any waiting requests, waits for all batches to finish, and shuts down the executor if it is ours."""
+        self._flush()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
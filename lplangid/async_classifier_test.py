@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from lplangid import language_classifier as lc
+from lplangid.async_classifier import AsyncRRCClassifier
+from lplangid.language_classifier_test import TEST_TEXTS
+
+CLASSIFIER = lc.RRCLanguageClassifier.default_instance()
+
+
+def test_concurrent_requests_are_batched():
+    async def run():
+        async with AsyncRRCClassifier(CLASSIFIER, max_batch_size=10, max_delay=0.05) as async_classifier:
+            winners = await asyncio.gather(*[async_classifier.classify(text) for text, _ in TEST_TEXTS])
+            return winners, async_classifier.batches_run
+
+    winners, batches_run = asyncio.run(run())
+    assert winners == [expected for _, expected in TEST_TEXTS]
+    assert batches_run == -(-len(TEST_TEXTS) // 10)
+
+
+def test_single_request_is_sent_after_delay():
+    async def run():
+        async with AsyncRRCClassifier(CLASSIFIER, max_batch_size=100, max_delay=0.001) as async_classifier:
+            return await async_classifier.classify_score("Esto es español")
+
+    assert asyncio.run(run()) == CLASSIFIER.get_winner_score("Esto es español")
+
+
+def test_backpressure_limits_pending_requests():
+    async def run():
+        async_classifier = AsyncRRCClassifier(CLASSIFIER, max_batch_size=100, max_delay=0.01, max_pending=3)
+        results = await asyncio.gather(*[async_classifier.classify("Gracias") for _ in range(10)])
+        await async_classifier.close()
+        return results, async_classifier.batches_run
+
+    results, batches_run = asyncio.run(run())
+    assert results == ["es"] * 10
+    assert batches_run >= 4
+
+
+def test_errors_are_passed_to_callers():
+    async def run():
+        async with AsyncRRCClassifier(CLASSIFIER) as async_classifier:
+            await async_classifier.classify(None)
+
+    with pytest.raises(AttributeError):
+        asyncio.run(run())
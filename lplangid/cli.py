@@ -0,0 +1,156 @@
+"""Command line tool for classifying lines of text or JSONL records from files or standard input.
+
+Examples:
+
+    python -m lplangid messages.txt.gz
+    zcat logs.jsonl.gz | lplangid --jsonl --text-field body --model bible --workers 8 -o languages.tsv
+
+Each input line produces one output line with the winning language (empty if there is none), its score, and its
+margin over the second best language. Input is read and written in batches, so memory use does not grow with
+the size of the input. Gzip and bzip2 input is detected automatically.
+"""
+import argparse
+import bz2
+import gzip
+import io
+import itertools
+import json
+import logging
+import re
+import sys
+from typing import BinaryIO, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from lplangid import language_classifier as lc
+
+GZIP_MAGIC = b"\x1f\x8b"
+BZIP2_MAGIC = b"BZh"
+MODELS = {"default": lc.RRCLanguageClassifier.default_instance,
+          "bible": lc.RRCLanguageClassifier.many_language_bible_instance}
+# Tabs, and the characters that str.splitlines treats as line breaks, are replaced by spaces in TSV text fields, so
+# that each output line still matches an input line when JSONL texts contain newlines.
+_TSV_BREAKS_REGEX = re.compile(r"[\t\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+
+
+class _SourceClosingMixin:
+    """Closes the file that a GzipFile or BZ2File reads from when it is closed itself, as they only do for files
+    that they opened from a filename."""
+    _source: BinaryIO
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._source.close()
+
+
+class _SourceClosingGzipFile(_SourceClosingMixin, gzip.GzipFile):
+    def __init__(self, source: BinaryIO):
+        super().__init__(fileobj=source)
+        self._source = source
+
+
+class _SourceClosingBZ2File(_SourceClosingMixin, bz2.BZ2File):
+    def __init__(self, source: BinaryIO):
+        super().__init__(source)
+        self._source = source
+
+
+def open_binary_input(path: str) -> BinaryIO:
+    """Opens a file (or stdin for '-') for reading bytes, decompressing gzip or bzip2 content if it finds any.
+    Closing the returned file closes the file it reads from, unless that is stdin, which is left open."""
+    raw = sys.stdin.buffer if path == "-" else open(path, "rb")
+    buffered = raw if isinstance(raw, io.BufferedReader) else io.BufferedReader(raw)
+    magic = buffered.peek(3)[:3]
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=buffered) if path == "-" else _SourceClosingGzipFile(buffered)
+    if magic.startswith(BZIP2_MAGIC):
+        return bz2.BZ2File(buffered) if path == "-" else _SourceClosingBZ2File(buffered)
+    return buffered
+
+
+def read_lines(paths: List[str]) -> Iterator[str]:
+    """Yields the lines of each of the input files in turn, without line endings."""
+    for path in paths:
+        lines = io.TextIOWrapper(open_binary_input(path), encoding="utf-8", errors="replace")
+        try:
+            for line in lines:
+                yield line.rstrip("\r\n")
+        finally:
+            if path == "-":
+                # Detaching rather than closing the wrapper leaves stdin open for the rest of the process. Closing a
+                # decompressor opened for stdin doesn't close stdin either.
+                binary = lines.detach()
+                if binary is not sys.stdin.buffer:
+                    binary.close()
+            else:
+                lines.close()
+
+
+def texts_from_jsonl(lines: Iterator[str], text_field: str) -> Iterator[str]:
+    """Yields the text field of each JSON record. Lines that aren't records with this field give empty texts,
+    so that output lines still match input lines."""
+    for line_number, line in enumerate(lines, start=1):
+        try:
+            text = json.loads(line)[text_field]
+        except (ValueError, KeyError, TypeError):
+            logging.warning(f"Line {line_number} is not a JSON record with a '{text_field}' field.")
+            text = ""
+        yield text if isinstance(text, str) else ""
+
+
+def write_results(texts: Iterable[str], all_scores: Iterable[List[Tuple[str, float]]], output: TextIO,
+                  output_format: str, include_text: bool):
+    """Writes the winning language, score and margin for each text, as tab-separated values or JSON records."""
+    for text, scores in zip(texts, all_scores):
+        winner, score = lc.winner_from_scores(scores)
+        _, margin = lc.winner_margin_from_scores(scores)
+        if output_format == "jsonl":
+            record = {"lang": winner, "score": score, "margin": margin}
+            if include_text:
+                record["text"] = text
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            fields = [winner or "", f"{score:.6f}", f"{margin:.6f}"]
+            if include_text:
+                fields.append(_TSV_BREAKS_REGEX.sub(" ", text))
+            output.write("\t".join(fields) + "\n")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="lplangid", description="Classify the language of each line of input.")
+    parser.add_argument("inputs", nargs="*", default=["-"],
+                        help="Input files, which may be gzip or bzip2 compressed. Defaults to standard input ('-').")
+    parser.add_argument("-o", "--output", default="-", help="Output file. Defaults to standard output.")
+    parser.add_argument("--jsonl", action="store_true", help="Read JSON records, one per line, instead of text.")
+    parser.add_argument("--text-field", default="text", help="The field holding the text in JSONL records.")
+    parser.add_argument("--model", choices=sorted(MODELS), default="default",
+                        help="Which bundled model to use: 'default' (24 languages) or 'bible' (103 languages).")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Number of lines classified at a time.")
+    parser.add_argument("--output-format", choices=["tsv", "jsonl"], default="tsv")
+    parser.add_argument("--include-text", action="store_true", help="Add the input text to each output line.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    classifier = MODELS[args.model]()
+
+    lines = read_lines(args.inputs)
+    texts = texts_from_jsonl(lines, args.text_field) if args.jsonl else lines
+    # The texts are needed again for output. The tee only buffers the texts that are still being classified,
+    # because classify_parallel limits how many batches are in flight.
+    texts_to_classify, texts_to_write = itertools.tee(texts)
+    all_scores = classifier.classify_parallel(texts_to_classify, workers=args.workers, chunksize=args.batch_size,
+                                              method="get_language_scores_batch")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        write_results(texts_to_write, all_scores, output, args.output_format, args.include_text)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import bz2
+import gc
+import gzip
+import io
+import json
+import warnings
+
+from lplangid import cli
+
+
+def test_cli_reads_compressed_text_files(tmp_path):
+    with gzip.open(tmp_path / "one.txt.gz", "wt", encoding="utf-8") as gz_file:
+        gz_file.write("This is English\n123\n")
+    with bz2.open(tmp_path / "two.txt", "wt", encoding="utf-8") as bz2_file:
+        bz2_file.write("Esto es español\n")
+    out_file = tmp_path / "out.tsv"
+    cli.main([str(tmp_path / "one.txt.gz"), str(tmp_path / "two.txt"), "-o", str(out_file), "--include-text"])
+
+    rows = [line.split("\t") for line in out_file.read_text(encoding="utf-8").splitlines()]
+    assert [row[0] for row in rows] == ["en", "", "es"]
+    assert [row[3] for row in rows] == ["This is English", "123", "Esto es español"]
+    assert float(rows[0][1]) >= float(rows[0][2]) > 0
+
+
+def test_cli_jsonl_with_workers(tmp_path):
+    in_file = tmp_path / "in.jsonl"
+    records = [{"body": "Gracias"}, {"other": "no body"}, {"body": "Obrigada, bom dia!"}] * 3
+    in_file.write_text("\n".join(json.dumps(record) for record in records) + "\nnot json\n", encoding="utf-8")
+    out_file = tmp_path / "out.jsonl"
+    cli.main([str(in_file), "-o", str(out_file), "--jsonl", "--text-field", "body", "--output-format", "jsonl",
+              "--workers", "2", "--batch-size", "2"])
+
+    results = [json.loads(line) for line in out_file.read_text(encoding="utf-8").splitlines()]
+    assert [result["lang"] for result in results] == ["es", None, "pt"] * 3 + [None]
+
+
+def test_cli_tsv_text_keeps_one_line_per_record(tmp_path):
+    in_file = tmp_path / "in.jsonl"
+    in_file.write_text(json.dumps({"text": "Hola amigos\nque tal\r\nmuy\tbien gracias"}) + "\n", encoding="utf-8")
+    out_file = tmp_path / "out.tsv"
+    cli.main([str(in_file), "-o", str(out_file), "--jsonl", "--include-text"])
+
+    lines = out_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    assert lines[0].split("\t")[3] == "Hola amigos que tal  muy bien gracias"
+
+
+def test_compressed_inputs_are_closed(tmp_path):
+    with gzip.open(tmp_path / "one.txt.gz", "wt", encoding="utf-8") as gz_file:
+        gz_file.write("uno\n")
+    with bz2.open(tmp_path / "two.txt.bz2", "wt", encoding="utf-8") as bz2_file:
+        bz2_file.write("dos\n")
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+        assert list(cli.read_lines([str(tmp_path / "one.txt.gz"), str(tmp_path / "two.txt.bz2")])) == ["uno", "dos"]
+        gc.collect()
+    assert not [warning for warning in caught if issubclass(warning.category, ResourceWarning)]
+
+
+def test_stdin_is_left_open(monkeypatch):
+    for data in [b"uno\ndos\n", gzip.compress(b"uno\ndos\n"), bz2.compress(b"uno\ndos\n")]:
+        stdin = io.TextIOWrapper(io.BufferedReader(io.BytesIO(data)), encoding="utf-8")
+        monkeypatch.setattr(cli.sys, "stdin", stdin)
+        assert list(cli.read_lines(["-"])) == ["uno", "dos"]
+        gc.collect()
+        assert not stdin.closed and not stdin.buffer.closed
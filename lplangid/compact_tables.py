@@ -0,0 +1,190 @@
+"""Compact, array-backed versions of the term_ranks and char_weights tables.
+
+The usual tables are dictionaries of dictionaries and lists of tuples, with a Python string, int or float object
+for every entry. Here languages become small integer ids, each term is stored once in a single term -> id dictionary
+shared by all languages, and ranks and weights are kept in typed arrays (ranks as unsigned ints and char weights as
+float32), laid out so that all the (language, rank) postings for a term are next to each other.
+
+The classes below are read-only Mappings with the same shape as the usual tables, so they can be passed straight to
+RRCLanguageClassifier. Term scores are exactly the same as with the usual tables. Char weights are rounded to float32,
+which changes scores by about one part in ten million.
+
+To get a compact classifier, use RRCLanguageClassifier.default_instance(compact=True), or:
+
+    term_ranks, char_weights = compact_tables.compact_scoring_tables(*prepare_scoring_tables())
+"""
+import abc
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from lplangid import language_classifier as lc
+
+
+def _smallest_unsigned_typecode(max_value: int) -> str:
+    return "H" if max_value < 2 ** 16 else "I"
+
+
+class _LanguageTermRanks(Mapping):
+    """A read-only term -> rank mapping for one language, looked up from the shared postings arrays."""
+    def __init__(self, tables: "PostingsTermRanks", lang_id: int):
+        self._tables = tables
+        self._lang_id = lang_id
+
+    def __getitem__(self, term: str) -> int:
+        tables = self._tables
+        term_id = tables.term_id(term)
+        if term_id is not None:
+            for i in range(tables.term_offsets[term_id], tables.term_offsets[term_id + 1]):
+                if tables.posting_langs[i] == self._lang_id:
+                    return tables.posting_ranks[i]
+        raise KeyError(term)
+
+    def __len__(self) -> int:
+        return self._tables.terms_per_language[self._lang_id]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over this language's terms. This walks all the postings, so it is slow."""
+        tables = self._tables
+        for term, term_id in tables.term_ids_items():
+            if self._lang_id in tables.posting_langs[tables.term_offsets[term_id]:tables.term_offsets[term_id + 1]]:
+                yield term
+
+
+class _CompactTermIndex:
+    """Provides the get method that score_term_counts uses on the term index built by invert_term_tables."""
+    def __init__(self, tables: "PostingsTermRanks"):
+        self._tables = tables
+        # Weights are shared float objects computed with term_weight, so term scores are exactly the same.
+        self._weights_by_rank = [lc.term_weight(rank) for rank in range(tables.max_rank + 1)]
+
+    def get(self, term: str, default=()) -> Tuple[Tuple[str, float], ...]:
+        tables = self._tables
+        term_id = tables.term_id(term)
+        if term_id is None:
+            return default
+        start, end = tables.term_offsets[term_id], tables.term_offsets[term_id + 1]
+        return tuple((tables.languages[lang_id], self._weights_by_rank[rank])
+                     for lang_id, rank in zip(tables.posting_langs[start:end], tables.posting_ranks[start:end]))
+
+
+class PostingsTermRanks(Mapping, abc.ABC):
+    """Base class for read-only language -> term -> rank mappings backed by postings arrays.
+
+    Subclasses set languages, term_offsets, posting_langs, posting_ranks, max_rank and terms_per_language, call
+    _init_views, and implement term_id and term_ids_items. The postings for the term with id i are at positions
+    term_offsets[i] to term_offsets[i + 1] of posting_langs and posting_ranks.
+    """
+    languages: List[str]
+    max_rank: int
+
+    def _init_views(self):
+        self._views = [_LanguageTermRanks(self, lang_id) for lang_id in range(len(self.languages))]
+        self._language_ids = {lang: lang_id for lang_id, lang in enumerate(self.languages)}
+
+    @abc.abstractmethod
+    def term_id(self, term: str) -> Optional[int]:
+        """Returns the id of the term, or None if no language has this term."""
+
+    @abc.abstractmethod
+    def term_ids_items(self) -> Iterator[Tuple[str, int]]:
+        """Iterates over (term, term id) pairs."""
+
+    def __getitem__(self, lang: str) -> _LanguageTermRanks:
+        return self._views[self._language_ids[lang]]
+
+    def __len__(self) -> int:
+        return len(self.languages)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.languages)
+
+    def term_index(self) -> _CompactTermIndex:
+        """Returns a term index for score_term_counts that reads from these arrays, instead of building a new one."""
+        return _CompactTermIndex(self)
+
+
+class CompactTermRanks(PostingsTermRanks):
+    """A read-only language -> term -> rank mapping backed by a shared term dictionary and typed postings arrays."""
+    def __init__(self, term_ranks: Dict[str, Dict[str, int]]):
+        self.languages: List[str] = sorted(term_ranks)
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for lang_id, lang in enumerate(self.languages):
+            for term, rank in term_ranks[lang].items():
+                if term not in postings:
+                    postings[term] = []
+                postings[term].append((lang_id, rank))
+
+        self.term_ids: Dict[str, int] = {}
+        self.term_offsets = array("I", [0])
+        self.posting_langs = array(_smallest_unsigned_typecode(len(self.languages)))
+        self.max_rank = max((rank for ranks in term_ranks.values() for rank in ranks.values()), default=0)
+        self.posting_ranks = array(_smallest_unsigned_typecode(self.max_rank))
+        for term_id, (term, term_postings) in enumerate(postings.items()):
+            self.term_ids[term] = term_id
+            self.posting_langs.extend(lang_id for lang_id, _ in term_postings)
+            self.posting_ranks.extend(rank for _, rank in term_postings)
+            self.term_offsets.append(len(self.posting_langs))
+        self.terms_per_language = array("I", [len(term_ranks[lang]) for lang in self.languages])
+        self._init_views()
+
+    def term_id(self, term: str) -> Optional[int]:
+        return self.term_ids.get(term)
+
+    def term_ids_items(self) -> Iterator[Tuple[str, int]]:
+        return iter(self.term_ids.items())
+
+
+class PostingsCharWeights(Mapping, abc.ABC):
+    """Base class for read-only char -> list of (language, weight) mappings backed by postings arrays.
+
+    Subclasses set languages, char_offsets, posting_langs and posting_weights, and implement char_id, __len__ and
+    __iter__.
+    """
+    languages: List[str]
+
+    @abc.abstractmethod
+    def char_id(self, char: str) -> Optional[int]:
+        """Returns the id of the char, or None if no language has this char."""
+
+    def __getitem__(self, char: str) -> List[Tuple[str, float]]:
+        char_id = self.char_id(char)
+        if char_id is None:
+            raise KeyError(char)
+        start, end = self.char_offsets[char_id], self.char_offsets[char_id + 1]
+        return [(self.languages[lang_id], weight)
+                for lang_id, weight in zip(self.posting_langs[start:end], self.posting_weights[start:end])]
+
+    def __contains__(self, char) -> bool:
+        return self.char_id(char) is not None
+
+
+class CompactCharWeights(PostingsCharWeights):
+    """A read-only char -> list of (language, weight) mapping backed by typed arrays, with float32 weights."""
+    def __init__(self, char_weights: Dict[str, List[Tuple[str, float]]]):
+        self.languages: List[str] = sorted({lang for lang_weights in char_weights.values() for lang, _ in lang_weights})
+        language_ids = {lang: lang_id for lang_id, lang in enumerate(self.languages)}
+        self.char_ids: Dict[str, int] = {}
+        self.char_offsets = array("I", [0])
+        self.posting_langs = array(_smallest_unsigned_typecode(len(self.languages)))
+        self.posting_weights = array("f")
+        for char_id, (char, lang_weights) in enumerate(char_weights.items()):
+            self.char_ids[char] = char_id
+            self.posting_langs.extend(language_ids[lang] for lang, _ in lang_weights)
+            self.posting_weights.extend(weight for _, weight in lang_weights)
+            self.char_offsets.append(len(self.posting_langs))
+
+    def char_id(self, char: str) -> Optional[int]:
+        return self.char_ids.get(char)
+
+    def __len__(self) -> int:
+        return len(self.char_ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.char_ids)
+
+
+def compact_scoring_tables(term_ranks: Dict[str, Dict[str, int]], char_weights: Dict[str, List[Tuple[str, float]]]
+                           ) -> Tuple[CompactTermRanks, CompactCharWeights]:
+    """Converts tables from prepare_scoring_tables to their compact equivalents."""
+    return CompactTermRanks(term_ranks), CompactCharWeights(char_weights)
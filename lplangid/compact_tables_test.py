@@ -0,0 +1,59 @@
+import pytest
+
+from lplangid import compact_tables, language_classifier as lc
+from lplangid.language_classifier_test import ALL_CHAR_WEIGHTS, ALL_TERM_RANKS, TEST_TEXTS
+
+COMPACT_TERM_RANKS, COMPACT_CHAR_WEIGHTS = compact_tables.compact_scoring_tables(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS)
+
+
+def test_compact_term_ranks_lookups():
+    assert sorted(COMPACT_TERM_RANKS) == sorted(ALL_TERM_RANKS)
+    for lang in ["en", "es", "zh"]:
+        assert len(COMPACT_TERM_RANKS[lang]) == len(ALL_TERM_RANKS[lang])
+        for term in ["the", "de", "gracias", "你好", "not a term"]:
+            assert COMPACT_TERM_RANKS[lang].get(term) == ALL_TERM_RANKS[lang].get(term)
+            assert (term in COMPACT_TERM_RANKS[lang]) == (term in ALL_TERM_RANKS[lang])
+    assert set(COMPACT_TERM_RANKS["ko"]) == set(ALL_TERM_RANKS["ko"])
+
+
+def test_compact_term_index_matches_inverted_tables():
+    term_index = lc.invert_term_tables(ALL_TERM_RANKS)
+    compact_index = lc.build_term_index(COMPACT_TERM_RANKS)
+    for term in ["the", "no", "gracias", "本", "not a term"]:
+        assert sorted(compact_index.get(term, ())) == sorted(term_index.get(term, ()))
+
+
+def test_compact_char_weights_are_float32_rounded():
+    assert len(COMPACT_CHAR_WEIGHTS) == len(ALL_CHAR_WEIGHTS)
+    assert "ᵔ" not in COMPACT_CHAR_WEIGHTS
+    for char in ["e", "ñ", "本"]:
+        assert [lang for lang, _ in COMPACT_CHAR_WEIGHTS[char]] == [lang for lang, _ in ALL_CHAR_WEIGHTS[char]]
+        assert ([weight for _, weight in COMPACT_CHAR_WEIGHTS[char]]
+                == pytest.approx([weight for _, weight in ALL_CHAR_WEIGHTS[char]], rel=1e-6))
+
+
+def test_compact_classifier_cases():
+    classifier = lc.RRCLanguageClassifier(COMPACT_TERM_RANKS, COMPACT_CHAR_WEIGHTS)
+    for text, expected in TEST_TEXTS:
+        assert classifier.get_winner(text) == expected
+        scores = classifier.get_language_scores(text)
+        expected_scores = lc.score_text(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS, text)
+        assert [lang for lang, _ in scores] == [lang for lang, _ in expected_scores]
+        assert [score for _, score in scores] == pytest.approx([score for _, score in expected_scores], rel=1e-5)
+
+
+def test_postings_bases_are_abstract():
+    class NoTermIds(compact_tables.PostingsTermRanks):
+        def term_id(self, term):
+            return None
+
+    class NoCharIds(compact_tables.PostingsCharWeights):
+        def __len__(self):
+            return 0
+
+        def __iter__(self):
+            return iter(())
+
+    for incomplete in [compact_tables.PostingsTermRanks, compact_tables.PostingsCharWeights, NoTermIds, NoCharIds]:
+        with pytest.raises(TypeError, match="abstract"):
+            incomplete()
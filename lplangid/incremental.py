@@ -0,0 +1,208 @@
+"""Scores long texts a chunk at a time, and says when the winner is settled so that callers can stop reading.
+
+An IncrementalScorer keeps running char and term score totals for every language, so each chunk costs about the same
+however much text came before it. Text is only scored up to the last whitespace seen (and not from an unclosed "<",
+which might start an HTML tag), so that tokens and tags split across chunks are counted exactly as if the whole text
+had been given at once. The rest is held back until more text arrives or finish is called.
+
+So that long inputs without whitespace (such as most Chinese and Japanese) or with a stray "<" (as in "x < y" or
+"<3") are still scored as they arrive, the held back text is limited. Once more than MAX_HELD_BACK_CHARS are held
+back, they are scored even if that splits a token, and a "<" that is not closed within MAX_TAG_CHARS is scored as
+text rather than waiting for its ">". Only these long inputs can score differently from the whole text. Each chunk
+is only searched for whitespace once, so the cost of each chunk stays the same however much text is held back.
+
+Each chunk is checked against the classifier's prefilter as it arrives (see prefilter.StreamCheck), and a text that
+the prefilter rejects is final at once, with no scores. The min_length and min_alpha_ratio rules need the whole text,
+so they are checked on the text so far when the result becomes final, or at the end of the input.
+
+After each chunk, the scorer checks whether the winner's margin over the second best language (as computed by
+get_winner_margin) is safe, once at least min_tokens tokens have been scored. Scores are products of two normalized
+distributions over the contending languages, so for languages with similar scripts, margins are small (often 0.01 to
+0.03) even for long texts. The default rule therefore asks for a margin of at least min_relative_margin times the
+winner's score, that is, for the second best language to score at most 60% of the winner's score. An absolute
+min_margin can be set as well. Once the rule is met, is_final is set and stays set, and callers can stop feeding text.
+
+The scores at any point are the same as score_text would give for the text scored so far, apart from rounding in the
+last few bits, because the totals are added up in a different order.
+
+Example:
+
+    scorer = IncrementalScorer(RRCLanguageClassifier.default_instance())
+    with open("transcript.txt", "rb") as transcript:
+        scorer.feed_file(transcript)
+    language = scorer.get_winner()
+"""
+import codecs
+import re
+from collections import Counter
+from typing import BinaryIO, Dict, List, Optional, TextIO, Tuple, Union
+
+from lplangid import language_classifier as lc
+
+# Matches the whitespace character that ends the text that can be scored, and the non-whitespace text after it.
+_LAST_WHITESPACE_REGEX = re.compile(r"\s\S*\Z")
+# Held back text is scored once it is longer than this, even if it has no whitespace to cut at.
+MAX_HELD_BACK_CHARS = 1024
+# A "<" that is further than this from the end of the scorable text without a ">" is not treated as starting a tag.
+MAX_TAG_CHARS = 1024
+
+
+class IncrementalScorer:
+    def __init__(self, classifier: lc.RRCLanguageClassifier, min_tokens: int = 20, min_relative_margin: float = 0.4,
+                 min_margin: float = 0.0):
+        """
+        :param classifier: the classifier whose tables are used for scoring.
+        :param min_tokens: the result is never final before this many tokens have been scored.
+        :param min_relative_margin: the result is final once the winner's margin over the second best language is at
+            least this proportion of the winner's score.
+        :param min_margin: and the margin itself is at least this much. A text with only one contending language has
+            a margin of 1.
+        """
+        self.classifier = classifier
+        self.min_tokens = min_tokens
+        self.min_relative_margin = min_relative_margin
+        self.min_margin = min_margin
+        self.is_final = False
+        # The name of the classifier's prefilter rule that rejected the text, if one did. See prefilter.StreamCheck.
+        self.rejected_by: Optional[str] = None
+        self._prefilter_check = classifier.prefilter.stream()
+        self.chars_seen = 0
+        self.tokens_seen = 0
+        self._held_back = ""
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._char_totals: Dict[str, float] = {}
+        self._term_counts: Dict[str, int] = {}
+        self._term_totals: Dict[str, float] = {}
+
+    def feed(self, chunk: str) -> bool:
+        """Adds the next chunk of text, scoring everything up to its last whitespace. Returns is_final."""
+        self._check_prefilter(chunk)
+        text = self._held_back + chunk
+        # The held back text was searched for whitespace by the last feed, so only the chunk is searched now.
+        end = self._scorable_end(text, scan_from=len(self._held_back))
+        self._held_back = text[end:]
+        if end > 0:
+            self._score(text[:end])
+        return self.is_final
+
+    def feed_bytes(self, data: bytes) -> bool:
+        """Adds the next chunk of a UTF-8 byte stream. Characters split across chunks are decoded correctly."""
+        return self.feed(self._decoder.decode(data))
+
+    def feed_file(self, file_obj: Union[TextIO, BinaryIO], chunk_size: int = 65536) -> bool:
+        """Reads and feeds chunks from a text or binary (UTF-8) file until the result is final or the file ends,
+        and calls finish at the end of the file. Returns is_final."""
+        while not self.is_final:
+            chunk = file_obj.read(chunk_size)
+            if not chunk:
+                self.finish()
+                break
+            if isinstance(chunk, bytes):
+                self.feed_bytes(chunk)
+            else:
+                self.feed(chunk)
+        return self.is_final
+
+    def finish(self) -> bool:
+        """Scores any text held back, at the end of the input. Returns is_final."""
+        tail = self._decoder.decode(b"", final=True)
+        self._check_prefilter(tail)
+        text = self._held_back + tail
+        self._held_back = ""
+        if text:
+            self._score(text)
+        self._reject(self._prefilter_check.finish())
+        return self.is_final
+
+    def _check_prefilter(self, chunk: str):
+        """Checks the chunk against the prefilter as soon as it arrives, so that a rejected text is final at once."""
+        if chunk:
+            self._reject(self._prefilter_check.add(chunk))
+
+    def _reject(self, rule: Optional[str]):
+        if rule is not None:
+            self.rejected_by = rule
+            self.is_final = True
+
+    @staticmethod
+    def _scorable_end(text: str, scan_from: int = 0) -> int:
+        """Returns the length of the start of the text that can be scored without knowing what comes next.
+
+        Only text from scan_from on is searched for whitespace. This is the held back text from the last chunk,
+        which can only hold whitespace that was already found to be inside a possible tag."""
+        forced = len(text) > MAX_HELD_BACK_CHARS
+        match = _LAST_WHITESPACE_REGEX.search(text, scan_from)
+        if match is None and not forced:
+            return 0
+        end = len(text) if match is None else match.start() + 1
+        # A "<" after the last ">" or newline may start an HTML tag that is closed in a later chunk. If so, the text
+        # before the tag also has to wait, since removing the tag may join it to the text after the tag.
+        tag_start = text.find("<", max(text.rfind(">", 0, end), text.rfind("\n", 0, end)) + 1, end)
+        if tag_start != -1 and end - tag_start <= MAX_TAG_CHARS:
+            match = _LAST_WHITESPACE_REGEX.search(text, 0, tag_start)
+            if match is not None:
+                end = match.start() + 1
+            else:
+                end = tag_start if forced else 0
+        return end
+
+    def _score(self, text: str):
+        self.chars_seen += len(text)
+        if self.rejected_by is not None:
+            return
+        lowered = text.lower() if lc.CLASSIFY_CHARS_LOWER_CASE or lc.CLASSIFY_WORDS_LOWER_CASE else text
+        char_text = lowered if lc.CLASSIFY_CHARS_LOWER_CASE else text
+        for lang, score in lc.score_char_counts(self.classifier.char_weights, Counter(char_text)).items():
+            self._char_totals[lang] = self._char_totals.get(lang, 0) + score
+
+        term_counts = lc.count_terms(lowered if lc.CLASSIFY_WORDS_LOWER_CASE else text)
+        term_index = self.classifier.term_index
+        for token, count in term_counts.items():
+            self._term_counts[token] = self._term_counts.get(token, 0) + count
+            self.tokens_seen += count
+            if term_index is not None:
+                for lang, weight in term_index.get(token, ()):
+                    self._term_totals[lang] = self._term_totals.get(lang, 0) + weight * count
+
+        if not self.is_final and self.tokens_seen >= self.min_tokens:
+            scores = self.get_language_scores()
+            winner, margin = lc.winner_margin_from_scores(scores)
+            self.is_final = (winner is not None and margin >= self.min_margin
+                             and margin >= self.min_relative_margin * scores[0][1])
+            if self.is_final:
+                # Callers stop reading here, so the rules that need the whole text are checked on the text so far.
+                self._reject(self._prefilter_check.finish())
+
+    def get_language_scores(self) -> List[Tuple[str, float]]:
+        """Returns (language code, score) pairs for the text scored so far, sorted from highest to lowest score."""
+        if self.rejected_by is not None:
+            return []
+        return scores_from_totals(self.classifier, self._char_totals, self._term_totals, self._term_counts)
+
+    def get_winner(self) -> Optional[str]:
+        """Returns the winning language for the text scored so far, or None."""
+        return lc.winner_from_scores(self.get_language_scores())[0]
+
+    def get_winner_margin(self) -> Tuple[Optional[str], float]:
+        """Returns the winning language for the text scored so far, and how much it is winning by."""
+        return lc.winner_margin_from_scores(self.get_language_scores())
+
+
+def scores_from_totals(classifier: lc.RRCLanguageClassifier, char_totals: Dict[str, float],
+                       term_totals: Dict[str, float], term_counts: Dict[str, int]) -> List[Tuple[str, float]]:
+    """Returns sorted (language, score) pairs, as score_text does, from running totals for a text.
+
+    :param char_totals: the char score for each language, as score_chars gives.
+    :param term_totals: the sum of the term index weights times counts for each language, if the classifier has a
+        term index. Otherwise, the term scores of the contending languages are worked out from term_counts.
+    :param term_counts: the count of each token in the text, as count_terms gives.
+    """
+    char_scores = lc.select_char_contenders(char_totals, max_term_candidates=classifier.max_term_candidates,
+                                            max_char_gap=classifier.max_char_gap)
+    if len(char_scores) <= 1:
+        return list(char_scores.items())
+    if classifier.term_index is None:
+        term_scores = lc.score_language_term_counts(classifier.term_ranks, term_counts, char_scores)
+    else:
+        term_scores = {lang: lc.BASELINE_TERM_SCORE + term_totals.get(lang, 0) for lang in char_scores}
+    return lc.combine_scores(char_scores, term_scores)
@@ -0,0 +1,139 @@
+import io
+import random
+
+import pytest
+
+from lplangid import language_classifier as lc
+from lplangid.incremental import MAX_HELD_BACK_CHARS, MAX_TAG_CHARS, IncrementalScorer
+from lplangid.language_classifier_test import TEST_TEXTS
+from lplangid.prefilter import Prefilter
+
+CLASSIFIER = lc.RRCLanguageClassifier.default_instance()
+LONG_TEXT = ("The committee met on Tuesday to <b>discuss</b> the budget for next year, and agreed that the\n"
+             "new library should open in the spring. Members asked for a report on the costs of the building, "
+             "the U.S. suppliers' quotes, and <a href='x'>the plan</a> for staffing it. ") * 5
+
+
+def feed_in_chunks(scorer, text, rng):
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 12)
+        scorer.feed(text[position:position + size])
+        position += size
+    scorer.finish()
+
+
+def assert_scores_match(scores, expected):
+    assert [lang for lang, _ in scores] == [lang for lang, _ in expected]
+    assert [score for _, score in scores] == pytest.approx([score for _, score in expected], rel=1e-9)
+
+
+def test_chunked_scores_match_score_text():
+    rng = random.Random(42)
+    for text in [text for text, _ in TEST_TEXTS] + [LONG_TEXT, "Σ Σοφία ΣΟΦΟΣ σ", "a <b\nc> d <e f"]:
+        scorer = IncrementalScorer(CLASSIFIER, min_tokens=10 ** 9)
+        feed_in_chunks(scorer, text, rng)
+        assert scorer.chars_seen == len(text)
+        assert_scores_match(scorer.get_language_scores(), CLASSIFIER.get_language_scores(text))
+        assert scorer.get_winner() == CLASSIFIER.get_winner(text)
+
+
+def test_text_is_held_back_until_whitespace_and_closed_tags():
+    scorer = IncrementalScorer(CLASSIFIER)
+    scorer.feed("Hello wor")
+    assert scorer.chars_seen == len("Hello ")
+    scorer.feed("ld <b class='x")
+    assert scorer.chars_seen == len("Hello world ")
+    scorer.feed("'>bold</b> text")
+    assert scorer.chars_seen == len("Hello world <b class='x'>bold</b> ")
+    scorer.finish()
+    assert scorer.tokens_seen == 4
+
+
+def test_early_stopping():
+    scorer = IncrementalScorer(CLASSIFIER)
+    reader = io.StringIO(LONG_TEXT * 20)
+    assert scorer.feed_file(reader, chunk_size=100)
+    assert scorer.get_winner() == "en"
+    assert scorer.chars_seen < len(LONG_TEXT)
+    assert reader.tell() < len(LONG_TEXT)
+
+    scorer = IncrementalScorer(CLASSIFIER)
+    assert not scorer.feed_file(io.StringIO("the"))
+    assert scorer.tokens_seen == 1
+
+
+def test_feed_bytes_decodes_characters_split_across_chunks():
+    text = "Tôi đã đăng ký được 25 ngày. Sao đến giờ vẫn chưa có phản hồi"
+    data = text.encode("utf-8")
+    scorer = IncrementalScorer(CLASSIFIER, min_tokens=10 ** 9)
+    for i in range(0, len(data), 3):
+        scorer.feed_bytes(data[i:i + 3])
+    scorer.finish()
+    assert_scores_match(scorer.get_language_scores(), CLASSIFIER.get_language_scores(text))
+
+    scorer = IncrementalScorer(CLASSIFIER, min_tokens=10 ** 9)
+    scorer.feed_file(io.BytesIO(data), chunk_size=5)
+    assert scorer.get_winner() == "vi"
+
+
+def test_prefiltered_text_is_final_and_unscored():
+    scorer = IncrementalScorer(CLASSIFIER)
+    assert not scorer.feed("Meta")
+    assert scorer.feed("data and then some English text")
+    scorer.finish()
+    assert scorer.get_language_scores() == []
+
+
+def test_classifier_prefilter_is_checked_as_chunks_arrive():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    classifier.set_prefilter(Prefilter.from_config({"patterns": {"url": r"https?://\S+"}, "min_alpha_ratio": 0.5}))
+    scorer = IncrementalScorer(classifier)
+    assert not scorer.feed("Metadata: see htt")
+    assert scorer.feed("ps://example.com now")
+    assert scorer.rejected_by == "url" and scorer.get_language_scores() == []
+
+    scorer = IncrementalScorer(classifier)
+    assert scorer.feed_file(io.StringIO("12345 67890 " * 100 + "this is English"), chunk_size=100)
+    assert scorer.rejected_by == "min_alpha_ratio" and scorer.get_winner() is None
+
+    scorer = IncrementalScorer(classifier)
+    assert scorer.feed_file(io.StringIO(LONG_TEXT * 20), chunk_size=100)
+    assert scorer.rejected_by is None and scorer.get_winner() == "en"
+    assert classifier.prefilter_stats() == {"url": 1, "min_alpha_ratio": 1, "texts_checked": 3}
+
+
+def test_lazy_tables_score_terms_from_counts():
+    classifier = lc.RRCLanguageClassifier.lazy_instance()
+    scorer = IncrementalScorer(classifier, min_tokens=10 ** 9)
+    feed_in_chunks(scorer, LONG_TEXT, random.Random(7))
+    assert_scores_match(scorer.get_language_scores(), CLASSIFIER.get_language_scores(LONG_TEXT))
+
+
+def test_spaceless_text_is_scored_as_it_arrives():
+    text = "我们今天去北京吃饭了" * 20000
+    scorer = IncrementalScorer(CLASSIFIER, min_tokens=10 ** 9)
+    for i in range(0, len(text), 4096):
+        scorer.feed(text[i:i + 4096])
+        assert len(scorer._held_back) <= MAX_HELD_BACK_CHARS + 4096
+    assert scorer.chars_seen >= len(text) - MAX_HELD_BACK_CHARS
+
+    scorer = IncrementalScorer(CLASSIFIER)
+    reader = io.StringIO(text)
+    assert scorer.feed_file(reader, chunk_size=4096)
+    assert scorer.get_winner() == "zh"
+    assert reader.tell() < len(text)
+
+
+def test_unmatched_angle_bracket_does_not_hold_back_the_line():
+    line = "we know that x < y holds for all of the values that we checked in the tables " * 2000
+    scorer = IncrementalScorer(CLASSIFIER, min_tokens=10 ** 9)
+    for i in range(0, len(line), 4096):
+        scorer.feed(line[i:i + 4096])
+        assert len(scorer._held_back) <= MAX_TAG_CHARS + 4096
+    assert scorer.chars_seen >= len(line) - MAX_TAG_CHARS - 4096
+    assert scorer.get_winner() == "en"
+
+    scorer = IncrementalScorer(CLASSIFIER)
+    assert scorer.feed_file(io.StringIO("I <3 this! " + line), chunk_size=4096)
+    assert scorer.get_winner() == "en"
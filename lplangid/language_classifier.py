@@ -1,12 +1,24 @@
+import gc
+import itertools
 import logging
 import math
 import os
+import re
 import string
 from collections import Counter
-from typing import Dict, List, Optional, Tuple
+from collections.abc import Mapping
+from pathlib import Path
+from typing import AbstractSet, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from lplangid import count_utils as cu
+from lplangid import parallel
 from lplangid.const_data import COMPUTERESE_STARTS
+from lplangid.prefilter import ACCEPT_ALL, Prefilter
+from lplangid.profiling import ProfiledCall, StageProfiler
+from lplangid.result_cache import LRUResultCache
+from lplangid.script_fast_path import ScriptFastPath
+from lplangid.single_token import build_single_token_results, lookup_single_token
+from lplangid.substring_terms import SPACELESS_LANGUAGES, SubstringTermMatcher
 from lplangid.tokenizer import tokenize_fast
 
 # The default Wikipedia + overrides datafiles are shipped in this base directory.
@@ -29,78 +41,578 @@ MAX_WORDS_PER_LANG = 10000
 CLASSIFY_WORDS_LOWER_CASE = True
 CLASSIFY_CHARS_LOWER_CASE = True
 
+# The most that one occurrence of a term can add to a language's term score, since ranks start at 1.
+MAX_TERM_WEIGHT = TERM_PRESENCE_WEIGHT + 1 / math.sqrt(TOP_RANK_DAMPING + 1)
+# Pruning keeps languages whose best possible score is within this proportion of the leader's, so that rounding in
+# the bounds (or in weights stored as float32 by compact tables) can never drop the true winner.
+PRUNE_TOLERANCE = 1e-6
+# Languages are only pruned this many times per text, at evenly spaced tokens, since each check costs about as much
+# as scoring a token for every remaining language.
+PRUNE_CHECKS = 32
+
+# str.startswith accepts a tuple of prefixes and checks them all in a single call.
+COMPUTERESE_PREFIXES = tuple(COMPUTERESE_STARTS)
+
+# Texts longer than a classifier's budget (see set_budget) are classified from this many evenly spaced windows.
+DEFAULT_NUM_WINDOWS = 8
+_WHITESPACE_REGEX = re.compile(r"\s")
+_LAST_WHITESPACE_REGEX = re.compile(r"\s\S*\Z")
+_WORD_REGEX = re.compile(r"\S+")
+
 
 class RRCLanguageClassifier:
     """RRCLanguageClassifier is a class that provides language detection scores and predictions.
 
     It holds the term rank and char rank tables, and runs the pure functions (below) using this state.
     """
-    def __init__(self, term_ranks: Dict[str, Dict[str, int]], char_weights: Dict[str, List[Tuple[str, float]]]):
+    def __init__(self, term_ranks: Dict[str, Dict[str, int]], char_weights: Dict[str, List[Tuple[str, float]]],
+                 term_index: Optional[Dict[str, Tuple[Tuple[str, float], ...]]] = None):
         """
          Construct a new 'RRCLanguageClassifier' object.
 
          :param term_ranks: dictionary mapping language code -> word/term -> rank.
          :param char_weights: dictionary mapping character -> (language, relative frequency).
+         :param term_index: optional prebuilt index from term -> (language, term weight) pairs. If not given, it is
+           built from term_ranks using build_term_index when it is first needed. If that returns None, terms are
+           looked up in term_ranks.
 
          The char_weights table is optimized to score every (character, language) score, whereas the term_ranks
          table is optimized to compute (language, term) scores for languages that pass the character cutoff.
+         The term_index is built from term_ranks, so that scoring each token needs a single dictionary lookup instead
+         of one lookup per candidate language. Building it takes about 2 seconds for the bible tables, so this is
+         done when the first text is term scored rather than here, and classifiers that are only constructed (such
+         as views, or instances that are replaced by update_tables) never pay for it.
          """
         self.term_ranks: Dict[str, Dict[str, int]] = term_ranks
         self.char_weights: Dict[str, List[Tuple[str, float]]] = char_weights
+        self._term_index = term_index
+        self._term_index_built = term_index is not None
+        self.script_fast_path = ScriptFastPath(char_weights, CHAR_MIN_TO_PLAY)
+        self._matrix_scorer = None
+        self._result_cache: Optional[LRUResultCache] = None
+        self._language_chars: Optional[Dict[str, Dict[str, float]]] = None
+        self._views: Dict[frozenset, RRCLanguageClassifier] = {}
+        self._budget: Optional[Tuple[Optional[int], Optional[int], int]] = None
+        self._prune = False
+        # Optional limits on the char contenders that go on to term scoring. See select_char_contenders.
+        self.max_term_candidates: Optional[int] = None
+        self.max_char_gap: Optional[float] = None
+        self.single_token_results: Optional[Dict[str, Tuple[Optional[str], float]]] = None
+        self.substring_matcher: Optional[SubstringTermMatcher] = None
+        self._substring_languages: Tuple[str, ...] = ()
+        # Rejects texts that are never classified, such as machine-generated ones. See set_prefilter.
+        self.prefilter: Prefilter = Prefilter.default()
+        # A StageProfiler while profiling is enabled. See enable_profiling.
+        self.profiler: Optional[StageProfiler] = None
 
     @staticmethod
-    def default_instance():
-        """Gets a default instance populated using the prepare_scoring_tables function."""
-        all_term_ranks, all_char_weights = prepare_scoring_tables()
-        logging.info(f"Loaded classifier with term ranks and character frequencies for these languages: "
-                     f"{', '.join(sorted(all_term_ranks.keys()))}")
-        return RRCLanguageClassifier(all_term_ranks, all_char_weights)
+    def default_instance(compact: bool = False, single_token_results: bool = False):
+        """Gets a default instance populated from the bundled freq_data directory.
+
+        If compact is True, the tables are converted to the smaller array-backed versions in compact_tables.
+        If single_token_results is True, precomputed results for single token texts are used (see from_data_dir)."""
+        from lplangid.model_files import packaged_data_dir
+        return RRCLanguageClassifier.from_data_dir(packaged_data_dir("freq_data"), compact=compact,
+                                                   single_token_results=single_token_results)
 
     @staticmethod
-    def many_language_bible_instance():
-        """Gets a default instance populated using the prepare_scoring_tables function."""
-        all_term_ranks, all_char_weights = prepare_scoring_tables(data_dir=FREQ_DATA_DIR + "_bible")
+    def many_language_bible_instance(compact: bool = False, single_token_results: bool = False):
+        """Gets an instance populated from the bundled freq_data_bible directory, which supports 103 languages."""
+        from lplangid.model_files import packaged_data_dir
+        return RRCLanguageClassifier.from_data_dir(packaged_data_dir("freq_data_bible"), compact=compact,
+                                                   single_token_results=single_token_results)
+
+    @staticmethod
+    def from_data_dir(data_dir, compact: bool = False, single_token_results: bool = False):
+        """Gets an instance populated from the compiled model in data_dir (a path, or an importlib.resources
+        Traversable for bundled data) if it is up to date, and otherwise by reading the CSV files with the
+        prepare_scoring_tables function. See model_files for details.
+
+        If single_token_results is True, the single token results compiled into data_dir are used, or if there are
+        none, they are built now with enable_single_token_results, which takes a few seconds or more."""
+        # Imported here because model_files itself uses functions from this module.
+        from lplangid import model_files
+        all_term_ranks, all_char_weights = model_files.load_scoring_tables(data_dir)
         logging.info(f"Loaded classifier with term ranks and character frequencies for these languages: "
                      f"{', '.join(sorted(all_term_ranks.keys()))}")
-        return RRCLanguageClassifier(all_term_ranks, all_char_weights)
+        if compact:
+            classifier = RRCLanguageClassifier.from_tables(all_term_ranks, all_char_weights, compact=True)
+        else:
+            classifier = RRCLanguageClassifier(all_term_ranks, all_char_weights)
+        if single_token_results:
+            classifier.enable_single_token_results(model_files.load_single_token_results(data_dir))
+        return classifier
+
+    @staticmethod
+    def lazy_instance(data_dir=FREQ_DATA_DIR, max_resident_languages: Optional[int] = None):
+        """Gets an instance that loads the char tables from data_dir now, and each language's term table when it is
+        first needed. See lazy_tables for details.
+
+        :param max_resident_languages: if given, at most this many term tables are kept in memory, dropping the least
+          recently used one when another language is needed.
+        """
+        # Imported here because lazy_tables itself uses functions from this module.
+        from lplangid.lazy_tables import LazyTermRanks
+        term_ranks = LazyTermRanks(data_dir, max_resident=max_resident_languages)
+        return RRCLanguageClassifier(term_ranks, prepare_char_weights(str(data_dir), term_ranks.languages))
+
+    @staticmethod
+    def from_tables(term_ranks: Dict[str, Dict[str, int]], char_weights: Dict[str, List[Tuple[str, float]]],
+                    compact: bool = False):
+        """Gets an instance using the given tables, optionally converting them to compact_tables versions first."""
+        if compact:
+            # Imported here because compact_tables itself uses functions from this module.
+            from lplangid.compact_tables import compact_scoring_tables
+            term_ranks, char_weights = compact_scoring_tables(term_ranks, char_weights)
+        return RRCLanguageClassifier(term_ranks, char_weights)
+
+    def update_tables(self, term_ranks: Optional[Dict[str, Dict[str, int]]] = None,
+                      char_weights: Optional[Dict[str, List[Tuple[str, float]]]] = None):
+        """Replaces the term ranks and / or char weights, and rebuilds everything derived from them.
+
+        Call this with no arguments after changing the existing tables in place, so that the term index is rebuilt
+        and cached results are discarded. Single token results are dropped, since rebuilding them is slow, and can be
+        enabled again with enable_single_token_results."""
+        if term_ranks is not None:
+            self.term_ranks = term_ranks
+        if char_weights is not None:
+            self.char_weights = char_weights
+        self._term_index = None
+        self._term_index_built = False
+        self.script_fast_path = ScriptFastPath(self.char_weights, CHAR_MIN_TO_PLAY)
+        self._matrix_scorer = None
+        self._language_chars = None
+        self._views = {}
+        self.single_token_results = None
+        if self.substring_matcher is not None:
+            self.substring_matcher = SubstringTermMatcher.for_languages(self.term_ranks, self._substring_languages)
+        if self._result_cache is not None:
+            self._result_cache.clear()
+
+    @property
+    def term_index(self) -> Optional[Dict[str, Tuple[Tuple[str, float], ...]]]:
+        """The index from term -> (language, term weight) pairs, built with build_term_index the first time it is
+        used, or None if terms are looked up in term_ranks."""
+        if not self._term_index_built:
+            # Two threads may both build the index the first time, which is wasteful but safe, as they build the same
+            # index and either can be kept.
+            self._term_index = build_term_index(self.term_ranks)
+            self._term_index_built = True
+        return self._term_index
+
+    def restrict_to(self, languages: Iterable[str]) -> "RRCLanguageClassifier":
+        """Returns a classifier that only picks from the given languages. Raises ValueError for unknown languages.
+
+        The returned view shares this classifier's term tables and term index, and has its own char weights for just
+        these languages, renormalized so that each char's weights add up to 1 again. Views are cached, so asking for the
+        same set of languages again returns the same view. They are discarded by update_tables.
+
+        Views also have this classifier's settings: its prefilter, profiler, budget, pruning, term candidate limits,
+        substring terms (for the view's languages) and a result cache of the same size, but not its single token
+        results. Later changes to these settings are passed on to the views too, discarding their cached results."""
+        key = frozenset(languages)
+        view = self._views.get(key)
+        if view is not None:
+            return view
+        unknown = key.difference(self.term_ranks)
+        if unknown:
+            raise ValueError(f"Unknown languages: {', '.join(sorted(unknown))}")
+        if self._language_chars is None:
+            self._language_chars = language_char_weights(self.char_weights)
+        char_weights = invert_char_tables({lang: self._language_chars.get(lang, {}) for lang in key})
+        view = RRCLanguageClassifier(_TermRanksSubset(self, key), char_weights)
+        self._configure_view(view)
+        return self._views.setdefault(key, view)
+
+    def _configure_view(self, view: "RRCLanguageClassifier"):
+        """Gives a view from restrict_to this classifier's settings. The view gets a cache of its own, since its scores
+        are different."""
+        view.prefilter = self.prefilter
+        view.profiler = self.profiler
+        view._budget = self._budget
+        view._prune = self._prune
+        view.max_term_candidates = self.max_term_candidates
+        view.max_char_gap = self.max_char_gap
+        if self.substring_matcher is None:
+            view.substring_matcher = None
+            view._substring_languages = ()
+        elif view.substring_matcher is None or view._substring_languages != self._substring_languages:
+            view.enable_substring_terms(self._substring_languages)
+        if self._result_cache is None:
+            view._result_cache = None
+        else:
+            view.enable_cache(max_entries=self._result_cache.max_entries, max_bytes=self._result_cache.max_bytes)
+        view._update_views()
+
+    def _update_views(self):
+        """Passes this classifier's settings on to its views after they change."""
+        for view in self._views.values():
+            self._configure_view(view)
+
+    def resident_languages(self) -> List[str]:
+        """Returns the languages whose term tables are in memory. For lazy instances, these are the languages that
+        have been needed so far (and not evicted). Otherwise, this is every language."""
+        if hasattr(self.term_ranks, "resident_languages"):
+            return self.term_ranks.resident_languages()
+        return sorted(self.term_ranks)
+
+    def enable_cache(self, max_entries: int = 100000, max_bytes: Optional[int] = None):
+        """Turns on an LRU cache of results, keyed by the lowercased text. Replaces any existing cache."""
+        self._result_cache = LRUResultCache(max_entries=max_entries, max_bytes=max_bytes)
+        self._update_views()
+
+    def disable_cache(self):
+        """Turns off the result cache and discards its contents."""
+        self._result_cache = None
+        self._update_views()
+
+    def set_budget(self, max_chars: Optional[int] = None, max_tokens: Optional[int] = None,
+                   num_windows: int = DEFAULT_NUM_WINDOWS):
+        """Limits how much of each text is classified, so that the time taken for very large inputs is capped.
+
+        Texts longer than the budget are classified from num_windows evenly spaced windows, as chosen by
+        sample_windows. The prefilter's patterns and min_alpha_ratio rules are checked on these windows too. Call
+        with no arguments to classify whole texts again. Cached results are discarded."""
+        if max_chars is None and max_tokens is None:
+            self._budget = None
+        else:
+            self._budget = (max_chars, max_tokens, num_windows)
+        if self._result_cache is not None:
+            self._result_cache.clear()
+        self._update_views()
+
+    def set_term_candidates(self, max_term_candidates: Optional[int] = None, max_char_gap: Optional[float] = None):
+        """Limits how many of the languages that pass the char filter go on to term scoring, trading some accuracy for
+        speed when many languages share a script. Call with no arguments to remove the limits. Cached results are
+        discarded.
+
+        :param max_term_candidates: only this many languages with the best char scores are term scored.
+        :param max_char_gap: languages after the first drop in char score of more than this proportion of the top char
+            score, with languages sorted by char score, are not term scored.
+        """
+        if max_term_candidates is not None and max_term_candidates < 1:
+            raise ValueError("max_term_candidates must be positive")
+        self.max_term_candidates = max_term_candidates
+        self.max_char_gap = max_char_gap
+        if self._result_cache is not None:
+            self._result_cache.clear()
+        self._update_views()
+
+    def enable_single_token_results(self, results: Optional[Dict[str, Tuple[Optional[str], float]]] = None):
+        """Makes get_winner, get_winner_score and get_winners answer texts that are a single token with one lookup in
+        precomputed results, which give exactly the same winners and scores. See single_token for details.
+
+        :param results: results from single_token.build_single_token_results or
+            model_files.load_single_token_results for these tables. If not given, they are built now.
+        """
+        self.single_token_results = results if results is not None else build_single_token_results(self)
+
+    def disable_single_token_results(self):
+        """Stops using single token results, and frees their memory."""
+        self.single_token_results = None
+
+    def enable_substring_terms(self, languages: Iterable[str] = SPACELESS_LANGUAGES):
+        """Makes term scoring find the terms of these languages, which are written without spaces, inside tokens
+        with a substring_terms.SubstringTermMatcher. This changes the scores of texts in these languages, so it is
+        not used by single token results, segment or IncrementalScorer. Cached results are discarded."""
+        self._substring_languages = tuple(languages)
+        self.substring_matcher = SubstringTermMatcher.for_languages(self.term_ranks, self._substring_languages)
+        if self._result_cache is not None:
+            self._result_cache.clear()
+        self._update_views()
+
+    def disable_substring_terms(self):
+        """Stops finding terms inside tokens. Cached results are discarded."""
+        self.substring_matcher = None
+        if self._result_cache is not None:
+            self._result_cache.clear()
+        self._update_views()
+
+    def enable_pruning(self):
+        """Makes get_winner and get_winners find the winner with get_pruned_winner, which drops languages during term
+        scoring once they can no longer win. The winners are the same, but get_language_scores and the other methods
+        that return scores are unaffected. Pruned results are not cached."""
+        self._prune = True
+        self._update_views()
 
-    def get_winner(self, text: str) -> str:
-        """Returns the language with the single best score. (Ties are very rare.)"""
-        return get_winner(self.term_ranks, self.char_weights, text)
+    def disable_pruning(self):
+        """Makes get_winner and get_winners score every contending language again."""
+        self._prune = False
+        self._update_views()
 
-    def get_winner_score(self, text: str) -> Tuple[str, float]:
+    def set_prefilter(self, prefilter: Optional[Prefilter] = None):
+        """Replaces the prefilter that rejects texts before they are scored, such as machine-generated ones.
+
+        The default is Prefilter.default(), which rejects texts starting with the COMPUTERESE_STARTS strings. Call
+        with no arguments to classify every text. Rejected texts get no scores and no winner. The prefilter is also
+        used by the views from restrict_to, the matrix_scorer, segment, and IncrementalScorers created afterwards."""
+        self.prefilter = prefilter if prefilter is not None else ACCEPT_ALL
+        self._update_views()
+        if self._matrix_scorer is not None:
+            self._matrix_scorer.prefilter = self.prefilter
+
+    def prefilter_stats(self) -> Dict[str, int]:
+        """Returns how many texts each prefilter rule rejected, and how many texts were checked in all. Texts
+        classified in worker processes by classify_parallel are not counted. See prefilter for details."""
+        return self.prefilter.stats()
+
+    def enable_profiling(self, slow_call_seconds: Optional[float] = None, max_slow_calls: int = 100,
+                         preview_chars: int = 50):
+        """Makes the classifier time each stage of scoring each text, and count what each stage did, with a
+        profiling.StageProfiler, which is passed to score_text, or to get_pruned_winner when pruning is enabled. Calls
+        that take longer than slow_call_seconds are kept with their own stage breakdowns. See profiling for details.
+        Replaces any existing profiler and its aggregates."""
+        self.profiler = StageProfiler(slow_call_seconds=slow_call_seconds, max_slow_calls=max_slow_calls,
+                                      preview_chars=preview_chars)
+        self._update_views()
+
+    def disable_profiling(self):
+        """Stops profiling, and discards the aggregates."""
+        self.profiler = None
+        self._update_views()
+
+    def profiling_stats(self, reset: bool = False) -> Dict:
+        """Returns a snapshot of the profiling aggregates and slow calls (empty if profiling is disabled).
+
+        :param reset: if True, the aggregates are set back to zero after taking the snapshot.
+        """
+        if self.profiler is None:
+            return {}
+        snapshot = self.profiler.snapshot()
+        if reset:
+            self.profiler.reset()
+        return snapshot
+
+    def fast_path_stats(self) -> Dict[str, int]:
+        """Returns how many texts were all ASCII, how many were resolved by the script fast path because all their
+        chars belong to a single language, and how many were neither. See script_fast_path for details."""
+        return dict(self.script_fast_path.counts)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Returns the hit, miss and eviction counts and the size of the result cache (empty if there isn't one)."""
+        return self._result_cache.stats() if self._result_cache is not None else {}
+
+    def get_winner(self, text: str, candidates: Optional[Iterable[str]] = None,
+                   priors: Optional[Dict[str, float]] = None) -> str:
+        """Returns the language with the single best score. (Ties are very rare.)
+
+        :param candidates: if given, only these languages are scored, and the winner is one of them.
+        :param priors: if given, each language's final score is multiplied by its prior (default 1).
+        """
+        scored_text, call = self._accepted_text(text)
+        if scored_text is None:
+            return None
+        single_token_result = self._single_token_result(text, candidates, priors)
+        if single_token_result is not None:
+            return single_token_result[0]
+        if self._prune:
+            return get_pruned_winner(self.term_ranks, self.char_weights, scored_text, term_index=self.term_index,
+                                     candidates=candidates, priors=priors, fast_path=self.script_fast_path,
+                                     max_term_candidates=self.max_term_candidates, max_char_gap=self.max_char_gap,
+                                     substring_matcher=self.substring_matcher, prefilter=ACCEPT_ALL, call=call)
+        return winner_from_scores(self._language_scores(scored_text, candidates, priors, call))[0]
+
+    def get_winner_score(self, text: str, candidates: Optional[Iterable[str]] = None,
+                         priors: Optional[Dict[str, float]] = None) -> Tuple[str, float]:
         """Returns the language with the single best score, and its score. (Ties are very rare.)"""
-        return get_winner_score(self.term_ranks, self.char_weights, text)
+        scored_text, call = self._accepted_text(text)
+        if scored_text is None:
+            return winner_from_scores([])
+        single_token_result = self._single_token_result(text, candidates, priors)
+        if single_token_result is not None:
+            return single_token_result
+        return winner_from_scores(self._language_scores(scored_text, candidates, priors, call))
+
+    def _single_token_result(self, text: str, candidates: Optional[Iterable[str]],
+                             priors: Optional[Dict[str, float]]) -> Optional[Tuple[Optional[str], float]]:
+        """Returns the precomputed winner and score for a single token text, if there are any that apply. The caller
+        checks the prefilter first."""
+        if (self.single_token_results is None or candidates is not None or priors is not None
+                or self._budget is not None or self.max_term_candidates is not None or self.max_char_gap is not None
+                or self.substring_matcher is not None):
+            return None
+        return lookup_single_token(self.single_token_results, text)
+
+    def get_language_scores(self, text: str, candidates: Optional[Iterable[str]] = None,
+                            priors: Optional[Dict[str, float]] = None) -> List[Tuple[str, float]]:
+        """Returns a list of (language code, score) pairs, sorted from highest to lowest score.
+
+        See get_winner for the candidates and priors hints. Results with hints are not cached."""
+        scored_text, call = self._accepted_text(text)
+        if scored_text is None:
+            return []
+        return self._language_scores(scored_text, candidates, priors, call)
+
+    def _accepted_text(self, text: str) -> Tuple[Optional[str], Optional[ProfiledCall]]:
+        """Returns the text to score, which is the windows chosen by sample_windows if there is a budget, or None if
+        the prefilter rejects the text. The prefilter's patterns and min_alpha_ratio are only checked on the windows,
+        so that the budget caps their time as well. See prefilter for details.
+
+        Also returns the ProfiledCall for the text if profiling is enabled, with the sampling and the prefilter
+        check timed as its prefilter stage, or None. Calls for rejected texts are already done."""
+        call = self.profiler.start_call(text) if self.profiler is not None else None
+        scored_text = sample_windows(text, *self._budget) if self._budget is not None else text
+        rejected = self.prefilter.check(text, sample=scored_text) is not None
+        if call is not None:
+            call.end_stage("prefilter")
+            if rejected:
+                call.done("prefilter", None)
+        return (None if rejected else scored_text), call
+
+    def _language_scores(self, text: str, candidates: Optional[Iterable[str]], priors: Optional[Dict[str, float]],
+                         call: Optional[ProfiledCall]) -> List[Tuple[str, float]]:
+        """Returns the scores for a text and call from _accepted_text."""
+        if self._result_cache is None or candidates is not None or priors is not None:
+            return score_text(self.term_ranks, self.char_weights, text, term_index=self.term_index,
+                              candidates=candidates, priors=priors, fast_path=self.script_fast_path,
+                              max_term_candidates=self.max_term_candidates, max_char_gap=self.max_char_gap,
+                              substring_matcher=self.substring_matcher, prefilter=ACCEPT_ALL, call=call)
+        # Once the text has passed the prefilter, scores only depend on the lowercased text, so this is a safe key.
+        key = text.lower() if CLASSIFY_CHARS_LOWER_CASE and CLASSIFY_WORDS_LOWER_CASE else text
+        scores = self._result_cache.get(key)
+        if scores is None:
+            scores = score_text(self.term_ranks, self.char_weights, text, term_index=self.term_index,
+                                fast_path=self.script_fast_path, max_term_candidates=self.max_term_candidates,
+                                max_char_gap=self.max_char_gap, substring_matcher=self.substring_matcher,
+                                prefilter=ACCEPT_ALL, call=call)
+            self._result_cache.put(key, scores)
+        return list(scores)
+
+    def get_winner_margin(self, text: str, candidates: Optional[Iterable[str]] = None,
+                          priors: Optional[Dict[str, float]] = None) -> Tuple[Optional[str], float]:
+        """Returns the language with the single best score, and how much it won by."""
+        return winner_margin_from_scores(self.get_language_scores(text, candidates=candidates, priors=priors))
+
+    def get_winners(self, texts: Iterable[str]) -> List[Optional[str]]:
+        """Returns the winning language for each of the texts. Identical texts in the batch are only scored once."""
+        if self._prune:
+            unique_winners: Dict[str, Optional[str]] = {}
+            winners = []
+            for text in texts:
+                if text not in unique_winners:
+                    unique_winners[text] = self.get_winner(text)
+                winners.append(unique_winners[text])
+            return winners
+        return [winner for winner, _ in self.get_winner_scores(texts)]
 
-    def get_language_scores(self, text: str) -> List[Tuple[str, float]]:
-        """Returns a list of (language code, score) pairs, sorted from highest to lowest score."""
-        return score_text(self.term_ranks, self.char_weights, text)
+    def get_winner_scores(self, texts: Iterable[str]) -> List[Tuple[Optional[str], float]]:
+        """Returns the winning language and its score for each of the texts, scoring each distinct text once."""
+        unique_results: Dict[str, Tuple[Optional[str], float]] = {}
+        results = []
+        for text in texts:
+            if text not in unique_results:
+                unique_results[text] = self.get_winner_score(text)
+            results.append(unique_results[text])
+        return results
+
+    def get_language_scores_batch(self, texts: Iterable[str]) -> List[List[Tuple[str, float]]]:
+        """Returns the sorted (language code, score) list for each of the texts, scoring each distinct text once.
+
+        Each text gets its own list, so callers can modify the results for duplicate texts independently."""
+        unique_results: Dict[str, List[Tuple[str, float]]] = {}
+        results = []
+        for text in texts:
+            if text not in unique_results:
+                unique_results[text] = self.get_language_scores(text)
+            results.append(list(unique_results[text]))
+        return results
+
+    def classify_parallel(self, texts: Iterable[str], workers: Optional[int] = None, chunksize: int = 1000,
+                          method: str = "get_winners") -> Iterator:
+        """Yields results for each text in order, classifying chunks of texts in a pool of worker processes.
+
+        See parallel.classify_parallel for details. The workers share this classifier's tables rather than
+        loading their own copies."""
+        return parallel.classify_parallel(self, texts, workers=workers, chunksize=chunksize, method=method)
+
+    def segment(self, text: str, window_tokens: int = 8, stride: int = 2):
+        """Returns a list of segmentation.LanguageSpan for the text, giving the language of each part of it.
+
+        See segmentation.segment for details."""
+        # Imported here because segmentation itself uses functions from this module.
+        from lplangid import segmentation
+        return segmentation.segment(self, text, window_tokens=window_tokens, stride=stride)
+
+    def matrix_scorer(self):
+        """Returns a matrix_scoring.MatrixScorer for scoring batches of texts, building it on first use.
+
+        This is optional and needs numpy and scipy, so the matrix_scoring module is only imported here."""
+        if self._matrix_scorer is None:
+            from lplangid.matrix_scoring import MatrixScorer
+            self._matrix_scorer = MatrixScorer(self.term_ranks, self.char_weights, prefilter=self.prefilter)
+        return self._matrix_scorer
+
+
+class _TermRanksSubset(Mapping):
+    """A read-only view of a classifier's language -> term -> rank table, limited to some of its languages."""
+    def __init__(self, classifier: RRCLanguageClassifier, languages: frozenset):
+        self._classifier = classifier
+        self._languages = languages
+
+    def __getitem__(self, lang: str) -> Dict[str, int]:
+        if lang not in self._languages:
+            raise KeyError(lang)
+        return self._classifier.term_ranks[lang]
+
+    def __contains__(self, lang) -> bool:
+        return lang in self._languages
+
+    def __len__(self) -> int:
+        return len(self._languages)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(sorted(self._languages))
+
+    def term_index(self) -> Optional[Dict[str, Tuple[Tuple[str, float], ...]]]:
+        """Returns the full classifier's term index. This is safe to share, because score_term_counts only adds up
+        scores for the candidate languages, which all come from the view's char weights."""
+        return self._classifier.term_index
 
 
 def prepare_scoring_tables(data_dir=FREQ_DATA_DIR) -> Tuple[Dict[str, Dict[str, int]],
                                                             Dict[str, List[Tuple[str, float]]]]:
-    """Reads in term and character ranking data from the files in FREQ_DATA_DIR"""
-    all_term_ranks = {}
+    """Reads in term and character ranking data from the files in data_dir (a path or Traversable)."""
+    lang_codes = list_languages(data_dir)
+    all_term_ranks = {lang_code: read_term_ranks(data_dir, lang_code) for lang_code in lang_codes}
+    all_char_weights = prepare_char_weights(data_dir, lang_codes)
+
+    logging.debug(f"Prepared term and character ranking tables for languages: {sorted(all_term_ranks.keys())}")
+    return all_term_ranks, all_char_weights
+
+
+def _data_path(data_dir):
+    """Returns data_dir as a Path if it is a path, or unchanged if it is already a Traversable (such as a directory
+    in a zipped package), so that both are read with the same methods."""
+    return Path(data_dir) if isinstance(data_dir, (str, os.PathLike)) else data_dir
+
+
+def list_languages(data_dir=FREQ_DATA_DIR) -> List[str]:
+    """Returns the codes of the languages that have term or char files in data_dir."""
+    return list(set([x.name.split('_')[0] for x in _data_path(data_dir).iterdir()
+                     if x.name.endswith('.csv') and not x.name.startswith('.')]))
+
+
+def read_term_ranks(data_dir, lang_code: str) -> Dict[str, int]:
+    """Reads the term -> rank table for one language from data_dir, or returns an empty table if there isn't one."""
+    tf_file = _data_path(data_dir) / f"{lang_code}_term_rank.csv"
+    if not tf_file.is_file():
+        return {}
+    with tf_file.open() as term_freq_file:
+        return cu.read_rank_file(term_freq_file, MAX_WORDS_PER_LANG)
+
+
+def prepare_char_weights(data_dir=FREQ_DATA_DIR, lang_codes: Optional[List[str]] = None
+                         ) -> Dict[str, List[Tuple[str, float]]]:
+    """Reads the char frequency files for the given languages (default all) and inverts them with invert_char_tables."""
     all_char_freqs = {}
-    for lang_code in set([x.split('_')[0] for x in os.listdir(data_dir)
-                          if x.endswith('.csv') and not x.startswith('.')]):
-        tf_file = os.path.join(data_dir, f"{lang_code}_term_rank.csv")
-        if not os.path.isfile(tf_file):
-            all_term_ranks[lang_code] = {}
-        else:
-            with open(tf_file) as term_freq_file:
-                term_freqs = cu.read_rank_file(term_freq_file, MAX_WORDS_PER_LANG)
-                all_term_ranks[lang_code] = term_freqs
-        cf_file = os.path.join(data_dir, f'{lang_code}_char_freq.csv')
-        if not os.path.isfile(cf_file):
+    for lang_code in lang_codes if lang_codes is not None else list_languages(data_dir):
+        cf_file = _data_path(data_dir) / f'{lang_code}_char_freq.csv'
+        if not cf_file.is_file():
             all_char_freqs[lang_code] = {}
         else:
-            with open(os.path.join(data_dir, f'{lang_code}_char_freq.csv')) as char_freq_file:
+            with cf_file.open() as char_freq_file:
                 all_char_freqs[lang_code] = cu.normalize_score_dict(cu.read_freq_file(char_freq_file))
-    all_char_weights = invert_char_tables(all_char_freqs)
-
-    logging.debug(f"Prepared term and character ranking tables for languages: {sorted(all_term_ranks.keys())}")
-    return all_term_ranks, all_char_weights
+    return invert_char_tables(all_char_freqs)
 
 
 def invert_char_tables(lang_to_char_weight: Dict[str, Dict[str, float]]) -> Dict[str, List[Tuple[str, float]]]:
@@ -116,64 +628,433 @@ def invert_char_tables(lang_to_char_weight: Dict[str, Dict[str, float]]) -> Dict
     return all_char_weights
 
 
+def language_char_weights(all_char_weights: Dict[str, List[Tuple[str, float]]]) -> Dict[str, Dict[str, float]]:
+    """Turns a table of char -> list of (lang, weight) pairs back into a table of lang -> char -> weight."""
+    lang_to_char_weight: Dict[str, Dict[str, float]] = {}
+    for char, lang_weights in all_char_weights.items():
+        for lang, weight in lang_weights:
+            if lang not in lang_to_char_weight:
+                lang_to_char_weight[lang] = {}
+            lang_to_char_weight[lang][char] = weight
+    return lang_to_char_weight
+
+
+def term_weight(rank: int) -> float:
+    """Returns the score contributed by each occurrence of a term with the given rank."""
+    return TERM_PRESENCE_WEIGHT + 1 / math.sqrt(TOP_RANK_DAMPING + rank)
+
+
+def invert_term_tables(all_term_ranks: Dict[str, Dict[str, int]]) -> Dict[str, Tuple[Tuple[str, float], ...]]:
+    """Inverts a table of lang -> term -> rank to a table of term -> tuple of (lang, term weight) pairs.
+
+    Weights are computed once per rank and shared, so every posting for a given rank refers to the same float.
+    """
+    weights_by_rank: Dict[int, float] = {}
+    postings: Dict[str, List[Tuple[str, float]]] = {}
+    # Building about a million small tuples for larger tables sets off many garbage collections that find nothing to
+    # free, which take about a third of the time, so collection is paused until the index is built.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for lang, ranks in all_term_ranks.items():
+            for term, rank in ranks.items():
+                if rank not in weights_by_rank:
+                    weights_by_rank[rank] = term_weight(rank)
+                if term not in postings:
+                    postings[term] = []
+                postings[term].append((lang, weights_by_rank[rank]))
+        return {term: tuple(lang_weights) for term, lang_weights in postings.items()}
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def build_term_index(all_term_ranks: Dict[str, Dict[str, int]]) -> Optional[Dict[str, Tuple[Tuple[str, float], ...]]]:
+    """Returns the term index for the given term ranks.
+
+    Tables that keep their own index, such as compact_tables.CompactTermRanks, provide it with a term_index method.
+    This may return None, as lazy_tables.LazyTermRanks does, in which case score_text looks terms up in the term
+    ranks of each candidate language. Otherwise, the index is built with invert_term_tables."""
+    if hasattr(all_term_ranks, "term_index"):
+        return all_term_ranks.term_index()
+    return invert_term_tables(all_term_ranks)
+
+
+def count_terms(text: str) -> Dict[str, int]:
+    """Tokenizes the text and counts the tokens, dropping single ASCII letters which are not useful as terms."""
+    tokens = Counter(tokenize_fast(text))
+    return {token: count for token, count in tokens.items() if len(token) > 1 or token not in LETTERS}
+
+
 def score_terms(all_term_ranks: Dict[str, Dict[str, int]], text: str, languages: Tuple[str] = ()) -> Dict[str, float]:
     """Gets a score for each language for the given text based on how common the terms are."""
-    tokens = Counter(tokenize_fast(text))
-    tokens = {token: count for token, count in tokens.items() if len(token) > 1 or token not in LETTERS}
-    scores: Dict[str, float] = {}
     if not languages:
-        languages = all_term_ranks.items()
+        languages = all_term_ranks.keys()
+    return score_language_term_counts(all_term_ranks, count_terms(text), languages)
 
+
+def score_language_term_counts(all_term_ranks: Dict[str, Dict[str, int]], tokens: Dict[str, int],
+                               languages: Iterable[str]) -> Dict[str, float]:
+    """Gets a score for each of the given languages from token counts, looking up the tokens in each language's
+    term ranks in turn."""
+    scores: Dict[str, float] = {}
     for lang in languages:
         lang_score = BASELINE_TERM_SCORE
         if lang in all_term_ranks:
             ranks = all_term_ranks[lang]
             for token, count in tokens.items():
                 if token in ranks:
-                    lang_score += (TERM_PRESENCE_WEIGHT + 1 / math.sqrt(TOP_RANK_DAMPING + ranks[token])) * count
+                    lang_score += term_weight(ranks[token]) * count
         scores[lang] = lang_score
     return scores
 
 
-def score_chars(all_char_weights: Dict[str, List[Tuple[str, float]]], text: str) -> Dict[str, float]:
-    """Gets a score for each language for the given text based on how common the characters are."""
-    chars = Counter(text)
-    chars = {char: count for char, count in chars.items() if char.isalpha() and char in all_char_weights}
+def score_term_counts(term_index: Dict[str, Tuple[Tuple[str, float], ...]], term_counts: Dict[str, int],
+                      languages: Tuple[str]) -> Dict[str, float]:
+    """Gets a score for each of the given languages from token counts, using an index built by invert_term_tables.
+
+    Gives exactly the same scores as score_terms, because each language adds up the same term weights in the same
+    order, but looks up each token once rather than once per language.
+    """
+    scores: Dict[str, float] = {lang: BASELINE_TERM_SCORE for lang in languages}
+    for token, count in term_counts.items():
+        for lang, weight in term_index.get(token, ()):
+            if lang in scores:
+                scores[lang] += weight * count
+    return scores
+
+
+def score_chars(all_char_weights: Dict[str, List[Tuple[str, float]]], text: str,
+                candidates: Optional[AbstractSet[str]] = None) -> Dict[str, float]:
+    """Gets a score for each language for the given text based on how common the characters are.
+
+    If a set of candidates is given, other languages are skipped and get no score."""
+    return score_char_counts(all_char_weights, Counter(text), candidates=candidates)
+
+
+def score_char_counts(all_char_weights: Dict[str, List[Tuple[str, float]]], char_counts: Dict[str, int],
+                      candidates: Optional[AbstractSet[str]] = None) -> Dict[str, float]:
+    """Gets a score for each language from a count of each char in a text, as score_chars does for the text."""
+    chars = {char: count for char, count in char_counts.items() if char.isalpha() and char in all_char_weights}
     scores = {}
     for char, count in chars.items():
         for lang, weight in all_char_weights[char]:
+            if candidates is not None and lang not in candidates:
+                continue
             if lang not in scores:
                 scores[lang] = 0
             scores[lang] += weight * count
     return scores
 
 
+def is_computerese(text: str) -> bool:
+    """Returns True if the text starts with one of the COMPUTERESE_STARTS strings, which are never classified."""
+    return text.startswith(COMPUTERESE_PREFIXES)
+
+
 def score_text(all_term_ranks: Dict[str, Dict[str, int]],
                all_char_weights: Dict[str, List[Tuple[str, float]]],
-               text: str) -> List[Tuple[str, float]]:
-    """Gets the term and character scores and combines them into a single score for each language."""
-    if any([text.startswith(x) for x in COMPUTERESE_STARTS]):
-        return []
+               text: str,
+               term_index: Optional[Dict[str, Tuple[Tuple[str, float], ...]]] = None,
+               candidates: Optional[Iterable[str]] = None,
+               priors: Optional[Dict[str, float]] = None,
+               fast_path: Optional[ScriptFastPath] = None,
+               max_term_candidates: Optional[int] = None,
+               max_char_gap: Optional[float] = None,
+               substring_matcher: Optional[SubstringTermMatcher] = None,
+               prefilter: Optional[Prefilter] = None,
+               profiler: Optional[StageProfiler] = None,
+               call: Optional[ProfiledCall] = None) -> List[Tuple[str, float]]:
+    """Gets the term and character scores and combines them into a single score for each language.
+
+    If a term_index built by invert_term_tables is given, it is used for term scoring instead of all_term_ranks.
+    If candidates are given, all other languages are left out of char and term scoring altogether.
+    If priors are given, each language's combined score is multiplied by its prior, or 1 if it doesn't have one.
+    If a ScriptFastPath for all_char_weights is given, texts whose chars all belong to one language return at once,
+    with the same result.
+    If max_term_candidates or max_char_gap are given, fewer languages may go on to term scoring, as described in
+    select_char_contenders.
+    If a SubstringTermMatcher is given, the terms it finds inside tokens are scored instead of those tokens.
+    If a Prefilter is given, texts that it rejects get no scores. Otherwise, texts for which is_computerese is True
+    get no scores.
+    If a StageProfiler is given, the time taken by each stage is recorded in it. See profiling for details. A caller
+    that has started a ProfiledCall for the text itself, to time its own prefilter stage, gives it as call instead.
+    """
+    if profiler is not None:
+        call = profiler.start_call(text)
+    rejected = is_computerese(text) if prefilter is None else prefilter.check(text) is not None
+    if call is not None:
+        call.end_stage("prefilter")
+    if rejected:
+        return call.done("prefilter", []) if call is not None else []
 
-    char_scores = score_chars(all_char_weights, text.lower() if CLASSIFY_CHARS_LOWER_CASE else text)
+    char_scores, term_text = score_char_contenders(all_char_weights, text, candidates=candidates, fast_path=fast_path,
+                                                   max_term_candidates=max_term_candidates, max_char_gap=max_char_gap,
+                                                   call=call)
+    if not char_scores:
+        return call.done("no_char_scores", []) if call is not None else []
+    # Early-out if there is only one contender left (partly to avoid penalizing no term matches without tokenization).
+    if len(char_scores) == 1:
+        scores = apply_priors(char_scores, priors)
+        return call.done("single_contender", scores) if call is not None else scores
+
+    term_counts = _count_text_terms(term_text, substring_matcher, call)
+    if term_index is None:
+        term_scores = score_language_term_counts(all_term_ranks, term_counts, tuple(char_scores))
+    else:
+        term_scores = score_term_counts(term_index, term_counts, tuple(char_scores))
+    if call is None:
+        return combine_scores(char_scores, term_scores, priors)
+    call.end_stage("term_scoring")
+    call.count(term_lookups=len(term_counts) * (len(char_scores) if term_index is None else 1))
+    scores = combine_scores(char_scores, term_scores, priors)
+    call.end_stage("combining")
+    return call.done("scored" if scores else "no_terms_matched", scores)
+
+
+def score_char_contenders(all_char_weights: Dict[str, List[Tuple[str, float]]], text: str,
+                          candidates: Optional[Iterable[str]] = None,
+                          fast_path: Optional[ScriptFastPath] = None,
+                          max_term_candidates: Optional[int] = None,
+                          max_char_gap: Optional[float] = None,
+                          call: Optional[ProfiledCall] = None) -> Tuple[Dict[str, float], str]:
+    """Returns the normalized char scores of the languages that pass the char filter, and the text to use for term
+    scoring (lowercased if CLASSIFY_WORDS_LOWER_CASE is set). The char stages are timed in the call if one is given.
+    See score_text for the other arguments."""
+    if candidates is not None and not isinstance(candidates, AbstractSet):
+        candidates = frozenset(candidates)
+    lowered = text.lower() if CLASSIFY_CHARS_LOWER_CASE or CLASSIFY_WORDS_LOWER_CASE else text
+    term_text = lowered if CLASSIFY_WORDS_LOWER_CASE else text
+    char_text = lowered if CLASSIFY_CHARS_LOWER_CASE else text
+    if fast_path is not None:
+        owner = fast_path.single_language(char_text)
+        if owner is not None and (candidates is None or owner in candidates):
+            if call is not None:
+                call.end_stage("char_scoring")
+                call.count(char_languages=1, contenders=1)
+                call.outcome = "fast_path"
+            return {owner: 1.0}, term_text
+    char_scores = score_chars(all_char_weights, char_text, candidates=candidates)
+    if call is None:
+        return select_char_contenders(char_scores, max_term_candidates=max_term_candidates,
+                                      max_char_gap=max_char_gap), term_text
+    call.end_stage("char_scoring")
+    call.count(char_languages=len(char_scores))
+    char_scores = select_char_contenders(char_scores, max_term_candidates=max_term_candidates,
+                                         max_char_gap=max_char_gap)
+    call.end_stage("char_filter")
+    call.count(contenders=len(char_scores))
+    return char_scores, term_text
+
+
+def _count_text_terms(term_text: str, substring_matcher: Optional[SubstringTermMatcher],
+                      call: Optional[ProfiledCall]) -> Dict[str, int]:
+    """Counts the terms in the text, with the substring_matcher if there is one, timing this in the call if given."""
+    term_counts = count_terms(term_text)
+    if substring_matcher is not None:
+        term_counts = substring_matcher.expand_term_counts(term_counts)
+    if call is not None:
+        call.end_stage("tokenization")
+        call.count(tokens=sum(term_counts.values()), distinct_tokens=len(term_counts))
+    return term_counts
+
+
+def get_pruned_winner(all_term_ranks: Dict[str, Dict[str, int]],
+                      all_char_weights: Dict[str, List[Tuple[str, float]]],
+                      text: str,
+                      term_index: Optional[Dict[str, Tuple[Tuple[str, float], ...]]] = None,
+                      candidates: Optional[Iterable[str]] = None,
+                      priors: Optional[Dict[str, float]] = None,
+                      fast_path: Optional[ScriptFastPath] = None,
+                      max_term_candidates: Optional[int] = None,
+                      max_char_gap: Optional[float] = None,
+                      substring_matcher: Optional[SubstringTermMatcher] = None,
+                      prefilter: Optional[Prefilter] = None,
+                      profiler: Optional[StageProfiler] = None,
+                      call: Optional[ProfiledCall] = None) -> Optional[str]:
+    """Returns the same winner as score_text would (or None), using prune_term_scores to stop scoring languages that
+    can no longer win. The arguments are as for score_text, and priors must not be negative."""
+    if profiler is not None:
+        call = profiler.start_call(text)
+    rejected = is_computerese(text) if prefilter is None else prefilter.check(text) is not None
+    if call is not None:
+        call.end_stage("prefilter")
+    if rejected:
+        return call.done("prefilter", None) if call is not None else None
+    char_scores, term_text = score_char_contenders(all_char_weights, text, candidates=candidates, fast_path=fast_path,
+                                                   max_term_candidates=max_term_candidates, max_char_gap=max_char_gap,
+                                                   call=call)
+    if len(char_scores) <= 1:
+        winner = winner_from_scores(apply_priors(char_scores, priors))[0]
+        if call is None:
+            return winner
+        return call.done("single_contender" if char_scores else "no_char_scores", winner)
+    term_counts = _count_text_terms(term_text, substring_matcher, call)
+    winner = prune_term_scores(all_term_ranks, term_index, term_counts, char_scores, priors)
+    if call is not None:
+        call.end_stage("term_scoring")
+        call.done("pruned", winner)
+    return winner
+
+
+def prune_term_scores(all_term_ranks: Dict[str, Dict[str, int]],
+                      term_index: Optional[Dict[str, Tuple[Tuple[str, float], ...]]],
+                      term_counts: Dict[str, int],
+                      char_scores: Dict[str, float],
+                      priors: Optional[Dict[str, float]] = None) -> Optional[str]:
+    """Scores the tokens in order, like score_term_counts, and returns the language that combine_scores would rank
+    first (or None), dropping languages as soon as they can no longer win.
+
+    Normalizing the term scores doesn't change their order, so the winner is the language with the highest term score
+    times char score times prior. No token can add more than MAX_TERM_WEIGHT per occurrence, so a language whose
+    score plus MAX_TERM_WEIGHT times the number of tokens left, times its char score and prior, is below the leader's
+    current product can never overtake it. With a term_index, tokens that are not in it are left out of the bound,
+    which makes it much tighter, since names, numbers and links are not in any language's terms. Tokens are scored in
+    PRUNE_CHECKS blocks, with languages pruned after each block. Once only one language is left, and some contender
+    has matched a term, the rest of the blocks are skipped. If term_index is None, the tokens in each block are
+    looked up in each remaining language's term ranks.
+    """
+    multipliers = {lang: score * (priors.get(lang, 1.0) if priors else 1.0) for lang, score in char_scores.items()}
+    scores = {lang: BASELINE_TERM_SCORE for lang in char_scores}
+    if term_index is not None:
+        token_postings = []
+        tokens_left = 0
+        for token, count in term_counts.items():
+            postings = term_index.get(token, ())
+            if postings:
+                token_postings.append((postings, count))
+                tokens_left += count
+    else:
+        token_postings = list(term_counts.items())
+        tokens_left = sum(term_counts.values())
+        rank_tables = {lang: all_term_ranks[lang] for lang in char_scores if lang in all_term_ranks}
+    block_size = max(1, len(token_postings) // PRUNE_CHECKS)
+    matched = False
+    for block_start in range(0, len(token_postings), block_size):
+        block = token_postings[block_start:block_start + block_size]
+        if term_index is not None:
+            for postings, count in block:
+                if not matched:
+                    matched = any(lang in char_scores for lang, _ in postings)
+                for lang, weight in postings:
+                    if lang in scores:
+                        scores[lang] += weight * count
+        else:
+            # Languages go in the outer loop, as in score_language_term_counts, so each one's table is found once.
+            for lang in scores:
+                ranks = rank_tables.get(lang)
+                if ranks is not None:
+                    lang_score = scores[lang]
+                    for token, count in block:
+                        if token in ranks:
+                            lang_score += term_weight(ranks[token]) * count
+                    scores[lang] = lang_score
+            if not matched:
+                matched = any(token in ranks for ranks in rank_tables.values() for token, _ in block)
+        tokens_left -= sum(count for _, count in block)
+
+        if len(scores) > 1:
+            leader_product = max(score * multipliers[lang] for lang, score in scores.items())
+            bound = MAX_TERM_WEIGHT * tokens_left
+            scores = {lang: score for lang, score in scores.items()
+                      if (score + bound) * multipliers[lang] >= leader_product * (1 - PRUNE_TOLERANCE)}
+        if len(scores) == 1 and matched:
+            break
+
+    # If no term matched at all, combine_scores returns no scores.
+    if not matched:
+        return None
+    winner = max(scores, key=lambda lang: scores[lang] * multipliers[lang])
+    return winner if scores[winner] * multipliers[winner] > 0 else None
+
+
+def select_char_contenders(char_scores: Dict[str, float], max_term_candidates: Optional[int] = None,
+                           max_char_gap: Optional[float] = None) -> Dict[str, float]:
+    """Drops languages whose char score is not above CHAR_MIN_TO_PLAY times the top char score, and normalizes
+    the scores of the rest. Returns an empty dict if there are no char scores.
+
+    :param max_term_candidates: if given, only keeps this many languages with the highest char scores.
+    :param max_char_gap: if given, sorts the languages by char score, and drops those after the first gap between
+        neighbouring scores of more than this proportion of the top score.
+    Ties are broken by the order of char_scores, which is also the order of the languages that are kept.
+    """
     if not any(char_scores):
-        return []
+        return {}
     char_max = max(char_scores.values())
     char_scores = {k: v for k, v in char_scores.items() if v > char_max * CHAR_MIN_TO_PLAY}
-    char_scores = cu.normalize_score_dict(char_scores) if sum(char_scores.values()) > 0 else char_scores
-    # Early-out if there is only one contender left (partly to avoid penalizing no term matches without tokenization).
-    if len(char_scores) == 1:
-        return list(char_scores.items())
+    if max_term_candidates is not None or max_char_gap is not None:
+        ranked = sorted(char_scores.items(), key=lambda x: x[1], reverse=True)[:max_term_candidates]
+        if max_char_gap is not None:
+            for position in range(1, len(ranked)):
+                if ranked[position - 1][1] - ranked[position][1] > max_char_gap * char_max:
+                    ranked = ranked[:position]
+                    break
+        if len(ranked) < len(char_scores):
+            kept = {lang for lang, _ in ranked}
+            char_scores = {k: v for k, v in char_scores.items() if k in kept}
+    return cu.normalize_score_dict(char_scores) if sum(char_scores.values()) > 0 else char_scores
+
 
-    term_scores = score_terms(
-        all_term_ranks, text.lower() if CLASSIFY_WORDS_LOWER_CASE else text, languages=tuple(char_scores))
+def combine_scores(char_scores: Dict[str, float], term_scores: Dict[str, float],
+                   priors: Optional[Dict[str, float]] = None) -> List[Tuple[str, float]]:
+    """Combines the contenders' normalized char scores with their term scores into sorted (language, score) pairs.
+
+    Returns an empty list if no term matched at all."""
     # If we got this far but have no explicit term matches, then it's usually a spurious classification.
     if not max(term_scores.values()) >= BASELINE_TERM_SCORE + TERM_PRESENCE_WEIGHT:
         return []
     term_scores = cu.normalize_score_dict(term_scores)
 
     combined_scores = {lang: term_scores.get(lang, BASELINE_TERM_SCORE) * char_scores[lang] for lang in char_scores}
-    return sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)
+    return apply_priors(combined_scores, priors)
+
+
+def apply_priors(scores: Dict[str, float], priors: Optional[Dict[str, float]] = None) -> List[Tuple[str, float]]:
+    """Multiplies each language's score by its prior (default 1), and returns the (language, score) pairs sorted
+    from highest to lowest score."""
+    if priors:
+        scores = {lang: score * priors.get(lang, 1.0) for lang, score in scores.items()}
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+def sample_windows(text: str, max_chars: Optional[int] = None, max_tokens: Optional[int] = None,
+                   num_windows: int = DEFAULT_NUM_WINDOWS) -> str:
+    """Returns the text if it fits within the budget, and otherwise num_windows evenly spaced windows from it,
+    joined by newlines, that fit within the budget between them.
+
+    The budget is max_chars characters and / or max_tokens whitespace-separated words (roughly the number of tokens).
+    Windows start and end at whitespace where possible, so that words are not cut in half, except that the first
+    window starts at the very beginning of the text. This is similar to eval_tool.sample_from_big_string.
+    A max_tokens budget on its own does not limit the length of text without whitespace, so use max_chars as well
+    to cap the time taken for any input.
+    """
+    if ((max_chars is None or len(text) <= max_chars)
+            and (max_tokens is None or len(text) <= max_tokens
+                 or sum(1 for _ in itertools.islice(_WORD_REGEX.finditer(text), max_tokens + 1)) <= max_tokens)):
+        return text
+    window_chars = max(1, max_chars // num_windows) if max_chars is not None else None
+    window_tokens = max(1, max_tokens // num_windows) if max_tokens is not None else None
+    windows = []
+    for i in range(num_windows):
+        start = (i * len(text)) // num_windows
+        end = ((i + 1) * len(text)) // num_windows
+        if window_chars is not None:
+            end = min(end, start + window_chars)
+        if i > 0:
+            match = _WHITESPACE_REGEX.search(text, start, end)
+            if match:
+                start = match.end()
+        # The token cut comes first, so that only the words in the window are looked at, not the whole segment.
+        if window_tokens is not None:
+            words = list(itertools.islice(_WORD_REGEX.finditer(text, start, end), window_tokens))
+            if len(words) == window_tokens:
+                end = words[-1].end()
+        if end < len(text) and not text[end].isspace():
+            match = _LAST_WHITESPACE_REGEX.search(text, start, end)
+            if match and match.start() > start:
+                end = match.start()
+        windows.append(text[start:end])
+    return "\n".join(windows)
 
 
 def get_char_winner(all_char_weights: Dict[str, List[Tuple[str, float]]], text: str) -> str:
@@ -184,25 +1065,39 @@ def get_char_winner(all_char_weights: Dict[str, List[Tuple[str, float]]], text:
     return winner if score > 0 else None
 
 
-def get_winner_score(term_dict: Dict[str, Dict[str, int]], char_dict: Dict[str, List[Tuple[str, float]]], text: str
+def get_winner_score(term_dict: Dict[str, Dict[str, int]], char_dict: Dict[str, List[Tuple[str, float]]], text: str,
+                     term_index: Optional[Dict[str, Tuple[Tuple[str, float], ...]]] = None
                      ) -> Tuple[Optional[str], float]:
     """Calls score_text and returns the winning language and its score.
 
     No thresholds or tie-breaking is used. If there is a tie, the winner is unpredictable.
 
     If all scores are zero, the winner is None."""
-    combined_scores = score_text(term_dict, char_dict, text)
+    return winner_from_scores(score_text(term_dict, char_dict, text, term_index=term_index))
+
+
+def winner_from_scores(combined_scores: List[Tuple[str, float]]) -> Tuple[Optional[str], float]:
+    """Returns the winning language and its score from a list of (language, score) pairs.
+
+    If all scores are zero, the winner is None."""
     if len(combined_scores) == 0:
         return None, 0
     winner, score = max(combined_scores, key=lambda x: x[1])
     return winner if score > 0 else None, score
 
 
-def get_winner_margin(term_dict, char_dict, text) -> Tuple[Optional[str], float]:
+def get_winner_margin(term_dict, char_dict, text, term_index=None) -> Tuple[Optional[str], float]:
     """Calls score_text and returns the winning language and how much it won by (compared with second highest score).
 
     If all scores are zero, the winner is None."""
-    scores = score_text(term_dict, char_dict, text)
+    return winner_margin_from_scores(score_text(term_dict, char_dict, text, term_index=term_index))
+
+
+def winner_margin_from_scores(scores: List[Tuple[str, float]]) -> Tuple[Optional[str], float]:
+    """Returns the winning language and its margin over the second highest score from a list of (language, score)
+    pairs. If there is only one language, its score is the margin.
+
+    If all scores are zero, the winner is None."""
     sorted_scores: List[Tuple[str, float]] = sorted(scores, key=lambda x: x[1], reverse=True)
     if len(sorted_scores) == 0:
         return None, 0
@@ -215,10 +1110,11 @@ def get_winner_margin(term_dict, char_dict, text) -> Tuple[Optional[str], float]
 
 def get_winner(all_term_ranks: Dict[str, Dict[str, int]],
                all_char_weights: Dict[str, List[Tuple[str, float]]],
-               text: str) -> Optional[str]:
+               text: str,
+               term_index: Optional[Dict[str, Tuple[Tuple[str, float], ...]]] = None) -> Optional[str]:
     """Calls score_text and returns the language with the highest score.
     If no scores are greater than zero, returns None."""
-    combined_scores = score_text(all_term_ranks, all_char_weights, text)
+    combined_scores = score_text(all_term_ranks, all_char_weights, text, term_index=term_index)
     if len(combined_scores) == 0:
         return None
     winner, score = max(combined_scores, key=lambda x: x[1])
@@ -1,3 +1,5 @@
+import pytest
+
 from lplangid import language_classifier as lc, count_utils as cu
 
 # This is the very simplest way to share data structures between tests.
@@ -61,6 +63,206 @@ def test_classifier_instance():
     assert classifier.get_language_scores("This is English")[0][0] == "en"
 
 
+def test_batch_methods_match_single_text_methods():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    texts = [text for text, _ in TEST_TEXTS] + ["ok", "Gracias", "ok", "", "ok"]
+    assert classifier.get_winners(texts) == [classifier.get_winner(text) for text in texts]
+    assert classifier.get_winner_scores(texts) == [classifier.get_winner_score(text) for text in texts]
+    batch_scores = classifier.get_language_scores_batch(texts)
+    assert batch_scores == [classifier.get_language_scores(text) for text in texts]
+    assert batch_scores[-1] is not batch_scores[-3]
+
+
+def test_result_cache():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    classifier.enable_cache(max_entries=10)
+    assert classifier.get_winner("Gracias") == "es"
+    assert classifier.get_winner("gracias") == "es"
+    assert classifier.get_language_scores("GRACIAS") == classifier.get_language_scores("Gracias")
+    assert classifier.get_winner("Metadata is computerese") is None
+    assert classifier.cache_stats()["hits"] == 3
+    assert classifier.cache_stats()["misses"] == 1
+
+    scores_before = classifier.get_language_scores("gracias")
+    classifier.term_ranks["en"]["gracias"] = 1
+    classifier.update_tables()
+    assert classifier.cache_stats()["entries"] == 0
+    assert classifier.get_language_scores("gracias") != scores_before
+
+
+def test_restrict_to_languages():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    view = classifier.restrict_to(["es", "pt"])
+    assert classifier.restrict_to(("pt", "es")) is view
+    assert view.term_index is classifier.term_index
+    assert view.term_ranks["es"] is classifier.term_ranks["es"]
+    assert sorted(view.term_ranks) == ["es", "pt"] and "en" not in view.term_ranks
+    assert classifier.get_winner("Obrigada, bom dia!") == view.get_winner("Obrigada, bom dia!") == "pt"
+    assert {lang for lang, _ in view.get_language_scores("por favor desactiva mi tarjeta")} <= {"es", "pt"}
+    for char in ["a", "ã", "ñ"]:
+        assert sum(weight for _, weight in view.char_weights[char]) == pytest.approx(1.0)
+    assert {lang for lang_weights in view.char_weights.values() for lang, _ in lang_weights} == {"es", "pt"}
+    assert len(view.char_weights) < len(classifier.char_weights)
+
+    # Restricting gives the same scores as filtering and renormalizing the tables by hand.
+    languages = ["en", "es", "fr", "de"]
+    char_weights = lc.invert_char_tables({lang: lc.language_char_weights(ALL_CHAR_WEIGHTS)[lang] for lang in languages})
+    term_ranks = {lang: ALL_TERM_RANKS[lang] for lang in languages}
+    for text, _ in TEST_TEXTS:
+        assert (dict(classifier.restrict_to(languages).get_language_scores(text))
+                == pytest.approx(dict(lc.score_text(term_ranks, char_weights, text))))
+
+    with pytest.raises(ValueError):
+        classifier.restrict_to(["en", "xx"])
+    classifier.update_tables()
+    assert classifier.restrict_to(["es", "pt"]) is not view
+
+
+def test_restrict_to_keeps_settings():
+    classifier = lc.RRCLanguageClassifier(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS)
+    classifier.enable_cache(max_entries=10, max_bytes=10000)
+    classifier.set_budget(max_tokens=50, num_windows=2)
+    classifier.enable_pruning()
+    classifier.set_term_candidates(max_term_candidates=2, max_char_gap=0.5)
+    classifier.enable_substring_terms(["ja", "zh"])
+    classifier.enable_profiling()
+    view = classifier.restrict_to(["en", "ja"])
+    assert view._budget == (None, 50, 2) and view._prune
+    assert (view.max_term_candidates, view.max_char_gap) == (2, 0.5)
+    assert view.profiler is classifier.profiler
+    assert view._result_cache is not classifier._result_cache
+    assert (view._result_cache.max_entries, view._result_cache.max_bytes) == (10, 10000)
+    assert view.substring_matcher.count_terms("東京大学") == (
+        lc.SubstringTermMatcher.for_languages({"ja": ALL_TERM_RANKS["ja"]}).count_terms("東京大学"))
+
+    assert view.get_language_scores("This is English") == view.get_language_scores("This is English")
+    assert view.cache_stats()["hits"] == 1 and classifier.cache_stats()["hits"] == 0
+    assert view.get_winner("掃除機が壊れた") == "ja"
+    assert classifier.profiling_stats()["calls"] == 2
+
+    # Later changes are passed on to existing views.
+    classifier.set_budget()
+    classifier.disable_pruning()
+    classifier.set_term_candidates()
+    classifier.disable_substring_terms()
+    classifier.disable_profiling()
+    classifier.disable_cache()
+    assert view._budget is None and not view._prune
+    assert view.max_term_candidates is view.max_char_gap is view.substring_matcher is view.profiler is None
+    assert view.cache_stats() == {}
+
+
+def test_candidates_and_priors():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    scores = classifier.get_language_scores("no", candidates=["es", "en"])
+    assert {lang for lang, _ in scores} == {"es", "en"}
+    assert lc.score_chars(ALL_CHAR_WEIGHTS, "no", candidates={"es", "en"}).keys() == {"es", "en"}
+    assert classifier.get_winner("Obrigada, bom dia!", candidates=["pt", "es"]) == "pt"
+    assert classifier.get_language_scores("no", candidates=set(ALL_TERM_RANKS)) == classifier.get_language_scores("no")
+
+    winner, score = classifier.get_winner_score("no")
+    assert winner == "it"
+    assert classifier.get_winner_score("no", priors={"it": 2.0}) == ("it", 2.0 * score)
+    assert classifier.get_winner("no", priors={"it": 0.01}) != "it"
+    assert classifier.get_language_scores("Esto es español", priors={"es": 0.5})[0][1] == 0.5
+
+
+def test_sample_windows():
+    text = " ".join(f"w{i}" for i in range(1000))
+    assert lc.sample_windows(text) is text
+    assert lc.sample_windows(text, max_chars=len(text), max_tokens=1000) is text
+    sample = lc.sample_windows(text, max_chars=80, num_windows=4)
+    assert len(sample) <= 80 + 3
+    assert sample.startswith("w0 w1") and "w267" in sample.split() and "w999" not in sample.split()
+    assert all(word in text.split() for word in sample.split())
+    expected_words = ["w0", "w1", "w267", "w268", "w511", "w512", "w756", "w757"]
+    assert lc.sample_windows(text, max_tokens=8, num_windows=4).split() == expected_words
+    assert len(lc.sample_windows("本" * 10000, max_chars=100)) <= 100 + lc.DEFAULT_NUM_WINDOWS
+
+
+class _RecordingRegex:
+    """Wraps a compiled regex, recording the length of text that each search or finditer call is given."""
+    def __init__(self, regex):
+        self.regex = regex
+        self.spans = []
+
+    def search(self, text, pos=0, endpos=None):
+        self.spans.append((endpos if endpos is not None else len(text)) - pos)
+        return self.regex.search(text, pos, len(text) if endpos is None else endpos)
+
+    def finditer(self, text, pos=0, endpos=None):
+        for match in self.regex.finditer(text, pos, len(text) if endpos is None else endpos):
+            self.spans.append(match.end() - pos)
+            yield match
+
+
+def test_sample_windows_with_max_tokens_only_scans_the_windows(monkeypatch):
+    text = "Hola amigos, esto es un texto bastante largo en español. " * 20000
+    regexes = {name: _RecordingRegex(getattr(lc, name)) for name in ["_LAST_WHITESPACE_REGEX", "_WORD_REGEX"]}
+    for name, regex in regexes.items():
+        monkeypatch.setattr(lc, name, regex)
+    sample = lc.sample_windows(text, max_tokens=80, num_windows=8)
+    assert len(sample.split()) == 80
+    scanned = max(span for regex in regexes.values() for span in regex.spans)
+    assert scanned < 1000 < len(text) // 8
+
+
+def test_budgeted_classification():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    text = "Esto es español, y no quiero nada más. " * 1000
+    classifier.set_budget(max_chars=400)
+    assert classifier.get_winner(text) == "es"
+    assert classifier.get_language_scores(text) == classifier.get_language_scores(lc.sample_windows(text, 400))
+    assert classifier.get_winner("Metadata " + text) is None
+    classifier.set_budget()
+    assert classifier.get_language_scores(text) != classifier.get_language_scores(lc.sample_windows(text, 400))
+
+
+def test_pruned_winner_matches_get_winner():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    lazy_classifier = lc.RRCLanguageClassifier.lazy_instance()
+    texts = [text for text, _ in TEST_TEXTS]
+    texts += [" ".join(texts), "Esto es español, pero não é português. " * 50, "Metadata is not scored", "1 2 3"]
+    for text in texts:
+        for candidates, priors in [(None, None), (["es", "pt", "it"], None), (None, {"pt": 1.5, "en": 0.1})]:
+            expected = classifier.get_winner(text, candidates=candidates, priors=priors)
+            for tables in [classifier, lazy_classifier]:
+                assert lc.get_pruned_winner(tables.term_ranks, tables.char_weights, text, term_index=tables.term_index,
+                                            candidates=candidates, priors=priors) == expected
+
+    classifier.enable_pruning()
+    assert classifier.get_winners(texts) == [lc.get_winner(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS, text) for text in texts]
+    classifier.disable_pruning()
+
+
+def test_select_char_contenders_limits():
+    char_scores = {"es": 0.9, "pt": 1.0, "it": 0.95, "ca": 0.7, "en": 0.5}
+    assert list(lc.select_char_contenders(char_scores)) == ["es", "pt", "it", "ca"]
+    assert list(lc.select_char_contenders(char_scores, max_term_candidates=2)) == ["pt", "it"]
+    assert sum(lc.select_char_contenders(char_scores, max_term_candidates=2).values()) == pytest.approx(1)
+    assert list(lc.select_char_contenders(char_scores, max_char_gap=0.1)) == ["es", "pt", "it"]
+    assert list(lc.select_char_contenders(char_scores, max_char_gap=0.01)) == ["pt"]
+    assert list(lc.select_char_contenders(char_scores, max_term_candidates=1, max_char_gap=0.5)) == ["pt"]
+
+
+def test_set_term_candidates():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    text = "Esto es español, y no quiero nada más."
+    classifier.set_term_candidates(max_term_candidates=3)
+    assert len(classifier.get_language_scores(text)) == 3
+    assert classifier.get_winner(text) == "es"
+    classifier.set_term_candidates(max_term_candidates=1)
+    assert classifier.get_language_scores(text) == [(lc.get_char_winner(ALL_CHAR_WEIGHTS, text.lower()), 1.0)]
+    classifier.set_term_candidates()
+    assert len(classifier.get_language_scores(text)) > 3
+    with pytest.raises(ValueError):
+        classifier.set_term_candidates(max_term_candidates=0)
+    classifier.set_term_candidates(max_term_candidates=3)
+    classifier.enable_pruning()
+    classifier.disable_pruning()
+    assert classifier.max_term_candidates == 3
+
+
 def test_get_winner_score_for_digit():
     ws = lc.get_winner_score(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS, '1')
     assert ws == (None, 0.0)
@@ -83,6 +285,43 @@ def test_invert_char_tables():
     assert len(char_to_lang_weights["t"]) == 1
 
 
+def test_invert_term_tables():
+    term_ranks = {"en": {"the": 1, "of": 2}, "fr": {"de": 1, "the": 3}}
+    term_index = lc.invert_term_tables(term_ranks)
+    assert [lang for lang, _ in term_index["the"]] == ["en", "fr"]
+    assert term_index["the"][0][1] == lc.term_weight(1)
+    assert term_index["de"] == (("fr", lc.term_weight(1)),)
+
+
+def test_term_index_is_built_on_first_use(monkeypatch):
+    built = []
+    invert_term_tables = lc.invert_term_tables
+    monkeypatch.setattr(lc, "invert_term_tables", lambda term_ranks: built.append(1) or invert_term_tables(term_ranks))
+    classifier = lc.RRCLanguageClassifier(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS)
+    view = classifier.restrict_to(["en", "es"])
+    assert built == []
+    assert view.get_winner("Esto es español") == "es"
+    assert classifier.get_winner("This is English") == "en"
+    assert built == [1]
+    assert classifier.term_index == invert_term_tables(ALL_TERM_RANKS)
+    classifier.update_tables()
+    assert built == [1]
+
+
+def test_score_term_counts_matches_score_terms():
+    term_index = lc.invert_term_tables(ALL_TERM_RANKS)
+    for text, _ in TEST_TEXTS:
+        languages = tuple(sorted(ALL_TERM_RANKS))
+        assert (lc.score_term_counts(term_index, lc.count_terms(text.lower()), languages)
+                == lc.score_terms(ALL_TERM_RANKS, text.lower(), languages=languages))
+
+
+def test_indexed_scores_match_unindexed_scores():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    for text, _ in TEST_TEXTS:
+        assert classifier.get_language_scores(text) == lc.score_text(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS, text)
+
+
 def _test_large_precision():
     """Remove _ from the beginning of this and ask Dominic for test data if you want to try this for testing changes.
 
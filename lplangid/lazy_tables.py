@@ -0,0 +1,116 @@
+"""A term_ranks table that reads each language's term rank file the first time that language is scored.
+
+Term scores are only needed for the languages that pass the CHAR_MIN_TO_PLAY char filter, so for most traffic only a
+few languages' term tables are ever used. LazyTermRanks knows which languages there are from the file names, and
+reads a language's term_rank.csv file when that language is first looked up. Loading is thread-safe, and each file
+is read at most once at a time. Each language has its own lock for loading, so that reading one language's file
+doesn't hold up lookups of other languages in other threads.
+
+If max_resident is set, only that many languages are kept in memory, and the least recently used language is dropped
+when another one needs to be loaded. Dropped languages are read in again if they are needed later. Texts in a Latin
+script can have a dozen or more candidate languages, so a limit below that means files are read for nearly every text.
+
+To get a lazy classifier, where the char tables are loaded up front and the term tables on demand, use:
+
+    classifier = RRCLanguageClassifier.lazy_instance(max_resident_languages=20)
+"""
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional
+
+from lplangid import language_classifier as lc
+
+
+class LazyTermRanks(Mapping):
+    """A read-only language -> term -> rank mapping that reads each language's term rank file on first use."""
+    def __init__(self, data_dir: str = lc.FREQ_DATA_DIR, languages: Optional[List[str]] = None,
+                 max_resident: Optional[int] = None):
+        """
+        :param data_dir: the directory with the xx_term_rank.csv files.
+        :param languages: the language codes to serve. Defaults to all the languages with files in data_dir.
+        :param max_resident: the most languages to keep loaded at once, or None to keep every language once loaded.
+        """
+        if max_resident is not None and max_resident < 1:
+            raise ValueError("max_resident must be positive")
+        self.data_dir = str(data_dir)
+        self.languages: List[str] = sorted(languages if languages is not None else lc.list_languages(self.data_dir))
+        self._language_set = frozenset(self.languages)
+        self.max_resident = max_resident
+        self._resident: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        # Guards _resident and the counts, and is never held while reading a file.
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {lang: threading.Lock() for lang in self.languages}
+        self.loads = 0
+        self.evictions = 0
+
+    def __getitem__(self, lang: str) -> Dict[str, int]:
+        ranks = self._resident.get(lang)
+        if ranks is not None:
+            self._mark_used(lang)
+            return ranks
+        if lang not in self._language_set:
+            raise KeyError(lang)
+        with self._load_locks[lang]:
+            # Another thread may have loaded the language while this one waited for its lock.
+            ranks = self._resident.get(lang)
+            if ranks is not None:
+                self._mark_used(lang)
+                return ranks
+            # Reading under the language's lock means that concurrent callers never read the same file twice.
+            ranks = lc.read_term_ranks(self.data_dir, lang)
+            with self._lock:
+                self._resident[lang] = ranks
+                self.loads += 1
+                if self.max_resident is not None:
+                    while len(self._resident) > self.max_resident:
+                        self._resident.popitem(last=False)
+                        self.evictions += 1
+            return ranks
+
+    def _mark_used(self, lang: str):
+        """Moves a loaded language to the most recently used end, if languages can be evicted."""
+        if self.max_resident is not None:
+            with self._lock:
+                # The language may have been evicted by another thread since it was looked up.
+                if lang in self._resident:
+                    self._resident.move_to_end(lang)
+
+    def __getstate__(self):
+        """Pickles only the settings, so that a copy in another process reads the files it needs itself, with locks
+        of its own."""
+        return {"data_dir": self.data_dir, "languages": self.languages, "max_resident": self.max_resident}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __contains__(self, lang) -> bool:
+        """Checks whether there is a table for lang without loading it."""
+        return lang in self._language_set
+
+    def __len__(self) -> int:
+        return len(self.languages)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.languages)
+
+    def term_index(self) -> None:
+        """Returns None, as building a term index would load every language. See build_term_index."""
+        return None
+
+    def resident_languages(self) -> List[str]:
+        """Returns the languages whose term tables are currently loaded, from least to most recently used."""
+        with self._lock:
+            return list(self._resident)
+
+    def evict(self, languages: Optional[List[str]] = None):
+        """Drops the term tables for the given languages (default all) from memory. They are reloaded when needed."""
+        with self._lock:
+            for lang in list(self._resident) if languages is None else languages:
+                if self._resident.pop(lang, None) is not None:
+                    self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of languages loaded now, and the total counts of file loads and evictions."""
+        with self._lock:
+            return {"resident": len(self._resident), "loads": self.loads, "evictions": self.evictions}
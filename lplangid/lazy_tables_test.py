@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from lplangid import language_classifier as lc
+from lplangid.language_classifier_test import ALL_TERM_RANKS, TEST_TEXTS
+from lplangid.lazy_tables import LazyTermRanks
+
+
+def test_lazy_term_ranks_load_on_first_use():
+    term_ranks = LazyTermRanks()
+    assert sorted(term_ranks) == sorted(ALL_TERM_RANKS)
+    assert "en" in term_ranks and "xx" not in term_ranks
+    assert term_ranks.resident_languages() == []
+    assert term_ranks["es"] == ALL_TERM_RANKS["es"]
+    assert term_ranks["es"] is term_ranks["es"]
+    assert term_ranks.resident_languages() == ["es"]
+    assert term_ranks.stats() == {"resident": 1, "loads": 1, "evictions": 0}
+    with pytest.raises(KeyError):
+        term_ranks["xx"]
+
+
+def test_lazy_term_ranks_evict_least_recently_used():
+    term_ranks = LazyTermRanks(max_resident=2)
+    for lang in ["en", "es", "en", "fr"]:
+        term_ranks[lang]
+    assert term_ranks.resident_languages() == ["en", "fr"]
+    assert term_ranks.stats() == {"resident": 2, "loads": 3, "evictions": 1}
+    assert term_ranks["es"] == ALL_TERM_RANKS["es"]
+    term_ranks.evict(["es", "ko"])
+    assert term_ranks.resident_languages() == ["fr"]
+    term_ranks.evict()
+    assert term_ranks.resident_languages() == []
+
+
+def test_lazy_term_ranks_load_each_language_once_across_threads():
+    term_ranks = LazyTermRanks()
+    threads = [threading.Thread(target=lambda: [term_ranks[lang] for lang in ["en", "es", "fr"]]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert term_ranks.stats()["loads"] == 3
+
+
+def test_lazy_classifier_matches_eager_classifier():
+    classifier = lc.RRCLanguageClassifier.lazy_instance(max_resident_languages=3)
+    eager_classifier = lc.RRCLanguageClassifier.default_instance()
+    assert classifier.term_index is None
+    for text, expected in TEST_TEXTS:
+        assert classifier.get_winner(text) == expected
+        scores = classifier.get_language_scores(text)
+        assert dict(scores) == pytest.approx(dict(eager_classifier.get_language_scores(text)))
+    assert len(classifier.resident_languages()) <= 3
+    assert eager_classifier.resident_languages() == sorted(ALL_TERM_RANKS)
+
+
+def test_lazy_classifier_only_loads_candidate_languages():
+    classifier = lc.RRCLanguageClassifier.lazy_instance()
+    classifier.get_winner("This is English")
+    assert "ja" not in classifier.resident_languages()
+    assert "en" in classifier.resident_languages()
+
+
+def test_lazy_term_ranks_loading_does_not_block_other_languages(monkeypatch):
+    term_ranks = LazyTermRanks(max_resident=3)
+    term_ranks["en"]
+    loading, release = threading.Event(), threading.Event()
+    read_term_ranks = lc.read_term_ranks
+
+    def slow_read_term_ranks(data_dir, lang):
+        loading.set()
+        release.wait(10)
+        return read_term_ranks(data_dir, lang)
+
+    monkeypatch.setattr(lc, "read_term_ranks", slow_read_term_ranks)
+    loader = threading.Thread(target=lambda: term_ranks["fr"])
+    loader.start()
+    try:
+        assert loading.wait(10)
+        looked_up = []
+        reader = threading.Thread(target=lambda: looked_up.append(term_ranks["en"]))
+        reader.start()
+        reader.join(5)
+        assert looked_up == [ALL_TERM_RANKS["en"]]
+        assert term_ranks.stats()["resident"] == 1
+    finally:
+        release.set()
+        loader.join()
+    assert term_ranks.resident_languages() == ["en", "fr"]
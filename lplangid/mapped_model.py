@@ -0,0 +1,240 @@
+"""A read-only model file that is memory-mapped and used in place, so that many processes share one copy.
+
+Worker processes that each load (or inherit) the usual dict-based tables end up with their own copies, because even
+reading a Python object updates its reference count and so writes to the memory page it is on. Here the tables are
+kept in a single file holding a string pool, hash tables, and offset / rank / weight arrays. The file is mapped with
+mmap and looked up directly, so its pages stay clean and are shared between every process that maps the file.
+
+The tables are exposed as the same read-only Mappings as compact_tables, so they can be passed to
+RRCLanguageClassifier. Scores are exactly the same as with the usual tables.
+
+To build mapped model files for the bundled data, run `python -m lplangid.mapped_model`, then load one with:
+
+    classifier = mapped_model.load_mapped_classifier(os.path.join(FREQ_DATA_DIR, MAPPED_MODEL_FILENAME))
+"""
+import logging
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+from lplangid import language_classifier as lc
+from lplangid import model_files
+from lplangid.compact_tables import PostingsCharWeights, PostingsTermRanks
+
+MAPPED_MODEL_FILENAME = "mapped_model.lplangid"
+MAPPED_MODEL_MAGIC = b"LPLGMMAP"
+MAPPED_MODEL_FORMAT_VERSION = 1
+# Magic bytes, format version, byte order (0 little, 1 big), max rank, and the 64 hex digits of the source hash.
+HEADER_FORMAT = "<8sIBI64s"
+# The sections of the file, in order, with their array typecodes. Each has an (offset, length) entry in the header.
+SECTIONS = [("languages", "B"), ("terms_per_language", "I"),
+            ("term_pool", "B"), ("term_pool_offsets", "I"), ("term_slots", "I"),
+            ("term_offsets", "I"), ("term_posting_langs", "H"), ("term_posting_ranks", "I"),
+            ("char_pool", "B"), ("char_pool_offsets", "I"), ("char_slots", "I"),
+            ("char_offsets", "I"), ("char_posting_langs", "H"), ("char_posting_weights", "d")]
+SECTION_TABLE_FORMAT = "<" + "QQ" * len(SECTIONS)
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT) + struct.calcsize(SECTION_TABLE_FORMAT)
+ALIGNMENT = 8
+
+
+def _string_hash(encoded: bytes) -> int:
+    """A hash that is the same in every process, unlike the built-in hash of str and bytes."""
+    return zlib.crc32(encoded)
+
+
+def _build_string_table(strings: List[str]) -> Tuple[bytes, array, array]:
+    """Returns the string pool, pool offsets, and open-addressing hash slots (string id + 1, or 0 for empty)."""
+    encoded = [string.encode("utf-8", "surrogatepass") for string in strings]
+    offsets = array("I", [0])
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    num_slots = 1
+    while num_slots < 2 * len(encoded):
+        num_slots *= 2
+    slots = array("I", [0]) * num_slots
+    for string_id, item in enumerate(encoded):
+        slot = _string_hash(item) & (num_slots - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (num_slots - 1)
+        slots[slot] = string_id + 1
+    return b"".join(encoded), offsets, slots
+
+
+class _MappedStringTable:
+    """Looks up string ids in a string pool and hash slots from build_string_table, without copying them."""
+    def __init__(self, pool: memoryview, offsets: memoryview, slots: memoryview):
+        self._pool = pool
+        self._offsets = offsets
+        self._slots = slots
+        self._mask = len(slots) - 1
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def lookup(self, string: str) -> Optional[int]:
+        encoded = string.encode("utf-8", "surrogatepass")
+        slot = _string_hash(encoded) & self._mask
+        while True:
+            entry = self._slots[slot]
+            if entry == 0:
+                return None
+            string_id = entry - 1
+            if self._pool[self._offsets[string_id]:self._offsets[string_id + 1]] == encoded:
+                return string_id
+            slot = (slot + 1) & self._mask
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        for string_id in range(len(self)):
+            yield str(self._pool[self._offsets[string_id]:self._offsets[string_id + 1]], "utf-8"), string_id
+
+
+class MappedModel:
+    """Holds the memory map of a mapped model file and typed views of its sections."""
+    def __init__(self, path: str):
+        with open(path, "rb") as model_file:
+            self._mmap = mmap.mmap(model_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        data = memoryview(self._mmap)
+        if len(data) < HEADER_SIZE:
+            raise ValueError(f"{path} is too short to be a mapped lplangid model file")
+        magic, version, byte_order, self.max_rank, source_hash = struct.unpack_from(HEADER_FORMAT, data)
+        if magic != MAPPED_MODEL_MAGIC:
+            raise ValueError(f"{path} is not a mapped lplangid model file")
+        if version != MAPPED_MODEL_FORMAT_VERSION:
+            raise ValueError(f"Mapped model format version {version} is not supported")
+        if byte_order != (sys.byteorder == "big"):
+            raise ValueError(f"{path} was written on a machine with a different byte order")
+        self.source_hash = source_hash.decode("ascii")
+        section_table = struct.unpack_from(SECTION_TABLE_FORMAT, data, struct.calcsize(HEADER_FORMAT))
+        self.sections = {}
+        for i, (name, typecode) in enumerate(SECTIONS):
+            offset, length = section_table[2 * i], section_table[2 * i + 1]
+            self.sections[name] = data[offset:offset + length].cast(typecode)
+
+
+class MappedTermRanks(PostingsTermRanks):
+    """A read-only language -> term -> rank mapping that reads from a MappedModel."""
+    def __init__(self, model: MappedModel):
+        sections = model.sections
+        self.languages = str(sections["languages"], "utf-8").split("\n")
+        self.terms_per_language = sections["terms_per_language"]
+        self.term_offsets = sections["term_offsets"]
+        self.posting_langs = sections["term_posting_langs"]
+        self.posting_ranks = sections["term_posting_ranks"]
+        self.max_rank = model.max_rank
+        self._terms = _MappedStringTable(sections["term_pool"], sections["term_pool_offsets"], sections["term_slots"])
+        self._init_views()
+
+    def term_id(self, term: str) -> Optional[int]:
+        return self._terms.lookup(term)
+
+    def term_ids_items(self) -> Iterator[Tuple[str, int]]:
+        return self._terms.items()
+
+
+class MappedCharWeights(PostingsCharWeights):
+    """A read-only char -> list of (language, weight) mapping that reads from a MappedModel."""
+    def __init__(self, model: MappedModel):
+        sections = model.sections
+        self.languages = str(sections["languages"], "utf-8").split("\n")
+        self.char_offsets = sections["char_offsets"]
+        self.posting_langs = sections["char_posting_langs"]
+        self.posting_weights = sections["char_posting_weights"]
+        self._chars = _MappedStringTable(sections["char_pool"], sections["char_pool_offsets"], sections["char_slots"])
+
+    def char_id(self, char: str) -> Optional[int]:
+        return self._chars.lookup(char)
+
+    def __len__(self) -> int:
+        return len(self._chars)
+
+    def __iter__(self) -> Iterator[str]:
+        return (char for char, _ in self._chars.items())
+
+
+def write_mapped_model(data_dir: str = lc.FREQ_DATA_DIR, out_path: Optional[str] = None) -> str:
+    """Builds the scoring tables from the CSV files in data_dir and writes them as a mapped model file.
+
+    The file is written to out_path, or to MAPPED_MODEL_FILENAME in data_dir by default. Returns the path written.
+    """
+    out_path = str(out_path or os.path.join(data_dir, MAPPED_MODEL_FILENAME))
+    term_ranks, char_weights = lc.prepare_scoring_tables(data_dir)
+    languages = sorted(set(term_ranks).union(
+        lang for lang_weights in char_weights.values() for lang, _ in lang_weights))
+    language_ids = {lang: lang_id for lang_id, lang in enumerate(languages)}
+
+    term_postings = {}
+    for lang in languages:
+        for term, rank in term_ranks.get(lang, {}).items():
+            if term not in term_postings:
+                term_postings[term] = []
+            term_postings[term].append((language_ids[lang], rank))
+    terms = list(term_postings)
+    term_pool, term_pool_offsets, term_slots = _build_string_table(terms)
+    term_offsets, term_posting_langs, term_posting_ranks = array("I", [0]), array("H"), array("I")
+    for term in terms:
+        term_posting_langs.extend(lang_id for lang_id, _ in term_postings[term])
+        term_posting_ranks.extend(rank for _, rank in term_postings[term])
+        term_offsets.append(len(term_posting_langs))
+
+    chars = list(char_weights)
+    char_pool, char_pool_offsets, char_slots = _build_string_table(chars)
+    char_offsets, char_posting_langs, char_posting_weights = array("I", [0]), array("H"), array("d")
+    for char in chars:
+        char_posting_langs.extend(language_ids[lang] for lang, _ in char_weights[char])
+        char_posting_weights.extend(weight for _, weight in char_weights[char])
+        char_offsets.append(len(char_posting_langs))
+
+    section_data = {
+        "languages": "\n".join(languages).encode("utf-8"),
+        "terms_per_language": array("I", [len(term_ranks.get(lang, {})) for lang in languages]).tobytes(),
+        "term_pool": term_pool, "term_pool_offsets": term_pool_offsets.tobytes(), "term_slots": term_slots.tobytes(),
+        "term_offsets": term_offsets.tobytes(), "term_posting_langs": term_posting_langs.tobytes(),
+        "term_posting_ranks": term_posting_ranks.tobytes(),
+        "char_pool": char_pool, "char_pool_offsets": char_pool_offsets.tobytes(), "char_slots": char_slots.tobytes(),
+        "char_offsets": char_offsets.tobytes(), "char_posting_langs": char_posting_langs.tobytes(),
+        "char_posting_weights": char_posting_weights.tobytes(),
+    }
+    section_table = []
+    position = HEADER_SIZE
+    with open(out_path, "wb") as out_file:
+        out_file.write(b"\0" * HEADER_SIZE)
+        for name, _ in SECTIONS:
+            padding = -position % ALIGNMENT
+            out_file.write(b"\0" * padding)
+            position += padding
+            section_table.extend([position, len(section_data[name])])
+            out_file.write(section_data[name])
+            position += len(section_data[name])
+        out_file.seek(0)
+        max_rank = max(term_posting_ranks, default=0)
+        out_file.write(struct.pack(HEADER_FORMAT, MAPPED_MODEL_MAGIC, MAPPED_MODEL_FORMAT_VERSION,
+                                   sys.byteorder == "big", max_rank, model_files.source_hash(data_dir).encode("ascii")))
+        out_file.write(struct.pack(SECTION_TABLE_FORMAT, *section_table))
+    logging.info(f"Wrote mapped model for {len(languages)} languages from {data_dir} into {out_path}")
+    return out_path
+
+
+def load_mapped_classifier(path: str, data_dir: Optional[str] = None) -> lc.RRCLanguageClassifier:
+    """Returns a classifier that reads its tables from the mapped model file at path.
+
+    If data_dir is given, raises ValueError if the file was built from different CSV files than the ones there now.
+    """
+    model = MappedModel(path)
+    if data_dir is not None and model.source_hash != model_files.source_hash(data_dir):
+        raise ValueError(f"Mapped model {path} is out of date with the data in {data_dir}")
+    return lc.RRCLanguageClassifier(MappedTermRanks(model), MappedCharWeights(model))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    for data_dir in [lc.FREQ_DATA_DIR, lc.FREQ_DATA_DIR + "_bible"]:
+        write_mapped_model(data_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+
+import pytest
+
+from lplangid import language_classifier as lc, mapped_model
+from lplangid.language_classifier_test import ALL_CHAR_WEIGHTS, ALL_TERM_RANKS, TEST_TEXTS
+
+
+@pytest.fixture(scope="module")
+def mapped_model_path(tmp_path_factory):
+    return mapped_model.write_mapped_model(lc.FREQ_DATA_DIR, tmp_path_factory.mktemp("model") / "model.lplangid")
+
+
+def test_mapped_tables_match_dict_tables(mapped_model_path):
+    classifier = mapped_model.load_mapped_classifier(mapped_model_path, data_dir=lc.FREQ_DATA_DIR)
+    assert sorted(classifier.term_ranks) == sorted(ALL_TERM_RANKS)
+    for lang in ["en", "ja", "ru"]:
+        assert len(classifier.term_ranks[lang]) == len(ALL_TERM_RANKS[lang])
+        for term in ["the", "de", "本", "это", "not a term"]:
+            assert classifier.term_ranks[lang].get(term) == ALL_TERM_RANKS[lang].get(term)
+    assert set(classifier.char_weights) == set(ALL_CHAR_WEIGHTS)
+    for char in ["e", "ñ", "本", "ᵔ"]:
+        assert classifier.char_weights.get(char) == ALL_CHAR_WEIGHTS.get(char)
+
+
+def test_mapped_classifier_scores(mapped_model_path):
+    classifier = mapped_model.load_mapped_classifier(mapped_model_path)
+    for text, expected in TEST_TEXTS:
+        assert classifier.get_winner(text) == expected
+        assert classifier.get_language_scores(text) == lc.score_text(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS, text)
+
+
+def test_stale_mapped_model_is_rejected(mapped_model_path, tmp_path):
+    (tmp_path / "en_term_rank.csv").write_text("hello\n")
+    with pytest.raises(ValueError):
+        mapped_model.load_mapped_classifier(mapped_model_path, data_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        mapped_model.MappedModel(str(tmp_path / "en_term_rank.csv"))
+
+
+def _private_kb() -> int:
+    with open("/proc/self/smaps_rollup") as smaps:
+        return sum(int(line.split()[1]) for line in smaps if line.startswith(("Private_Clean", "Private_Dirty")))
+
+
+def _mapping_private_dirty_kb(path: str) -> int:
+    dirty, in_mapping = 0, False
+    with open("/proc/self/smaps") as smaps:
+        for line in smaps:
+            fields = line.split()
+            if "-" in fields[0] and not fields[0].endswith(":"):
+                in_mapping = line.rstrip().endswith(path)
+            elif in_mapping and fields[0] == "Private_Dirty:":
+                dirty += int(fields[1])
+    return dirty
+
+
+_worker_classifier = None
+# Texts made of several thousand vocabulary terms, so that scoring them reads a good part of the tables.
+WORKLOAD_TEXTS = [" ".join(list(ALL_TERM_RANKS[lang])[start:start + 20])
+                  for lang in ["en", "es", "fr", "de", "ru"] for start in range(0, 4000, 20)]
+
+
+def _classify_in_worker(path):
+    before = _private_kb()
+    for text in WORKLOAD_TEXTS:
+        _worker_classifier.get_language_scores(text)
+    return _private_kb() - before, _mapping_private_dirty_kb(path)
+
+
+def _private_growth_per_worker(classifier, path, workers=3):
+    global _worker_classifier
+    _worker_classifier = classifier
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        return pool.map(_classify_in_worker, [path] * workers, chunksize=1)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="Needs Linux /proc memory accounting")
+def test_workers_share_mapped_tables(mapped_model_path):
+    """Each forked worker should add little private memory with the mapped model, and none of it should be copies
+    of the mapped file's pages. The dict-based tables are copied page by page as workers touch them."""
+    mapped_growth = _private_growth_per_worker(mapped_model.load_mapped_classifier(mapped_model_path),
+                                               str(mapped_model_path))
+    dict_growth = _private_growth_per_worker(lc.RRCLanguageClassifier(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS), "")
+    assert all(dirty_kb == 0 for _, dirty_kb in mapped_growth)
+    assert max(growth_kb for growth_kb, _ in mapped_growth) < min(growth_kb for growth_kb, _ in dict_growth) / 3
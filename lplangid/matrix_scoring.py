@@ -0,0 +1,157 @@
+"""Optional NumPy / SciPy backend that scores whole batches of texts using sparse matrix products.
+
+The char_weights and term_ranks tables are compiled into sparse chars x languages and terms x languages matrices,
+and a batch of texts is turned into sparse texts x chars and texts x terms count matrices. Each scoring stage is then
+a single matrix product, and the CHAR_MIN_TO_PLAY filter and baseline rules are applied as array operations.
+
+This needs numpy and scipy, which are not otherwise required by lplangid. Install them with
+`pip install lplangid[matrix]`, or just `pip install numpy scipy`.
+
+Scores agree with language_classifier.score_text up to floating point rounding, because sums are taken in a
+different order.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from lplangid import language_classifier as lc
+from lplangid.prefilter import Prefilter
+
+
+class BatchScores:
+    """Columnar scores for a batch of texts.
+
+    The scores for text i are in language_ids[offsets[i]:offsets[i + 1]] and scores[offsets[i]:offsets[i + 1]],
+    sorted from highest to lowest score. Texts that score_text would not classify have no entries.
+    """
+    def __init__(self, languages: List[str], offsets: np.ndarray, language_ids: np.ndarray, scores: np.ndarray):
+        self.languages = languages
+        self.offsets = offsets
+        self.language_ids = language_ids
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def winners(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns arrays of the winning language id (-1 for no winner) and winning score for each text."""
+        has_scores = self.offsets[1:] > self.offsets[:-1]
+        first = self.offsets[:-1][has_scores]
+        winner_ids = np.full(len(self), -1, dtype=np.int32)
+        winner_scores = np.zeros(len(self), dtype=np.float64)
+        winner_ids[has_scores] = self.language_ids[first]
+        winner_scores[has_scores] = self.scores[first]
+        winner_ids[winner_scores <= 0] = -1
+        return winner_ids, winner_scores
+
+    def winner_languages(self) -> List[Optional[str]]:
+        """Returns the winning language code (or None) for each text."""
+        winner_ids, _ = self.winners()
+        return [self.languages[lang_id] if lang_id >= 0 else None for lang_id in winner_ids]
+
+    def to_lists(self) -> List[List[Tuple[str, float]]]:
+        """Converts to the (language code, score) lists returned by score_text. Allocates a tuple per score."""
+        return [[(self.languages[lang_id], float(score))
+                 for lang_id, score in zip(self.language_ids[start:end], self.scores[start:end])]
+                for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+
+class MatrixScorer:
+    """Holds sparse matrix versions of the scoring tables, with integer ids for languages, chars, and terms."""
+    def __init__(self, term_ranks: Dict[str, Dict[str, int]], char_weights: Dict[str, List[Tuple[str, float]]],
+                 prefilter: Optional[Prefilter] = None):
+        """
+        :param prefilter: texts that this rejects get no scores. Defaults to Prefilter.default(), which rejects the
+            same texts as is_computerese. RRCLanguageClassifier.matrix_scorer passes the classifier's prefilter.
+        """
+        self.prefilter = prefilter if prefilter is not None else Prefilter.default()
+        self.languages: List[str] = sorted(set(term_ranks).union(
+            lang for lang_weights in char_weights.values() for lang, _ in lang_weights))
+        self.language_ids: Dict[str, int] = {lang: i for i, lang in enumerate(self.languages)}
+
+        # Only alphabetic characters are ever scored, so others are left out of the lookup table altogether.
+        chars = sorted(char for char in char_weights if len(char) == 1 and char.isalpha())
+        self.char_ids: Dict[str, int] = {char: i for i, char in enumerate(chars)}
+        self.codepoint_to_char_id = np.full(max([ord(char) for char in chars], default=0) + 1, -1, dtype=np.int32)
+        self.codepoint_to_char_id[[ord(char) for char in chars]] = np.arange(len(chars), dtype=np.int32)
+        rows, cols, vals = [], [], []
+        for char in chars:
+            for lang, weight in char_weights[char]:
+                rows.append(self.char_ids[char])
+                cols.append(self.language_ids[lang])
+                vals.append(weight)
+        self.char_matrix = sparse.csr_matrix(
+            (vals, (rows, cols)), shape=(len(chars), len(self.languages)), dtype=np.float64)
+
+        term_index = lc.invert_term_tables(term_ranks)
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(term_index)}
+        rows, cols, vals = [], [], []
+        for term, postings in term_index.items():
+            for lang, weight in postings:
+                rows.append(self.term_ids[term])
+                cols.append(self.language_ids[lang])
+                vals.append(weight)
+        self.term_matrix = sparse.csr_matrix(
+            (vals, (rows, cols)), shape=(len(term_index), len(self.languages)), dtype=np.float64)
+
+    def char_counts(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        """Returns a sparse texts x chars matrix counting the known alphabetic characters in each text."""
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        codepoints = np.frombuffer("".join(texts).encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        text_ids = np.repeat(np.arange(len(texts)), lengths)
+        in_table = codepoints < len(self.codepoint_to_char_id)
+        char_ids = np.full(len(codepoints), -1, dtype=np.int32)
+        char_ids[in_table] = self.codepoint_to_char_id[codepoints[in_table]]
+        known = char_ids >= 0
+        return sparse.csr_matrix((np.ones(np.count_nonzero(known)), (text_ids[known], char_ids[known])),
+                                 shape=(len(texts), len(self.char_ids)))
+
+    def term_counts(self, texts: Sequence[str], rows: np.ndarray) -> sparse.csr_matrix:
+        """Returns a sparse matrix counting the known terms in each of the given rows of texts."""
+        row_ids, term_ids, counts = [], [], []
+        for row in rows:
+            for term, count in lc.count_terms(texts[row]).items():
+                term_id = self.term_ids.get(term)
+                if term_id is not None:
+                    row_ids.append(row)
+                    term_ids.append(term_id)
+                    counts.append(count)
+        return sparse.csr_matrix((counts, (row_ids, term_ids)), shape=(len(texts), len(self.term_ids)),
+                                 dtype=np.float64)
+
+    def score_batch(self, texts: Sequence[str]) -> BatchScores:
+        """Scores a batch of texts, following the same rules as language_classifier.score_text."""
+        check = self.prefilter.check
+        lowered = ["" if check(text) is not None else text.lower() for text in texts]
+
+        char_scores = (self.char_counts(lowered) @ self.char_matrix).toarray()
+        char_max = char_scores.max(axis=1, initial=0)
+        candidates = char_scores > (char_max * lc.CHAR_MIN_TO_PLAY)[:, None]
+        char_scores = np.where(candidates, char_scores, 0)
+        char_scores /= np.maximum(char_scores.sum(axis=1), np.finfo(np.float64).tiny)[:, None]
+        num_candidates = candidates.sum(axis=1)
+
+        # Texts with a single candidate language are classified by their characters alone, as in score_text.
+        combined = char_scores
+        contested = np.flatnonzero(num_candidates > 1)
+        if len(contested):
+            term_scores = lc.BASELINE_TERM_SCORE + (self.term_counts(lowered, contested) @ self.term_matrix).toarray()
+            term_scores = np.where(candidates, term_scores, 0)
+            matched = term_scores.max(axis=1) >= lc.BASELINE_TERM_SCORE + lc.TERM_PRESENCE_WEIGHT
+            term_scores /= np.maximum(term_scores.sum(axis=1), np.finfo(np.float64).tiny)[:, None]
+            combined = np.where((num_candidates > 1)[:, None], term_scores * char_scores, char_scores)
+            unmatched = np.zeros(len(texts), dtype=bool)
+            unmatched[contested] = ~matched[contested]
+            candidates[unmatched] = False
+
+        rows, cols = np.nonzero(candidates)
+        vals = combined[rows, cols]
+        order = np.lexsort((-vals, rows))
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(texts)), out=offsets[1:])
+        return BatchScores(self.languages, offsets, cols[order].astype(np.int32), vals[order])
+
+    def get_winners(self, texts: Sequence[str]) -> List[Optional[str]]:
+        """Returns the winning language code (or None) for each text."""
+        return self.score_batch(texts).winner_languages()
@@ -0,0 +1,43 @@
+import pytest
+
+from lplangid import language_classifier as lc
+from lplangid.language_classifier_test import TEST_TEXTS
+from lplangid.prefilter import Prefilter
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+CLASSIFIER = lc.RRCLanguageClassifier.default_instance()
+
+
+def test_matrix_scorer_winners():
+    texts = [text for text, _ in TEST_TEXTS]
+    winners = CLASSIFIER.matrix_scorer().get_winners(texts)
+    for (text, expected), winner in zip(TEST_TEXTS, winners):
+        assert winner == expected, f"Expected {expected} instead of {winner} for \"{text}\""
+
+
+def test_matrix_scorer_scores_match_score_text():
+    texts = [text for text, _ in TEST_TEXTS] + ["", "1", "Ok thanks, bye"]
+    batch_scores = CLASSIFIER.matrix_scorer().score_batch(texts)
+    assert len(batch_scores) == len(texts)
+    for text, scores in zip(texts, batch_scores.to_lists()):
+        expected = CLASSIFIER.get_language_scores(text)
+        assert [lang for lang, _ in scores] == [lang for lang, _ in expected]
+        assert [score for _, score in scores] == pytest.approx([score for _, score in expected])
+
+
+def test_batch_scores_winners_are_columnar():
+    winner_ids, winner_scores = CLASSIFIER.matrix_scorer().score_batch(["Esto es español", "123"]).winners()
+    assert isinstance(winner_ids, np.ndarray)
+    assert CLASSIFIER.matrix_scorer().languages[winner_ids[0]] == "es"
+    assert winner_ids[1] == -1 and winner_scores[1] == 0
+
+
+def test_matrix_scorer_uses_classifier_prefilter():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    texts = ["Metadata: this is English", "see https://example.com now", "Esto es español"]
+    assert classifier.matrix_scorer().get_winners(texts) == [None, "en", "es"]
+    classifier.set_prefilter(Prefilter.from_config({"patterns": {"url": r"https?://\S+"}}))
+    assert classifier.matrix_scorer().get_winners(texts) == ["en", None, "es"]
+    assert classifier.prefilter_stats() == {"url": 1, "texts_checked": 3}
@@ -0,0 +1,173 @@
+"""Compiles the CSV frequency data into a single binary model file, and loads it back.
+
+Reading the CSV files for every language and normalizing and inverting the char tables takes a while, especially for
+the bible data. A compiled model file holds the term ranks and char weights already built, and is loaded in one bulk
+read. The term index is not stored: it is several times the size of the term ranks, and the classifier builds it
+from them the first time it scores a text, so that loading stays quick. Each compiled file records a hash of the CSV
+files it was built from, and if these have changed since, the loader ignores the compiled file and falls back to
+reading the CSV files. The same happens if the file was
+written by a different Python version, since the tables are stored with marshal.
+
+To compile the bundled models in place (for example, before building a wheel), run `python -m lplangid.model_files`.
+Add --single-token-results to also compile the optional precomputed results for single token texts (see single_token).
+"""
+import gc
+import hashlib
+import importlib.resources
+import logging
+import marshal
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from lplangid import language_classifier as lc
+
+COMPILED_MODEL_FILENAME = "compiled_model.lplangid"
+SINGLE_TOKEN_RESULTS_FILENAME = "single_token_results.lplangid"
+MODEL_MAGIC = b"LPLANGID"
+MODEL_FORMAT_VERSION = 3
+# Magic bytes, format version, marshal version, the major and minor Python version, and the 64 hex digits of the
+# source hash. The tables are stored with marshal, whose format is not guaranteed to be the same in other Python
+# versions, so files are only read by the marshal and Python versions that wrote them.
+HEADER_FORMAT = "<8sIIBB64s"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+ScoringTables = Tuple[Dict[str, Dict[str, int]], Dict[str, List[Tuple[str, float]]]]
+
+
+def packaged_data_dir(name: str = "freq_data"):
+    """Returns the bundled data directory with this name, as an importlib.resources Traversable."""
+    return importlib.resources.files("lplangid") / name
+
+
+def source_hash(data_dir) -> str:
+    """Returns a hash of the CSV files in data_dir (a path or Traversable) and the settings used to compile them."""
+    data_dir = Path(data_dir) if isinstance(data_dir, (str, os.PathLike)) else data_dir
+    sha = hashlib.sha256(f"{MODEL_FORMAT_VERSION},{lc.MAX_WORDS_PER_LANG}".encode())
+    for entry in sorted(data_dir.iterdir(), key=lambda x: x.name):
+        if entry.name.endswith(".csv") and not entry.name.startswith("."):
+            sha.update(entry.name.encode("utf-8") + b"\0")
+            sha.update(entry.read_bytes())
+    return sha.hexdigest()
+
+
+def compile_model(data_dir: Union[str, os.PathLike] = lc.FREQ_DATA_DIR,
+                  out_path: Optional[Union[str, os.PathLike]] = None) -> str:
+    """Builds the scoring tables from the CSV files in data_dir and writes them to a compiled model file.
+
+    The file is written to out_path, or to COMPILED_MODEL_FILENAME in data_dir by default. Returns the path written.
+    """
+    out_path = str(out_path or os.path.join(data_dir, COMPILED_MODEL_FILENAME))
+    term_ranks, char_weights = lc.prepare_scoring_tables(data_dir)
+    with open(out_path, "wb") as out_file:
+        out_file.write(_compiled_file_header(data_dir))
+        out_file.write(marshal.dumps((term_ranks, char_weights)))
+    logging.info(f"Compiled model for {len(term_ranks)} languages from {data_dir} into {out_path}")
+    return out_path
+
+
+def read_compiled_model(data: bytes) -> Tuple[str, ScoringTables]:
+    """Returns the source hash and the (term ranks, char weights) tables from compiled model bytes."""
+    file_hash, (term_ranks, char_weights) = _read_compiled_file(data)
+    return file_hash, (term_ranks, char_weights)
+
+
+def _compiled_file_header(data_dir) -> bytes:
+    """Returns the header for a compiled file built from the data in data_dir by this Python."""
+    return struct.pack(HEADER_FORMAT, MODEL_MAGIC, MODEL_FORMAT_VERSION, marshal.version, *sys.version_info[:2],
+                       source_hash(data_dir).encode("ascii"))
+
+
+def _read_compiled_file(data: bytes):
+    """Checks the header of a compiled file, and returns its source hash and its unmarshalled contents."""
+    if len(data) < HEADER_SIZE:
+        raise ValueError("Compiled model file is too short")
+    magic, version, marshal_version, python_major, python_minor, file_hash = struct.unpack_from(HEADER_FORMAT, data)
+    if magic != MODEL_MAGIC:
+        raise ValueError("Not a compiled lplangid model file")
+    if version != MODEL_FORMAT_VERSION:
+        raise ValueError(f"Compiled model format version {version} is not supported (expected {MODEL_FORMAT_VERSION})")
+    if (marshal_version, python_major, python_minor) != (marshal.version, *sys.version_info[:2]):
+        raise ValueError(f"Compiled file was written with marshal version {marshal_version} by Python "
+                         f"{python_major}.{python_minor}, and this is marshal version {marshal.version} in Python "
+                         f"{sys.version_info[0]}.{sys.version_info[1]}. Compile it again with this Python")
+    # Unmarshalling creates a tuple or list for every table entry, each of which counts towards the garbage collector's
+    # thresholds, so collections are paused meanwhile rather than repeatedly scanning tables that can't hold cycles.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        contents = marshal.loads(memoryview(data)[HEADER_SIZE:])
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return file_hash.decode("ascii"), contents
+
+
+def load_scoring_tables(data_dir=lc.FREQ_DATA_DIR) -> ScoringTables:
+    """Returns the term ranks and char weights for the data in data_dir (a path or Traversable).
+
+    Uses the compiled model file in data_dir if there is one and it is up to date. Otherwise reads the CSV files
+    with prepare_scoring_tables, from the same path or Traversable.
+    """
+    data_dir = Path(data_dir) if isinstance(data_dir, (str, os.PathLike)) else data_dir
+    compiled_file = data_dir / COMPILED_MODEL_FILENAME
+    if compiled_file.is_file():
+        try:
+            file_hash, tables = read_compiled_model(compiled_file.read_bytes())
+            if file_hash == source_hash(data_dir):
+                return tables
+            logging.warning(f"Compiled model {compiled_file} is out of date, so reading CSV files instead. "
+                            f"Run compile_model to update it.")
+        except (ValueError, EOFError, TypeError) as error:
+            logging.warning(f"Could not read compiled model {compiled_file} ({error}), so reading CSV files instead.")
+    return lc.prepare_scoring_tables(data_dir)
+
+
+def compile_single_token_results(data_dir: Union[str, os.PathLike] = lc.FREQ_DATA_DIR,
+                                 out_path: Optional[Union[str, os.PathLike]] = None) -> str:
+    """Builds the single token results (see single_token) for the data in data_dir and writes them to a file.
+
+    The file is written to out_path, or to SINGLE_TOKEN_RESULTS_FILENAME in data_dir by default. Returns the path
+    written. This scores every term in every language, so takes about a minute for the bible data."""
+    # Imported here because single_token imports language_classifier when building results.
+    from lplangid.single_token import build_single_token_results
+    out_path = str(out_path or os.path.join(data_dir, SINGLE_TOKEN_RESULTS_FILENAME))
+    classifier = lc.RRCLanguageClassifier(*load_scoring_tables(data_dir))
+    results = build_single_token_results(classifier)
+    with open(out_path, "wb") as out_file:
+        out_file.write(_compiled_file_header(data_dir))
+        out_file.write(marshal.dumps(results))
+    logging.info(f"Compiled single token results for {len(results)} terms from {data_dir} into {out_path}")
+    return out_path
+
+
+def load_single_token_results(data_dir=lc.FREQ_DATA_DIR) -> Optional[Dict[str, Tuple[Optional[str], float]]]:
+    """Returns the single token results compiled for data_dir (a path or Traversable), or None if there is no such
+    file or it is out of date."""
+    data_dir = Path(data_dir) if isinstance(data_dir, (str, os.PathLike)) else data_dir
+    results_file = data_dir / SINGLE_TOKEN_RESULTS_FILENAME
+    if not results_file.is_file():
+        return None
+    try:
+        file_hash, results = _read_compiled_file(results_file.read_bytes())
+        if file_hash == source_hash(data_dir):
+            return results
+        logging.warning(f"Single token results {results_file} are out of date, so not using them. "
+                        f"Run compile_single_token_results to update them.")
+    except (ValueError, EOFError, TypeError) as error:
+        logging.warning(f"Could not read single token results {results_file} ({error}).")
+    return None
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    for data_dir in [lc.FREQ_DATA_DIR, lc.FREQ_DATA_DIR + "_bible"]:
+        compile_model(data_dir)
+        if "--single-token-results" in sys.argv[1:]:
+            compile_single_token_results(data_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import marshal
+import shutil
+import struct
+import zipfile
+
+import pytest
+
+from lplangid import language_classifier as lc, model_files
+from lplangid.language_classifier_test import ALL_CHAR_WEIGHTS, ALL_TERM_RANKS, TEST_TEXTS
+
+
+def _count_csv_reads(monkeypatch):
+    """Patches prepare_scoring_tables to count its calls, which load_scoring_tables makes when it falls back to the
+    CSV files, and returns the list of counts."""
+    calls = []
+    prepare_scoring_tables = lc.prepare_scoring_tables
+
+    def counting_prepare_scoring_tables(data_dir):
+        calls.append(data_dir)
+        return prepare_scoring_tables(data_dir)
+    monkeypatch.setattr(lc, "prepare_scoring_tables", counting_prepare_scoring_tables)
+    return calls
+
+
+def test_compile_and_load_model(tmp_path):
+    out_path = model_files.compile_model(lc.FREQ_DATA_DIR, tmp_path / "model.lplangid")
+    file_hash, (term_ranks, char_weights) = model_files.read_compiled_model(open(out_path, "rb").read())
+    assert file_hash == model_files.source_hash(lc.FREQ_DATA_DIR)
+    assert term_ranks == ALL_TERM_RANKS
+    assert char_weights == {char: list(weights) for char, weights in ALL_CHAR_WEIGHTS.items()}
+
+
+def test_load_falls_back_to_csv_when_stale(tmp_path, monkeypatch):
+    data_dir = tmp_path / "freq_data"
+    shutil.copytree(lc.FREQ_DATA_DIR, data_dir)
+    csv_reads = _count_csv_reads(monkeypatch)
+    model_files.load_scoring_tables(data_dir)
+    assert len(csv_reads) == 1
+
+    model_files.compile_model(data_dir)
+    csv_reads.clear()
+    assert model_files.load_scoring_tables(data_dir)[0] == ALL_TERM_RANKS
+    classifier = lc.RRCLanguageClassifier.from_data_dir(str(data_dir))
+    assert not csv_reads
+    for text, expected in TEST_TEXTS:
+        assert classifier.get_winner(text) == expected
+
+    with open(data_dir / "en_term_rank.csv", "a") as rank_file:
+        rank_file.write("\nnewword\n")
+    term_ranks, _ = model_files.load_scoring_tables(data_dir)
+    assert len(csv_reads) == 1
+    assert "newword" in term_ranks["en"]
+
+
+def test_load_ignores_bad_compiled_file(tmp_path, monkeypatch):
+    data_dir = tmp_path / "freq_data"
+    shutil.copytree(lc.FREQ_DATA_DIR, data_dir)
+    (data_dir / model_files.COMPILED_MODEL_FILENAME).write_bytes(b"not a model")
+    csv_reads = _count_csv_reads(monkeypatch)
+    assert model_files.load_scoring_tables(data_dir)[0] == ALL_TERM_RANKS
+    assert len(csv_reads) == 1
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_load_from_zipped_data(tmp_path, compiled):
+    data_dir = tmp_path / "freq_data"
+    shutil.copytree(lc.FREQ_DATA_DIR, data_dir)
+    if compiled:
+        model_files.compile_model(data_dir)
+    zip_path = tmp_path / "data.zip"
+    with zipfile.ZipFile(zip_path, "w") as zip_file:
+        for path in data_dir.iterdir():
+            zip_file.write(path, f"freq_data/{path.name}")
+    with zipfile.ZipFile(zip_path) as zip_file:
+        term_ranks, char_weights = model_files.load_scoring_tables(zipfile.Path(zip_file, "freq_data/"))
+    assert term_ranks == ALL_TERM_RANKS
+    assert char_weights == {char: list(weights) for char, weights in ALL_CHAR_WEIGHTS.items()}
+
+
+def test_compile_and_load_single_token_results(tmp_path):
+    data_dir = tmp_path / "freq_data"
+    shutil.copytree(lc.FREQ_DATA_DIR, data_dir)
+    assert model_files.load_single_token_results(data_dir) is None
+    model_files.compile_single_token_results(data_dir)
+    results = model_files.load_single_token_results(data_dir)
+    assert results["gracias"] == lc.get_winner_score(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS, "gracias")
+    classifier = lc.RRCLanguageClassifier.from_data_dir(str(data_dir), single_token_results=True)
+    assert classifier.single_token_results == results
+
+    with open(data_dir / "en_term_rank.csv", "a") as rank_file:
+        rank_file.write("\nnewword\n")
+    assert model_files.load_single_token_results(data_dir) is None
+
+
+def test_load_rejects_other_marshal_version(tmp_path, monkeypatch):
+    data_dir = tmp_path / "freq_data"
+    shutil.copytree(lc.FREQ_DATA_DIR, data_dir)
+    compiled_path = model_files.compile_model(data_dir)
+    data = bytearray(open(compiled_path, "rb").read())
+    struct.pack_into("<I", data, 12, marshal.version + 1)
+    with pytest.raises(ValueError, match="marshal version"):
+        model_files.read_compiled_model(bytes(data))
+    open(compiled_path, "wb").write(data)
+    csv_reads = _count_csv_reads(monkeypatch)
+    model_files.load_scoring_tables(data_dir)
+    assert len(csv_reads) == 1
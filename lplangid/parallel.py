@@ -0,0 +1,87 @@
+"""Classifies large numbers of texts using a pool of worker processes that share the parent's scoring tables.
+
+The classifier is loaded once in the parent process. Where the 'fork' start method is available (Linux and most
+Unix systems), the workers inherit the classifier's tables copy-on-write rather than reloading or unpickling them.
+Elsewhere, the classifier is pickled to each worker. Result caches and profilers are pickled without their contents,
+so each worker starts with empty ones.
+"""
+import gc
+import itertools
+import multiprocessing
+import os
+from collections import deque
+from typing import Iterable, Iterator, List, Optional
+
+BATCH_METHODS = ("get_winners", "get_winner_scores", "get_language_scores_batch")
+
+# The classifier used by each worker process, set by _init_worker.
+_worker_classifier = None
+
+
+def _init_worker(classifier):
+    global _worker_classifier
+    _worker_classifier = classifier
+
+
+def _classify_chunk(method: str, texts: List[str]) -> list:
+    return getattr(_worker_classifier, method)(texts)
+
+
+def _chunks(texts: Iterable[str], chunksize: int) -> Iterator[List[str]]:
+    iterator = iter(texts)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def classify_parallel(classifier, texts: Iterable[str], workers: Optional[int] = None, chunksize: int = 1000,
+                      method: str = "get_winners") -> Iterator:
+    """Yields the result of classifying each text, in input order, using a pool of worker processes.
+
+    :param classifier: the RRCLanguageClassifier to use, already loaded in this process.
+    :param texts: any iterable of strings. It is read lazily, so it can be larger than memory.
+    :param workers: the number of worker processes, defaulting to the number of CPUs. With 1 worker, texts are
+        classified in this process without starting a pool.
+    :param chunksize: the number of texts sent to a worker at a time.
+    :param method: the batch method to call for each chunk, one of BATCH_METHODS.
+
+    At most two chunks per worker are in flight at once, so memory use does not grow with the input. The arguments
+    are checked when this is called, and the pool is started when the first result is asked for.
+    """
+    if method not in BATCH_METHODS:
+        raise ValueError(f"method must be one of {BATCH_METHODS}, got '{method}'")
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be positive, got {chunksize}")
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return _classify_in_process(classifier, texts, chunksize, method)
+    return _classify_in_pool(classifier, texts, workers, chunksize, method)
+
+
+def _classify_in_process(classifier, texts: Iterable[str], chunksize: int, method: str) -> Iterator:
+    for chunk in _chunks(texts, chunksize):
+        yield from getattr(classifier, method)(chunk)
+
+
+def _classify_in_pool(classifier, texts: Iterable[str], workers: int, chunksize: int, method: str) -> Iterator:
+    # Builds the term index now if it hasn't been used yet, so that the workers share it rather than each building
+    # their own copy.
+    classifier.term_index
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    # Freezing moves the loaded tables out of the garbage collector's view, so that collections in the workers
+    # don't write to (and so copy) the pages holding them.
+    gc.freeze()
+    try:
+        pool = context.Pool(workers, initializer=_init_worker, initargs=(classifier,))
+    finally:
+        gc.unfreeze()
+    with pool:
+        in_flight = deque()
+        for chunk in _chunks(texts, chunksize):
+            in_flight.append(pool.apply_async(_classify_chunk, (method, chunk)))
+            if len(in_flight) >= 2 * workers:
+                yield from in_flight.popleft().get()
+        while in_flight:
+            yield from in_flight.popleft().get()
@@ -0,0 +1,63 @@
+import multiprocessing
+import pickle
+
+import pytest
+
+from lplangid import language_classifier as lc, parallel
+from lplangid.language_classifier_test import TEST_TEXTS
+
+CLASSIFIER = lc.RRCLanguageClassifier.default_instance()
+TEXTS = [text for text, _ in TEST_TEXTS] * 5
+
+
+def test_classify_parallel_preserves_order():
+    results = list(CLASSIFIER.classify_parallel(iter(TEXTS), workers=2, chunksize=7))
+    assert results == [expected for _, expected in TEST_TEXTS] * 5
+
+
+def test_classify_parallel_methods():
+    results = list(CLASSIFIER.classify_parallel(TEXTS, workers=3, chunksize=4, method="get_winner_scores"))
+    assert results == CLASSIFIER.get_winner_scores(TEXTS)
+    assert list(CLASSIFIER.classify_parallel(TEXTS, workers=1, method="get_language_scores_batch")) \
+        == CLASSIFIER.get_language_scores_batch(TEXTS)
+
+
+def test_classify_parallel_empty_input():
+    assert list(CLASSIFIER.classify_parallel([], workers=2)) == []
+
+
+def test_classify_parallel_bad_arguments():
+    # The arguments are checked on the call, before any results are asked for.
+    with pytest.raises(ValueError):
+        parallel.classify_parallel(CLASSIFIER, TEXTS, method="get_winner")
+    with pytest.raises(ValueError):
+        parallel.classify_parallel(CLASSIFIER, TEXTS, chunksize=0)
+
+
+def test_configured_classifier_pickles_without_cache_contents():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    classifier.enable_cache(max_entries=100)
+    classifier.enable_profiling(slow_call_seconds=0.5)
+    classifier.restrict_to(["en", "es"])
+    classifier.get_winners(TEXTS)
+    assert classifier.cache_stats()["entries"] > 0 and classifier.profiling_stats()["calls"] > 0
+    copy = pickle.loads(pickle.dumps(classifier))
+    assert copy.cache_stats()["entries"] == 0 and copy._result_cache.max_entries == 100
+    assert copy.profiling_stats()["calls"] == 0 and copy.profiler.slow_call_seconds == 0.5
+    assert copy.get_winners(TEXTS) == classifier.get_winners(TEXTS)
+    assert copy.restrict_to(["es", "en"]).get_winner("Esto es español") == "es"
+
+    lazy = lc.RRCLanguageClassifier.lazy_instance(max_resident_languages=2)
+    assert lazy.get_winner("Esto es español") == "es"
+    lazy_copy = pickle.loads(pickle.dumps(lazy))
+    assert lazy_copy.resident_languages() == []
+    assert lazy_copy.get_winner("Esto es español") == "es"
+
+
+def test_classify_parallel_without_fork(monkeypatch):
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    classifier.enable_cache()
+    classifier.get_winners(TEXTS)
+    spawn_context = multiprocessing.get_context("spawn")
+    monkeypatch.setattr(parallel.multiprocessing, "get_context", lambda method=None: spawn_context)
+    assert list(classifier.classify_parallel(TEXTS, workers=2, chunksize=7)) == classifier.get_winners(TEXTS)
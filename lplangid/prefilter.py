@@ -0,0 +1,257 @@
+"""Rules for texts that should not be classified at all, such as machine-generated messages, checked before scoring.
+
+A Prefilter is built from a config dict (or a JSON file with the same structure), for example:
+
+    {
+        "prefixes": {"computerese": ["<!", "Metadata", "http"]},
+        "patterns": {"url": "https?://\\\\S+", "stack_trace": "Traceback \\\\(most recent call last\\\\)"},
+        "min_alpha_ratio": 0.3,
+        "min_length": 1,
+        "max_length": 100000
+    }
+
+- prefixes: named groups of strings. A text that starts with any of them is rejected.
+- patterns: named regular expressions. A text is rejected if any of them match anywhere in it. Patterns without
+  groups or global inline flags are compiled into a single regex with a named group for each, so each text is
+  searched once for all of them. Patterns with groups (whose backreferences, such as \\1, would point at the wrong
+  group once combined) or global flags (such as a leading (?i), which would apply to every pattern) are compiled and
+  searched for on their own. To keep a pattern in the single search, use (?:...) for its groups and scoped flags
+  such as (?i:...).
+- min_alpha_ratio: texts in which fewer than this proportion of the characters are letters are rejected, which
+  catches JSON, base64, numbers and other machine-generated text.
+- min_length and max_length: texts shorter or longer than these are rejected.
+
+check returns the name of the first rule that rejects a text, checking the cheapest rules first, and counts how
+often each rule was hit, so that callers can see how much traffic each rule drops. The default prefilter has a
+single "computerese" prefix rule with the COMPUTERESE_STARTS strings, which gives the same results as is_computerese.
+
+The patterns and min_alpha_ratio rules look at every char of the text. When a classifier has a budget (see
+RRCLanguageClassifier.set_budget), it passes check the windows of the text that it is going to score as a sample, and
+these two rules are checked on the sample rather than the whole text, so that their time is capped by the budget too.
+The prefixes and lengths are still checked on the whole text, as they take the same time however long it is.
+
+For text that arrives a piece at a time, as in IncrementalScorer, stream returns a StreamCheck that applies the same
+rules to each piece as it arrives.
+"""
+import json
+import re
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from lplangid.const_data import COMPUTERESE_STARTS
+
+CONFIG_KEYS = {"prefixes", "patterns", "min_alpha_ratio", "min_length", "max_length"}
+_DEFAULT_PATTERN_FLAGS = re.compile("").flags
+# StreamCheck finds pattern matches that are split between pieces of text if they are at most this long.
+PATTERN_OVERLAP_CHARS = 256
+
+
+class Prefilter:
+    def __init__(self, prefixes: Optional[Dict[str, Iterable[str]]] = None,
+                 patterns: Optional[Dict[str, str]] = None,
+                 min_alpha_ratio: Optional[float] = None,
+                 min_length: Optional[int] = None,
+                 max_length: Optional[int] = None):
+        """Compiles the rules. See the module docstring for what each of them does.
+
+        Raises ValueError if a rule name is used twice, or a pattern is not a valid regex.
+        """
+        self._prefix_groups = {name: tuple(group_prefixes) for name, group_prefixes in (prefixes or {}).items()}
+        self._all_prefixes = tuple(prefix for group in self._prefix_groups.values() for prefix in group)
+        patterns = patterns or {}
+        combined_names = []
+        # The patterns that can't be combined, with their names, in config order.
+        self._separate_patterns = []
+        for name, pattern in patterns.items():
+            try:
+                regex = re.compile(pattern)
+            except re.error as error:
+                raise ValueError(f"Invalid prefilter pattern '{name}': {error}") from error
+            if regex.groups == 0 and regex.flags == _DEFAULT_PATTERN_FLAGS and _compiles_in_group(pattern):
+                combined_names.append(name)
+            else:
+                self._separate_patterns.append((name, regex))
+        self._pattern_names = {f"p{i}": name for i, name in enumerate(combined_names)}
+        self._combined_pattern = re.compile("|".join(f"(?P<p{i}>{patterns[name]})"
+                                                     for i, name in enumerate(combined_names)))
+        self._has_patterns = bool(patterns)
+        self.min_alpha_ratio = min_alpha_ratio
+        self.min_length = min_length
+        self.max_length = max_length
+
+        rule_names = list(self._prefix_groups) + list(patterns)
+        rule_names += [name for name in ("min_length", "max_length", "min_alpha_ratio")
+                       if getattr(self, name) is not None]
+        if len(set(rule_names)) != len(rule_names):
+            raise ValueError(f"Prefilter rule names must be distinct: {rule_names}")
+        self.counts: Dict[str, int] = {name: 0 for name in rule_names}
+        self.texts_checked = 0
+        self._has_rules = bool(rule_names)
+
+    @staticmethod
+    def default() -> "Prefilter":
+        """Returns a prefilter that rejects texts starting with the COMPUTERESE_STARTS strings."""
+        return Prefilter(prefixes={"computerese": sorted(COMPUTERESE_STARTS)})
+
+    @staticmethod
+    def from_config(config: Dict) -> "Prefilter":
+        """Returns a prefilter for a config dict as described in the module docstring. Raises ValueError for unknown
+        keys."""
+        unknown = set(config) - CONFIG_KEYS
+        if unknown:
+            raise ValueError(f"Unknown prefilter config keys: {', '.join(sorted(unknown))}")
+        return Prefilter(**config)
+
+    @staticmethod
+    def from_json_file(path: str) -> "Prefilter":
+        """Returns a prefilter for the config in a JSON file."""
+        with open(path, encoding="utf-8") as config_file:
+            return Prefilter.from_config(json.load(config_file))
+
+    def check(self, text: str, sample: Optional[str] = None) -> Optional[str]:
+        """Returns the name of the rule that rejects the text, or None if the text should be classified.
+
+        :param sample: if given, the patterns and min_alpha_ratio are checked on this part of the text instead of
+            the whole text. Classifiers with a budget pass the windows of the text that they score.
+
+        A prefilter without rules accepts every text, without counting it."""
+        if not self._has_rules:
+            return None
+        rule = self._rejecting_rule(text, text if sample is None else sample)
+        self._count(rule)
+        return rule
+
+    def stream(self) -> "StreamCheck":
+        """Returns a StreamCheck for a text that arrives a piece at a time."""
+        return StreamCheck(self)
+
+    def _count(self, rule: Optional[str]):
+        """Counts a checked text, and the rule that rejected it if there is one."""
+        self.texts_checked += 1
+        if rule is not None:
+            self.counts[rule] += 1
+
+    def _rejecting_rule(self, text: str, sample: str) -> Optional[str]:
+        if self.min_length is not None and len(text) < self.min_length:
+            return "min_length"
+        if self.max_length is not None and len(text) > self.max_length:
+            return "max_length"
+        rule = self._prefix_rule(text) or self._pattern_rule(sample)
+        if rule is None and self.min_alpha_ratio is not None:
+            # Counting with str.isalpha is about three times faster than counting regex matches for letters.
+            rule = self._alpha_ratio_rule(sum(map(str.isalpha, sample)), len(sample))
+        return rule
+
+    def _prefix_rule(self, text: str) -> Optional[str]:
+        if self._all_prefixes and text.startswith(self._all_prefixes):
+            for name, group_prefixes in self._prefix_groups.items():
+                if text.startswith(group_prefixes):
+                    return name
+        return None
+
+    def _pattern_rule(self, text: str) -> Optional[str]:
+        for name, _ in self._pattern_matches(text):
+            return name
+        return None
+
+    def _pattern_matches(self, text: str) -> Iterator[Tuple[str, re.Match]]:
+        """Yields the name and first match of the patterns that match the text, starting with the combined ones."""
+        if self._pattern_names:
+            match = self._combined_pattern.search(text)
+            if match is not None:
+                yield self._pattern_names[match.lastgroup], match
+        for name, regex in self._separate_patterns:
+            match = regex.search(text)
+            if match is not None:
+                yield name, match
+
+    def _alpha_ratio_rule(self, alpha_chars: int, length: int) -> Optional[str]:
+        if self.min_alpha_ratio is not None and length and alpha_chars < self.min_alpha_ratio * length:
+            return "min_alpha_ratio"
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of texts rejected by each rule, and the number checked in all, as "texts_checked"."""
+        return {**self.counts, "texts_checked": self.texts_checked}
+
+    def reset_stats(self):
+        """Sets all the counts back to zero."""
+        self.counts = {name: 0 for name in self.counts}
+        self.texts_checked = 0
+
+
+def _compiles_in_group(pattern: str) -> bool:
+    """Checks that the pattern still compiles inside a group, which it doesn't if it starts with a global flag, even
+    one such as (?u) that doesn't change the compiled flags."""
+    try:
+        re.compile(f"(?:{pattern})")
+        return True
+    except re.error:
+        return False
+
+
+class StreamCheck:
+    """Applies a prefilter's rules to a text that arrives a piece at a time, deciding each rule as soon as it can.
+
+    - prefixes are checked on the start of the text as soon as it arrives.
+    - patterns are searched for in each piece together with the last PATTERN_OVERLAP_CHARS chars before it, so
+      matches that are split between pieces are found unless they are longer than that.
+    - max_length rejects the text as soon as it is longer.
+    - min_length and min_alpha_ratio depend on the whole text, so they are checked by finish. Callers that stop
+      reading before the end of the text call finish when they stop, and these rules are checked on the text so far.
+
+    The text is counted in the prefilter's stats once, when it is rejected or finished.
+    """
+    def __init__(self, prefilter: Prefilter):
+        self.prefilter = prefilter
+        self.rejected_by: Optional[str] = None
+        self.length = 0
+        self.alpha_chars = 0
+        self._head = ""
+        self._max_prefix_length = max((len(prefix) for prefix in prefilter._all_prefixes), default=0)
+        self._tail = ""
+        self._done = not prefilter._has_rules
+
+    def add(self, piece: str) -> Optional[str]:
+        """Checks the next piece of the text. Returns the name of the rule that rejects the text, or None."""
+        if self._done:
+            return self.rejected_by
+        prefilter = self.prefilter
+        self.length += len(piece)
+        if prefilter.min_alpha_ratio is not None:
+            self.alpha_chars += sum(map(str.isalpha, piece))
+        rule = None
+        if prefilter.max_length is not None and self.length > prefilter.max_length:
+            rule = "max_length"
+        if rule is None and len(self._head) < self._max_prefix_length:
+            self._head += piece[:self._max_prefix_length - len(self._head)]
+            rule = prefilter._prefix_rule(self._head)
+        if rule is None and prefilter._has_patterns:
+            text = self._tail + piece
+            # A match that reaches the end of the text so far might not match once more text arrives, as with "\b" or
+            # "$", so it is left for the next piece or finish to find again.
+            rule = next((name for name, match in prefilter._pattern_matches(text) if match.end() < len(text)), None)
+            self._tail = text[-PATTERN_OVERLAP_CHARS:]
+        if rule is not None:
+            self._end(rule)
+        return self.rejected_by
+
+    def finish(self) -> Optional[str]:
+        """Checks the rules that need the whole text, at the end of the text or wherever the caller stops reading.
+        Returns the name of the rule that rejects the text, or None. Later pieces are not checked."""
+        if not self._done:
+            prefilter = self.prefilter
+            if prefilter.min_length is not None and self.length < prefilter.min_length:
+                self._end("min_length")
+            else:
+                self._end(prefilter._pattern_rule(self._tail)
+                          or prefilter._alpha_ratio_rule(self.alpha_chars, self.length))
+        return self.rejected_by
+
+    def _end(self, rule: Optional[str]):
+        self.rejected_by = rule
+        self._done = True
+        self.prefilter._count(rule)
+
+
+# Accepts every text. Passed to score_text by callers that have already checked the text with their own prefilter.
+ACCEPT_ALL = Prefilter()
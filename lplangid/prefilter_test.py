@@ -0,0 +1,128 @@
+import json
+
+import pytest
+
+from lplangid import language_classifier as lc
+from lplangid.language_classifier_test import TEST_TEXTS
+from lplangid.prefilter import Prefilter
+
+CONFIG = {
+    "prefixes": {"computerese": ["<!", "Metadata"], "commands": ["/join", "!ping"]},
+    "patterns": {"url": r"https?://\S+", "hex_id": r"\b[0-9a-f]{16,}\b"},
+    "min_alpha_ratio": 0.5,
+    "max_length": 50,
+}
+
+
+def test_check_names_rejecting_rules():
+    prefilter = Prefilter.from_config(CONFIG)
+    assert prefilter.check("<!-- comment -->") == "computerese"
+    assert prefilter.check("!ping the server") == "commands"
+    assert prefilter.check("see https://example.com now") == "url"
+    assert prefilter.check("build 0123456789abcdef0123") == "hex_id"
+    assert prefilter.check("{'a': 1, 'b': 2}") == "min_alpha_ratio"
+    assert prefilter.check("x" * 51) == "max_length"
+    assert prefilter.check("Bonjour tout le monde") is None
+    assert prefilter.stats() == {"computerese": 1, "commands": 1, "url": 1, "hex_id": 1, "min_alpha_ratio": 1,
+                                 "max_length": 1, "texts_checked": 7}
+    prefilter.reset_stats()
+    assert set(prefilter.stats().values()) == {0}
+
+
+def test_invalid_configs():
+    with pytest.raises(ValueError):
+        Prefilter.from_config({"prefix": {"computerese": ["<!"]}})
+    with pytest.raises(ValueError):
+        Prefilter.from_config({"patterns": {"bad": "(unclosed"}})
+    with pytest.raises(ValueError):
+        Prefilter.from_config({"prefixes": {"url": ["http"]}, "patterns": {"url": "www"}})
+
+
+def test_from_json_file(tmp_path):
+    path = tmp_path / "prefilter.json"
+    path.write_text(json.dumps(CONFIG), encoding="utf-8")
+    assert Prefilter.from_json_file(str(path)).check("/join #general") == "commands"
+
+
+def test_default_prefilter_matches_is_computerese():
+    prefilter = Prefilter.default()
+    for text, _ in TEST_TEXTS:
+        assert (prefilter.check(text) is not None) == lc.is_computerese(text)
+
+
+def test_classifier_prefilter():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    classifier.enable_cache()
+    assert classifier.get_winner("Metadata: this is English") is None
+    assert classifier.prefilter_stats() == {"computerese": 1, "texts_checked": 1}
+
+    classifier.set_prefilter()
+    assert classifier.get_winner("Metadata: this is English") == "en"
+    classifier.set_prefilter(Prefilter.from_config(CONFIG))
+    assert classifier.get_language_scores("see https://example.com now") == []
+    assert classifier.get_winner_score("!ping") == (None, 0)
+    assert classifier.get_winners(["Hola amigos", "Hola amigos"]) == ["es", "es"]
+    assert classifier.prefilter_stats()["texts_checked"] == 3
+
+
+def test_views_share_classifier_prefilter():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    view = classifier.restrict_to(["en", "es"])
+    assert view.get_winner("Metadata: this is English") is None
+    classifier.set_prefilter(Prefilter.from_config(CONFIG))
+    assert view.prefilter is classifier.prefilter
+    assert view.get_winner("see https://example.com now") is None
+    assert classifier.restrict_to(["en", "fr"]).get_winner("!ping") is None
+    assert classifier.prefilter_stats()["texts_checked"] == 2
+
+
+def test_budget_limits_scanning_rules_to_sampled_windows():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    classifier.set_prefilter(Prefilter.from_config({"prefixes": {"computerese": ["Metadata"]},
+                                                    "patterns": {"url": r"https?://\S+"}, "min_alpha_ratio": 0.5}))
+    classifier.set_budget(max_chars=1000)
+    text = "Hola amigos, esto es español. " * 1000
+    text = text[:len(text) // 2 - 100] + " https://example.com " + "1234 " * 2000 + text[len(text) // 2 - 100:]
+    assert "https" not in lc.sample_windows(text, max_chars=1000) and "https" in text
+    assert classifier.get_winner(text) == "es"
+    assert classifier.get_winner("Metadata " + text) is None
+    classifier.set_budget()
+    assert classifier.get_winner(text) is None
+    assert classifier.prefilter_stats() == {"computerese": 1, "url": 1, "min_alpha_ratio": 0, "texts_checked": 3}
+
+
+def test_stream_check_matches_check():
+    prefilter = Prefilter.from_config({**CONFIG, "min_length": 3, "max_length": 100})
+    texts = ["<!-- comment -->", "see https://example.com now", "build 0123456789abcdef0123", "{'a': 1, 'b': 2}",
+             "x" * 101, "Bonjour tout le monde", "ab", "!ping the server"]
+    for text in texts:
+        for piece_length in [1, 4, 1000]:
+            stream = prefilter.stream()
+            for i in range(0, len(text), piece_length):
+                stream.add(text[i:i + piece_length])
+            assert stream.finish() == prefilter.check(text)
+    assert prefilter.stats()["texts_checked"] == 2 * 3 * len(texts)
+
+    prefilter = Prefilter(patterns={"three_digits": r"\b\d{3}\b"})
+    for text, expected in [("call 12345 now", None), ("call 123", "three_digits"), ("call 123 now", "three_digits")]:
+        stream = prefilter.stream()
+        for char in text:
+            stream.add(char)
+        assert stream.finish() == expected
+
+
+def test_patterns_with_groups_and_global_flags_keep_their_meaning():
+    prefilter = Prefilter(patterns={"url": r"https?://\S+", "repeated_char": r"(\w)\1{5}",
+                                    "error": "(?i)error", "doubled_word": r"\b(?P<word>\w+) (?P=word)\b"})
+    assert list(prefilter._pattern_names.values()) == ["url"]
+    assert prefilter.check("see https://example.com") == "url"
+    assert prefilter.check("zzzzzzzz") == "repeated_char"
+    assert prefilter.check("abcdefgh") is None
+    assert prefilter.check("An ERROR occurred") == "error"
+    assert prefilter.check("it is is here") == "doubled_word"
+    assert prefilter.check("Bonjour tout le monde") is None
+    for text in ["An ERROR occurred", "zzzzzzzz", "it is is here"]:
+        stream = prefilter.stream()
+        for char in text:
+            stream.add(char)
+        assert stream.finish() == prefilter.check(text)
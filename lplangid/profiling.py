@@ -0,0 +1,143 @@
+"""Opt-in per-stage timers and counters for scoring, to find out which stage is to blame when scoring is slow.
+
+score_text, get_pruned_winner and score_char_contenders take an optional StageProfiler. When one is given, they time
+each of their stages and count what each stage did:
+
+- prefilter: checking is_computerese, or the prefilter if one is given. For RRCLanguageClassifier, this is sampling
+  the text if it has a budget and checking its own prefilter, and the texts it rejects are profiled too.
+- char_scoring: lowercasing, the script fast path, and counting and scoring the chars.
+- char_filter: dropping languages below CHAR_MIN_TO_PLAY times the top char score (see select_char_contenders).
+- tokenization: tokenizing and counting the terms, including finding terms inside tokens with a SubstringTermMatcher.
+- term_scoring: looking up the terms for the contending languages. For get_pruned_winner, this is prune_term_scores,
+  which also picks the winner, so its calls have no combining stage.
+- combining: combining the char and term scores and applying priors.
+
+The counters are the chars in the text, the languages with any char score, the contenders left after the char
+filter, the tokens and distinct tokens, and the term lookups, which are the distinct tokens with a term index, or
+the distinct tokens times the contenders without one. get_pruned_winner stops looking up terms for languages that
+can no longer win, so its term lookups are not counted. Each call also has an outcome, which is the reason it
+returned early ("prefilter", "fast_path", "no_char_scores", "single_contender" or "no_terms_matched"), "scored", or
+"pruned" for calls to get_pruned_winner that got as far as term scoring.
+
+Calls that take longer than slow_call_seconds are also kept, with their own stage times and counters, up to
+max_slow_calls of the most recent ones.
+
+RRCLanguageClassifier.enable_profiling makes the classifier pass a StageProfiler to score_text, and to
+get_pruned_winner when pruning is enabled. Profiling is off by default, and then the only cost is a check whether
+there is a profiler at each stage. Results from the single token results and the result cache are not scored, so
+they are not profiled.
+
+Example:
+
+    classifier = RRCLanguageClassifier.default_instance()
+    classifier.enable_profiling(slow_call_seconds=0.001)
+    classifier.get_winners(texts)
+    print(classifier.profiling_stats())
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+STAGES = ("prefilter", "char_scoring", "char_filter", "tokenization", "term_scoring", "combining")
+COUNTERS = ("chars", "char_languages", "contenders", "tokens", "distinct_tokens", "term_lookups")
+OUTCOMES = ("prefilter", "fast_path", "no_char_scores", "single_contender", "no_terms_matched", "scored", "pruned")
+
+
+class StageProfiler:
+    def __init__(self, slow_call_seconds: Optional[float] = None, max_slow_calls: int = 100, preview_chars: int = 50):
+        """
+        :param slow_call_seconds: calls taking longer than this are kept, with their stage times and counters.
+        :param max_slow_calls: how many of the most recent slow calls are kept.
+        :param preview_chars: how many chars of the text are kept with each slow call. Use 0 to keep none.
+        """
+        self.slow_call_seconds = slow_call_seconds
+        self.max_slow_calls = max_slow_calls
+        self.preview_chars = preview_chars
+        # Guards the aggregates and slow calls, so that one profiler can be shared by classifiers in several threads.
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Sets all the aggregates back to zero and discards the slow calls."""
+        with self._lock:
+            self.calls = 0
+            self.total_seconds = 0.0
+            self.max_seconds = 0.0
+            self.stage_seconds: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+            self.counters: Dict[str, int] = {counter: 0 for counter in COUNTERS}
+            self.outcomes: Dict[str, int] = {outcome: 0 for outcome in OUTCOMES}
+            self.slow_call_count = 0
+            self.slow_calls = deque(maxlen=self.max_slow_calls)
+
+    def snapshot(self) -> Dict:
+        """Returns a copy of the aggregates and slow calls, which later calls don't change."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "total_seconds": self.total_seconds,
+                "max_seconds": self.max_seconds,
+                "stage_seconds": dict(self.stage_seconds),
+                "counters": dict(self.counters),
+                "outcomes": dict(self.outcomes),
+                "slow_call_count": self.slow_call_count,
+                "slow_calls": list(self.slow_calls),
+            }
+
+    def __getstate__(self):
+        """Pickles only the settings, so that a copy in another process starts with no calls and a lock of its own."""
+        return {"slow_call_seconds": self.slow_call_seconds, "max_slow_calls": self.max_slow_calls,
+                "preview_chars": self.preview_chars}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def start_call(self, text: str) -> "ProfiledCall":
+        """Starts timing a call that scores the text. The scoring functions call this when given this profiler."""
+        return ProfiledCall(self, text)
+
+    def _record(self, call: "ProfiledCall", outcome: str):
+        """Adds one call to the aggregates, and keeps it if it was slow."""
+        seconds = time.perf_counter() - call.call_start
+        with self._lock:
+            self.calls += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            for stage, stage_time in call.stage_seconds.items():
+                self.stage_seconds[stage] += stage_time
+            for counter, count in call.counters.items():
+                self.counters[counter] += count
+            self.outcomes[outcome] += 1
+            if self.slow_call_seconds is not None and seconds > self.slow_call_seconds:
+                self.slow_call_count += 1
+                self.slow_calls.append({"seconds": seconds, "length": len(call.text),
+                                        "text": call.text[:self.preview_chars], "outcome": outcome,
+                                        "stage_seconds": call.stage_seconds, "counters": call.counters})
+
+
+class ProfiledCall:
+    """The stage times and counters of one call to a scoring function, which done adds to the StageProfiler."""
+    __slots__ = ["profiler", "text", "call_start", "stage_start", "stage_seconds", "counters", "outcome"]
+
+    def __init__(self, profiler: StageProfiler, text: str):
+        self.profiler = profiler
+        self.text = text
+        self.call_start = self.stage_start = time.perf_counter()
+        self.stage_seconds: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {"chars": len(text)}
+        # Set by a stage that decides how the call ends, such as the script fast path, before the call is done.
+        self.outcome: Optional[str] = None
+
+    def end_stage(self, stage: str):
+        """Adds the time since the last stage ended (or the call started) to the time taken by this stage."""
+        now = time.perf_counter()
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + now - self.stage_start
+        self.stage_start = now
+
+    def count(self, **counts: int):
+        self.counters.update(counts)
+
+    def done(self, outcome: str, result):
+        """Adds the call to the profiler with this outcome, unless a stage has already set one, and returns result."""
+        self.profiler._record(self, self.outcome or outcome)
+        return result
@@ -0,0 +1,97 @@
+import threading
+
+from lplangid import language_classifier as lc
+from lplangid.language_classifier_test import ALL_CHAR_WEIGHTS, ALL_TERM_RANKS, TEST_TEXTS
+from lplangid.prefilter import Prefilter
+from lplangid.profiling import OUTCOMES, STAGES, StageProfiler
+from lplangid.script_fast_path import ScriptFastPath
+from lplangid.substring_terms import SubstringTermMatcher
+
+
+def test_profiled_scores_match_score_text():
+    term_index = lc.build_term_index(ALL_TERM_RANKS)
+    fast_path = ScriptFastPath(ALL_CHAR_WEIGHTS, lc.CHAR_MIN_TO_PLAY)
+    substring_matcher = SubstringTermMatcher.for_languages(ALL_TERM_RANKS)
+    options = [{}, {"term_index": term_index}, {"fast_path": fast_path, "term_index": term_index},
+               {"candidates": ["en", "es", "ja"], "priors": {"es": 2.0}},
+               {"max_term_candidates": 2, "substring_matcher": substring_matcher}]
+    profiler = StageProfiler()
+    texts = [text for text, _ in TEST_TEXTS] + ["東京大学", "1234"]
+    for kwargs in options:
+        for text in texts:
+            assert (lc.score_text(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS, text, profiler=profiler, **kwargs)
+                    == lc.score_text(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS, text, **kwargs))
+    snapshot = profiler.snapshot()
+    assert snapshot["calls"] == sum(snapshot["outcomes"].values()) == len(options) * len(texts)
+    assert set(snapshot["stage_seconds"]) == set(STAGES)
+    assert snapshot["outcomes"]["fast_path"] > 0 and snapshot["outcomes"]["no_char_scores"] > 0
+    assert snapshot["counters"]["term_lookups"] >= snapshot["counters"]["distinct_tokens"] > 0
+
+
+def test_classifier_profiling():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    assert classifier.profiling_stats() == {}
+    classifier.enable_profiling(slow_call_seconds=0, max_slow_calls=2, preview_chars=5)
+    classifier.get_winners(["This is English", "Esto es español", "掃除機が壊れた", "Metadata: skipped"])
+    stats = classifier.profiling_stats(reset=True)
+    assert stats["calls"] == 4
+    assert stats["outcomes"]["scored"] == 1 and stats["outcomes"]["single_contender"] == 2
+    assert stats["outcomes"]["prefilter"] == 1
+    assert stats["slow_call_count"] == 4
+    assert [call["text"] for call in stats["slow_calls"]] == ["掃除機が壊", "Metad"]
+    assert classifier.profiling_stats()["calls"] == 0
+    assert set(classifier.profiling_stats()["outcomes"]) == set(OUTCOMES)
+    classifier.disable_profiling()
+    assert classifier.get_winner("This is English") == "en"
+    assert classifier.profiling_stats() == {}
+
+
+def test_pruned_winners_are_profiled():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    classifier.enable_pruning()
+    classifier.enable_profiling()
+    texts = [text for text, _ in TEST_TEXTS]
+    assert classifier.get_winners(texts) == [expected for _, expected in TEST_TEXTS]
+    stats = classifier.profiling_stats()
+    assert stats["calls"] == len(set(texts))
+    assert stats["outcomes"]["prefilter"] == sum(lc.is_computerese(text) for text in set(texts))
+    assert stats["outcomes"]["pruned"] > 0 and stats["outcomes"]["scored"] == 0
+    assert stats["stage_seconds"]["term_scoring"] > 0 and stats["stage_seconds"]["combining"] == 0
+    assert stats["counters"]["term_lookups"] == 0 and stats["counters"]["tokens"] > 0
+
+
+def test_classifier_prefilter_and_sampling_are_profiled(monkeypatch):
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    classifier.set_prefilter(Prefilter.from_config({"patterns": {"url": r"https?://\S+"}}))
+    classifier.set_budget(max_tokens=20)
+    classifier.enable_profiling(slow_call_seconds=0)
+    sample_windows = lc.sample_windows
+    sampled = []
+
+    def recording_sample_windows(text, *args):
+        sampled.append(text)
+        return sample_windows(text, *args)
+    monkeypatch.setattr(lc, "sample_windows", recording_sample_windows)
+    assert classifier.get_winner("see https://example.com " + "and this is English " * 50) is None
+    assert classifier.get_winner("this is English " * 50) == "en"
+    stats = classifier.profiling_stats()
+    assert len(sampled) == stats["calls"] == 2
+    assert stats["outcomes"]["prefilter"] == 1 and stats["outcomes"]["scored"] == 1
+    assert stats["stage_seconds"]["prefilter"] > 0
+    assert all(call["stage_seconds"]["prefilter"] > 0 for call in stats["slow_calls"])
+    assert [call["length"] for call in stats["slow_calls"]] == [1024, 800]
+
+
+def test_profiler_is_thread_safe():
+    profiler = StageProfiler()
+
+    def score_texts():
+        for text, _ in TEST_TEXTS * 50:
+            lc.score_text(ALL_TERM_RANKS, ALL_CHAR_WEIGHTS, text, profiler=profiler)
+    threads = [threading.Thread(target=score_texts) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    snapshot = profiler.snapshot()
+    assert snapshot["calls"] == sum(snapshot["outcomes"].values()) == 8 * 50 * len(TEST_TEXTS)
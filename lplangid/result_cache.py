@@ -0,0 +1,82 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# Rough size in bytes of each (language, score) pair in a cached result. The language strings themselves are
+# shared with the scoring tables, so only the tuple and the float are counted.
+SCORE_PAIR_BYTES = sys.getsizeof(("", 0.0)) + sys.getsizeof(0.0)
+
+
+class LRUResultCache:
+    """A thread-safe least-recently-used cache for classifier results, bounded by entry count and approximate bytes.
+
+    Values are lists of (language code, score) pairs as returned by score_text. Counters for hits, misses and
+    evictions are kept so that callers can see whether the cache is earning its keep.
+    """
+    def __init__(self, max_entries: int = 100000, max_bytes: Optional[int] = None):
+        if max_entries <= 0:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        """Pickles only the limits, so that a copy in another process (such as a classify_parallel worker) starts
+        empty, with a lock of its own."""
+        return {"max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @staticmethod
+    def entry_size(key: Hashable, value: List[Tuple[str, float]]) -> int:
+        """Returns the approximate number of bytes used by a cache entry."""
+        return sys.getsizeof(key) + sys.getsizeof(value) + SCORE_PAIR_BYTES * len(value)
+
+    def get(self, key: Hashable) -> Optional[List[Tuple[str, float]]]:
+        """Returns the cached value for key and marks it as recently used, or returns None if it isn't cached."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value[0]
+
+    def put(self, key: Hashable, value: List[Tuple[str, float]]):
+        """Adds an entry, evicting the least recently used entries until the cache is within its limits."""
+        size = self.entry_size(key, value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self.current_bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Removes all entries. The hit, miss and eviction counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Returns a snapshot of the cache counters and size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self.current_bytes}
@@ -0,0 +1,51 @@
+import threading
+
+from lplangid.result_cache import LRUResultCache
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUResultCache(max_entries=2)
+    cache.put("ok", [("en", 1.0)])
+    cache.put("hola", [("es", 1.0)])
+    assert cache.get("ok") == [("en", 1.0)]
+    cache.put("merci", [("fr", 1.0)])
+    assert cache.get("hola") is None
+    assert cache.get("merci") == [("fr", 1.0)]
+    assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 1, "entries": 2, "bytes": cache.current_bytes}
+
+
+def test_byte_budget():
+    entry_size = LRUResultCache.entry_size("ok", [("en", 1.0)])
+    cache = LRUResultCache(max_entries=100, max_bytes=entry_size * 2)
+    for key in ["ok", "no", "si"]:
+        cache.put(key, [("en", 1.0)])
+    assert len(cache) == 2
+    assert cache.current_bytes <= entry_size * 2
+    cache.put("too big", [("en", 1.0)] * 100)
+    assert cache.get("too big") is None
+
+
+def test_clear_keeps_counters():
+    cache = LRUResultCache()
+    cache.put("ok", [])
+    assert cache.get("ok") == []
+    cache.clear()
+    assert cache.get("ok") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_concurrent_puts():
+    cache = LRUResultCache(max_entries=50)
+
+    def fill(prefix):
+        for i in range(1000):
+            cache.put(f"{prefix}{i}", [("en", 1.0)])
+            cache.get(f"{prefix}{i // 2}")
+
+    threads = [threading.Thread(target=fill, args=(prefix,)) for prefix in "abcd"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 50
+    assert cache.current_bytes == sum(size for _, size in cache._entries.values())
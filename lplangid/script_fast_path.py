@@ -0,0 +1,73 @@
+"""A fast path for texts whose characters all belong to one language, such as Korean, Greek or Hebrew text.
+
+score_text returns a single language with a score of 1 whenever only one language passes the CHAR_MIN_TO_PLAY char
+filter. This is often known from the characters alone. A char is owned by a language if every other language's weight
+for it is at most CHAR_MIN_TO_PLAY times the owner's weight. If every scored char in a text has the same owner, then
+every other language's char score is at most CHAR_MIN_TO_PLAY times the owner's, so only the owner passes the filter.
+In that case ScriptFastPath gives the result straight away, without counting chars or walking their language lists.
+
+Owners are worked out for each char from the char tables, rather than for whole Unicode scripts, because scripts are
+often shared: Han characters are used by both Chinese and Japanese, and only some of them have a single owner.
+Scripts that belong to one language, like Hangul for Korean, end up with every char owned by that language.
+
+Most ASCII letters are shared by many languages and have no owner, so a text that is all ASCII is only checked
+until the first such letter is found, which is usually within its first few characters. Other texts are checked a
+char at a time for their first WALKED_CHARS chars, which is where most of them show a char without a single owner.
+The number of texts that took each path is kept in the counts attribute.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Owners need their weight to be a little more than 1 / CHAR_MIN_TO_PLAY times any other weight, so that rounding
+# errors when adding up char scores can never let a second language through the char filter.
+OWNER_MARGIN = 1 - 1e-9
+# The chars at the start of a text are checked one at a time, so that most texts without a single owner, which have an
+# unowned or conflicting char near the start, are given up on straight away. The rest of a longer text is checked
+# with a set of its distinct chars, which is quicker than walking every char when the text does have one owner.
+WALKED_CHARS = 256
+
+
+class ScriptFastPath:
+    def __init__(self, all_char_weights: Dict[str, List[Tuple[str, float]]], char_min_to_play: float):
+        """Builds the char -> owner table from the char_weights table (char -> list of (lang, weight) pairs)."""
+        self.owners: Dict[str, str] = {}
+        scored_chars = []
+        for char, lang_weights in all_char_weights.items():
+            if not char.isalpha():
+                continue
+            scored_chars.append(char)
+            owner, owner_weight = max(lang_weights, key=lambda x: x[1], default=(None, 0))
+            if owner_weight > 0 and all(weight <= char_min_to_play * owner_weight * OWNER_MARGIN
+                                        for lang, weight in lang_weights if lang != owner):
+                self.owners[char] = owner
+        self.scored_chars = frozenset(scored_chars)
+        self.ascii_unowned = frozenset(char for char in scored_chars if char.isascii() and char not in self.owners)
+        self.counts = {"ascii": 0, "single_language": 0, "other": 0}
+
+    def single_language(self, text: str) -> Optional[str]:
+        """Returns the language that owns every scored char in the text, or None if there isn't one."""
+        if text.isascii() and not self.ascii_unowned.isdisjoint(text):
+            self.counts["ascii"] += 1
+            return None
+        owner = self._common_owner(text[:WALKED_CHARS], None)
+        if owner != "" and len(text) > WALKED_CHARS:
+            owner = self._common_owner(self.scored_chars.intersection(text[WALKED_CHARS:]), owner)
+        if owner == "":
+            self.counts["other"] += 1
+            return None
+        self.counts["single_language" if owner is not None else "other"] += 1
+        return owner
+
+    def _common_owner(self, chars: Iterable[str], owner: Optional[str]) -> Optional[str]:
+        """Returns the owner of every scored char in chars and of owner if that isn't None, None if there are no
+        scored chars and no owner, or "" as soon as an unowned or conflicting char is found."""
+        owners, scored_chars = self.owners, self.scored_chars
+        for char in chars:
+            char_owner = owners.get(char)
+            if char_owner is None:
+                if char not in scored_chars:
+                    continue
+            elif owner is None or char_owner == owner:
+                owner = char_owner
+                continue
+            return ""
+        return owner
@@ -0,0 +1,56 @@
+from lplangid import language_classifier as lc
+from lplangid.language_classifier_test import TEST_TEXTS
+from lplangid.script_fast_path import WALKED_CHARS, ScriptFastPath
+
+CLASSIFIER = lc.RRCLanguageClassifier.default_instance()
+SCRIPT_TEXTS = [("안녕하세요, 만나서 반갑습니다", "ko"),
+                ("Καλημέρα, τι κάνεις σήμερα;", "el"),
+                ("שלום, מה שלומך היום?", "he"),
+                ("Привет, как дела?", None),
+                ("今日はいい天気ですね", None),
+                ("Hello 안녕하세요 Καλημέρα", None)]
+
+
+def test_owners_pass_char_filter_alone():
+    fast_path = CLASSIFIER.script_fast_path
+    for char, owner in list(fast_path.owners.items())[:2000]:
+        weights = dict(CLASSIFIER.char_weights[char])
+        assert all(weight <= lc.CHAR_MIN_TO_PLAY * weights[owner] for lang, weight in weights.items() if lang != owner)
+    assert fast_path.owners.get("한") == "ko"
+    assert "a" not in fast_path.owners
+
+
+def test_fast_path_gives_same_scores():
+    for text in [text for text, _ in TEST_TEXTS] + [text for text, _ in SCRIPT_TEXTS]:
+        fast_scores = lc.score_text(CLASSIFIER.term_ranks, CLASSIFIER.char_weights, text,
+                                    fast_path=CLASSIFIER.script_fast_path)
+        assert fast_scores == lc.score_text(CLASSIFIER.term_ranks, CLASSIFIER.char_weights, text)
+
+
+def test_single_language_and_counts():
+    fast_path = ScriptFastPath(CLASSIFIER.char_weights, lc.CHAR_MIN_TO_PLAY)
+    for text, expected in SCRIPT_TEXTS:
+        assert fast_path.single_language(text.lower()) == expected
+    assert fast_path.single_language("plain ascii text") is None
+    assert fast_path.single_language("www zzz") == "pl"
+    assert fast_path.counts == {"ascii": 1, "single_language": 4, "other": 3}
+
+
+def test_single_language_checks_chars_past_the_walked_start():
+    fast_path = ScriptFastPath(CLASSIFIER.char_weights, lc.CHAR_MIN_TO_PLAY)
+    korean = "안녕하세요 " * WALKED_CHARS
+    assert fast_path.single_language(korean) == "ko"
+    assert fast_path.single_language(korean + "καλημέρα") is None
+    assert fast_path.single_language(korean + "привет") is None
+    assert fast_path.single_language(" " * WALKED_CHARS + "안녕하세요") == "ko"
+    assert fast_path.single_language("привет " + korean) is None
+    assert fast_path.counts == {"ascii": 0, "single_language": 2, "other": 3}
+
+
+def test_fast_path_respects_candidates_and_priors():
+    text = SCRIPT_TEXTS[0][0]
+    assert CLASSIFIER.get_language_scores(text, priors={"ko": 0.5}) == [("ko", 0.5)]
+    assert CLASSIFIER.get_winner(text, candidates=["en", "es"]) is None
+    stats = CLASSIFIER.fast_path_stats()
+    assert set(stats) == {"ascii", "single_language", "other"}
+    assert stats["single_language"] >= 1
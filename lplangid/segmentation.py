@@ -0,0 +1,143 @@
+"""Splits mixed-language text, such as code-switched chat messages, into spans of text in each language.
+
+A window of window_tokens whitespace-separated words slides across the text, moving stride words at a time, and each
+window is scored. Scoring every window from scratch would take time proportional to the length of the text times the
+window size, so instead the scores are kept as running char and term totals for each language, and as the window
+moves, the contributions of the words that leave it are subtracted and those of the words that enter it are added.
+This makes the total time linear in the length of the text.
+
+Each word is labelled with the winner of the window whose centre is nearest to it, and runs of words with the same
+label are merged into spans. Windows are scored as score_text would score their text (apart from float rounding).
+The whole text is checked against the classifier's prefilter first, and a text that it rejects is returned as one
+span with no language, while the windows themselves are not checked. Words are split on whitespace, so HTML tags that
+contain whitespace should be removed beforehand.
+
+Example:
+
+    for span in segmentation.segment(classifier, "yo creo que it's a really good idea pero no sé"):
+        print(span.language, span.text)
+"""
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from lplangid import language_classifier as lc
+from lplangid.incremental import scores_from_totals
+
+_WORD_REGEX = re.compile(r"\S+")
+
+
+class LanguageSpan(NamedTuple):
+    start: int
+    end: int
+    language: Optional[str]
+    text: str
+
+
+class _WordScores:
+    """The contributions of one word to the running totals of a window."""
+    __slots__ = ["char_scores", "term_scores", "term_counts"]
+
+    def __init__(self, classifier: lc.RRCLanguageClassifier, word: str):
+        lowered = word.lower() if lc.CLASSIFY_CHARS_LOWER_CASE or lc.CLASSIFY_WORDS_LOWER_CASE else word
+        self.char_scores = lc.score_char_counts(classifier.char_weights,
+                                                Counter(lowered if lc.CLASSIFY_CHARS_LOWER_CASE else word))
+        self.term_counts = lc.count_terms(lowered if lc.CLASSIFY_WORDS_LOWER_CASE else word)
+        self.term_scores: Dict[str, float] = {}
+        if classifier.term_index is not None:
+            for token, count in self.term_counts.items():
+                for lang, weight in classifier.term_index.get(token, ()):
+                    self.term_scores[lang] = self.term_scores.get(lang, 0) + weight * count
+
+
+class _RunningTotals:
+    """Per-language sums of the contributions of the words in a window.
+
+    Each language's total is dropped when no word in the window contributes to it any more, so that languages that
+    have left the window have no score at all rather than a tiny rounding error."""
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self._contributors: Dict[str, int] = {}
+
+    def add(self, scores: Dict[str, float], sign: int):
+        for lang, score in scores.items():
+            contributors = self._contributors.get(lang, 0) + sign
+            if contributors == 0:
+                del self.totals[lang], self._contributors[lang]
+            else:
+                self.totals[lang] = self.totals.get(lang, 0) + sign * score
+                self._contributors[lang] = contributors
+
+
+def window_starts(num_words: int, window_tokens: int, stride: int) -> List[int]:
+    """Returns the index of the first word of each window. The last window ends at the last word."""
+    starts = list(range(0, max(num_words - window_tokens, 0) + 1, stride))
+    if starts[-1] + window_tokens < num_words:
+        starts.append(num_words - window_tokens)
+    return starts
+
+
+def score_windows(classifier: lc.RRCLanguageClassifier, words: List[str], starts: List[int],
+                  window_tokens: int) -> List[List[Tuple[str, float]]]:
+    """Returns the scores for the window of window_tokens words at each of the starts, which must be increasing."""
+    char_totals, term_totals = _RunningTotals(), _RunningTotals()
+    term_counts: Dict[str, int] = {}
+    word_scores: Dict[int, _WordScores] = {}
+
+    def update(index: int, sign: int):
+        if sign > 0:
+            scores = word_scores[index] = _WordScores(classifier, words[index])
+        else:
+            scores = word_scores.pop(index)
+        char_totals.add(scores.char_scores, sign)
+        term_totals.add(scores.term_scores, sign)
+        if classifier.term_index is None:
+            for token, count in scores.term_counts.items():
+                term_counts[token] = term_counts.get(token, 0) + sign * count
+                if term_counts[token] == 0:
+                    del term_counts[token]
+
+    results = []
+    window_start = window_end = 0
+    for start in starts:
+        end = min(start + window_tokens, len(words))
+        for index in range(window_start, min(start, window_end)):
+            update(index, -1)
+        for index in range(max(window_end, start), end):
+            update(index, 1)
+        window_start, window_end = start, end
+        results.append(scores_from_totals(classifier, char_totals.totals, term_totals.totals, term_counts))
+    return results
+
+
+def segment(classifier: lc.RRCLanguageClassifier, text: str, window_tokens: int = 8,
+            stride: int = 2) -> List[LanguageSpan]:
+    """Returns spans of the text, each with the language that wins in the windows around it (or None).
+
+    :param window_tokens: the number of whitespace-separated words in each window that is scored.
+    :param stride: the number of words the window moves along each time.
+    """
+    if window_tokens < 1 or stride < 1:
+        raise ValueError("window_tokens and stride must be positive")
+    matches = list(_WORD_REGEX.finditer(text))
+    if not matches:
+        return []
+    if classifier.prefilter.check(text) is not None:
+        start, end = matches[0].start(), matches[-1].end()
+        return [LanguageSpan(start, end, None, text[start:end])]
+    starts = window_starts(len(matches), window_tokens, stride)
+    window_scores = score_windows(classifier, [match.group() for match in matches], starts, window_tokens)
+    winners = [lc.winner_from_scores(scores)[0] for scores in window_scores]
+
+    spans: List[List] = []
+    window = 0
+    for index, match in enumerate(matches):
+        # Move on to the next window while its centre is at least as near to this word as the current window's.
+        word_offset = index + 0.5 - window_tokens / 2
+        while window + 1 < len(starts) and abs(starts[window + 1] - word_offset) <= abs(starts[window] - word_offset):
+            window += 1
+        if spans and spans[-1][2] == winners[window]:
+            spans[-1][1] = match.end()
+        else:
+            spans.append([match.start(), match.end(), winners[window]])
+    return [LanguageSpan(start, end, language, text[start:end]) for start, end, language in spans]
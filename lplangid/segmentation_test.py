@@ -0,0 +1,52 @@
+import pytest
+
+from lplangid import language_classifier as lc, segmentation
+from lplangid.language_classifier_test import TEST_TEXTS
+from lplangid.prefilter import Prefilter
+
+CLASSIFIER = lc.RRCLanguageClassifier.default_instance()
+CODE_SWITCHED_TEXT = ("yo creo que es una buena idea porque el equipo está listo "
+                      "but I think we should wait until the end of the month before we decide anything")
+
+
+def test_segment_code_switched_text():
+    spans = CLASSIFIER.segment(CODE_SWITCHED_TEXT, window_tokens=6, stride=2)
+    assert [span.language for span in spans] == ["es", "en"]
+    assert spans[0].text.startswith("yo creo") and spans[1].text.endswith("decide anything")
+    assert " ".join(span.text for span in spans) == CODE_SWITCHED_TEXT
+    for span in spans:
+        assert CODE_SWITCHED_TEXT[span.start:span.end] == span.text
+
+
+def test_segment_single_language_and_empty_text():
+    assert [span.language for span in CLASSIFIER.segment("This is English and nothing else at all")] == ["en"]
+    assert CLASSIFIER.segment("  ") == []
+    assert [span.language for span in CLASSIFIER.segment("123 456")] == [None]
+    with pytest.raises(ValueError):
+        CLASSIFIER.segment("text", stride=0)
+
+
+def test_segment_uses_classifier_prefilter():
+    assert [span.language for span in CLASSIFIER.segment("Metadata: yo creo que es una buena idea ")] == [None]
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    classifier.set_prefilter(Prefilter.from_config({"patterns": {"url": r"https?://\S+"}}))
+    assert [span.language for span in classifier.segment("Metadata: yo creo que es una buena idea")] == ["es"]
+    spans = classifier.segment(" " + CODE_SWITCHED_TEXT + " https://example.com")
+    assert spans == [(1, len(CODE_SWITCHED_TEXT) + 21, None, CODE_SWITCHED_TEXT + " https://example.com")]
+
+
+def test_window_starts():
+    assert segmentation.window_starts(3, 8, 2) == [0]
+    assert segmentation.window_starts(10, 4, 2) == [0, 2, 4, 6]
+    assert segmentation.window_starts(11, 4, 3) == [0, 3, 6, 7]
+
+
+def test_sliding_window_scores_match_score_text():
+    words = " ".join(text for text, _ in TEST_TEXTS if not lc.is_computerese(text)).split()
+    for window_tokens, stride in [(5, 1), (8, 3), (4, 6)]:
+        starts = segmentation.window_starts(len(words), window_tokens, stride)
+        for classifier in [CLASSIFIER, lc.RRCLanguageClassifier.lazy_instance()]:
+            window_scores = segmentation.score_windows(classifier, words, starts, window_tokens)
+            for start, scores in zip(starts, window_scores):
+                expected = CLASSIFIER.get_language_scores(" ".join(words[start:start + window_tokens]))
+                assert dict(scores) == pytest.approx(dict(expected), rel=1e-9)
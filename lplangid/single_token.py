@@ -0,0 +1,84 @@
+"""Precomputed results for texts that are a single token, like "ok", "gracias", "obrigado" or "谢谢".
+
+The scores for such a text only depend on the token, since every letter in the text is part of the token, and the
+rest is whitespace and punctuation, which score_text ignores. So the winner and score for every term in the term
+tables, and every letter in the char tables, can be worked out in advance with score_text, and looked up with a single
+dictionary lookup after lowercasing the text and stripping whitespace and punctuation from its ends.
+
+A term is only included if it tokenizes to itself, so that scoring it as a text counts it as one term. A text is only
+looked up if it has no "<" (which might start an HTML tag whose letters would be scored) and tokenizes to the stripped
+key, since some punctuation after a word, as in "ok.!", is kept in the token. The winners and scores are then exactly
+those of the full path.
+
+Building the results takes about 4 seconds for the default data and over a minute for the bible data, so they can be
+compiled into a file in the data directory with model_files.compile_single_token_results and loaded from there.
+For the default data's 117,000 keys, the results use about 8MiB when built, since the keys are shared with the term
+tables, or 16MiB when loaded. For the 860,000 keys of the bible data, they use about 71MiB or 132MiB. The memory
+used is given by results_size. Lookups take about 5 microseconds, compared with 50 for scoring a short text.
+"""
+import logging
+import string
+import sys
+from typing import Dict, Iterable, Optional, Tuple
+
+from lplangid.tokenizer import TOKEN_REGEX
+
+# Whitespace and punctuation stripped from the ends of a text before looking it up. Angle brackets are never
+# stripped, because texts with "<" are never looked up.
+STRIP_CHARS = string.whitespace + string.punctuation.replace("<", "").replace(">", "")
+NO_WINNER = (None, 0)
+
+SingleTokenResults = Dict[str, Tuple[Optional[str], float]]
+
+
+def single_token_keys(classifier) -> Iterable[str]:
+    """Yields each term in the classifier's term tables, and each letter in its char tables, that a text can be
+    looked up as: lowercase, tokenizing to itself, and not starting with one of the COMPUTERESE_PREFIXES."""
+    # Imported here because language_classifier itself uses this module.
+    from lplangid import language_classifier as lc
+    keys = {char for char in classifier.char_weights if char.isalpha()}
+    for lang in classifier.term_ranks:
+        keys.update(classifier.term_ranks[lang])
+    for key in sorted(keys):
+        if key == key.lower() and TOKEN_REGEX.findall(key) == [key] and not lc.is_computerese(key):
+            yield key
+
+
+def build_single_token_results(classifier) -> SingleTokenResults:
+    """Returns the winner and score that score_text gives for each of the single_token_keys of the classifier."""
+    from lplangid import language_classifier as lc
+    results: SingleTokenResults = {}
+    # Many keys have the same result, such as a score of 1 for a language with its own script, so these are shared.
+    distinct_results = {NO_WINNER: NO_WINNER}
+    for key in single_token_keys(classifier):
+        result = lc.winner_from_scores(
+            lc.score_text(classifier.term_ranks, classifier.char_weights, key, term_index=classifier.term_index))
+        results[key] = distinct_results.setdefault(result, result)
+    logging.info(f"Built single token results for {len(results)} terms, using about "
+                 f"{results_size(results, count_keys=False) / 2 ** 20:0.1f}MiB")
+    return results
+
+
+def lookup_single_token(results: SingleTokenResults, text: str) -> Optional[Tuple[Optional[str], float]]:
+    """Returns the precomputed winner and score if the text is a single token that has them, or None.
+
+    The caller checks is_computerese first, since that depends on the original text."""
+    if "<" in text:
+        return None
+    lowered = text.lower()
+    key = lowered.strip(STRIP_CHARS)
+    result = results.get(key)
+    if result is None or (len(key) != len(lowered) and TOKEN_REGEX.findall(lowered) != [key]):
+        return None
+    return result
+
+
+def results_size(results: SingleTokenResults, count_keys: bool = True) -> int:
+    """Returns the approximate number of bytes used by the results, counting shared results once.
+
+    Language strings are shared with the scoring tables. When the results are built rather than loaded, so are the
+    keys, which can be left out with count_keys=False."""
+    distinct_results = {id(result): result for result in results.values()}
+    size = sys.getsizeof(results) + sum(sys.getsizeof(result) + sys.getsizeof(result[1])
+                                        for result in distinct_results.values())
+    return size + sum(sys.getsizeof(key) for key in results) if count_keys else size
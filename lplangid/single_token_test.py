@@ -0,0 +1,43 @@
+import random
+
+from lplangid import language_classifier as lc
+from lplangid.language_classifier_test import TEST_TEXTS
+from lplangid.single_token import NO_WINNER, build_single_token_results, lookup_single_token
+
+CLASSIFIER = lc.RRCLanguageClassifier.default_instance().restrict_to(["en", "es", "pt", "ja", "zh"])
+RESULTS = build_single_token_results(CLASSIFIER)
+TRICKY_TEXTS = ["ok", "OK!", "  Gracias!! ", "obrigado.", "ok.!", "(谢谢)", "<b>ok</b>", "ok <", "Metadata", "a", "ok ok",
+                "u.s.", "U.S.A.", "John's", "'hola'", "hola,", "...", "", " ", "1", "day-to-day", "ありがとう"]
+
+
+def full_winner_score(text):
+    return lc.winner_from_scores(lc.score_text(CLASSIFIER.term_ranks, CLASSIFIER.char_weights, text))
+
+
+def test_results_match_full_path():
+    rng = random.Random(3)
+    texts = TRICKY_TEXTS + [text for text, _ in TEST_TEXTS]
+    for key in rng.sample(sorted(RESULTS), 2000):
+        texts += [key, key.upper(), f" {key}. ", f"¡{key}!", f"{key}?!"]
+    for text in texts:
+        result = lookup_single_token(RESULTS, text)
+        if result is not None and not lc.is_computerese(text):
+            assert result == full_winner_score(text), text
+
+
+def test_lookups_hit_and_miss():
+    assert lookup_single_token(RESULTS, "  Gracias!! ") == full_winner_score("gracias") != NO_WINNER
+    assert lookup_single_token(RESULTS, "谢谢") is not None
+    for text in ["ok.!", "<b>ok</b>", "ok ok", "hola,que"]:
+        assert lookup_single_token(RESULTS, text) is None
+
+
+def test_classifier_uses_results():
+    classifier = lc.RRCLanguageClassifier(CLASSIFIER.term_ranks, CLASSIFIER.char_weights)
+    expected = [classifier.get_winner_score(text) for text in TRICKY_TEXTS]
+    classifier.enable_single_token_results(RESULTS)
+    assert [classifier.get_winner_score(text) for text in TRICKY_TEXTS] == expected
+    assert classifier.get_winners(TRICKY_TEXTS) == [winner for winner, _ in expected]
+    assert classifier.get_winner_score("Gracias", candidates=["en"]) == ("en", 1.0) != RESULTS["gracias"]
+    classifier.update_tables()
+    assert classifier.single_token_results is None
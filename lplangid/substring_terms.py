@@ -0,0 +1,98 @@
+"""Finds the terms inside tokens of languages written without spaces between words, such as Chinese, Japanese and Thai.
+
+tokenize_fast splits text on whitespace and punctuation, so a sentence in these languages is usually a single token,
+which almost never matches a term in the term tables. A SubstringTermMatcher holds an Aho-Corasick automaton built
+from the terms of these languages, which finds every occurrence of every term in a token, including overlapping ones,
+in a single pass over its characters. expand_term_counts replaces each token that contains any of these terms with
+the counts of the terms found in it, so that they are scored like any other terms. Tokens without such terms, which
+includes almost all tokens in other languages, are left as they are.
+
+Only terms without ASCII characters are used, since the tables for these languages also contain some mixed terms
+from Wikipedia markup (like "其中formula") that are not useful inside tokens. This is opt-in, through
+RRCLanguageClassifier.enable_substring_terms, because it changes the scores of texts in these languages.
+
+Example:
+
+    classifier = RRCLanguageClassifier.default_instance()
+    classifier.enable_substring_terms()
+    classifier.get_language_scores("我们今天去北京吃饭了")
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+# Languages written without spaces between words, by their codes in the default and bible data.
+SPACELESS_LANGUAGES = ("ja", "jp", "zh", "th", "my", "km", "lo")
+
+
+class SubstringTermMatcher:
+    def __init__(self, terms: Iterable[str]):
+        """Builds the automaton for the given terms.
+
+        Each state has a dict of transitions by character, a failure link to the state for the longest proper suffix
+        of its string that is also a state, and the terms that end at it, including those of its failure states.
+        """
+        self.terms = frozenset(terms)
+        self._transitions: List[Dict[str, int]] = [{}]
+        self._failures: List[int] = [0]
+        self._outputs: List[Tuple[str, ...]] = [()]
+        for term in self.terms:
+            state = 0
+            for char in term:
+                next_state = self._transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self._transitions)
+                    self._transitions[state][char] = next_state
+                    self._transitions.append({})
+                    self._failures.append(0)
+                    self._outputs.append(())
+                state = next_state
+            self._outputs[state] = (term,)
+
+        # States are visited in breadth first order, so each state's failure state is finished before the state.
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._transitions[state].items():
+                failure = self._failures[state]
+                while failure and char not in self._transitions[failure]:
+                    failure = self._failures[failure]
+                failure = self._transitions[failure].get(char, 0)
+                self._failures[next_state] = failure
+                self._outputs[next_state] += self._outputs[failure]
+                queue.append(next_state)
+
+    @staticmethod
+    def for_languages(all_term_ranks: Dict[str, Dict[str, int]],
+                      languages: Iterable[str] = SPACELESS_LANGUAGES) -> "SubstringTermMatcher":
+        """Returns a matcher for the terms without ASCII characters of those languages that are in all_term_ranks."""
+        languages = [lang for lang in languages if lang in all_term_ranks]
+        return SubstringTermMatcher(term for lang in languages for term in all_term_ranks[lang]
+                                    if term and not any(char.isascii() for char in term))
+
+    def count_terms(self, text: str) -> Dict[str, int]:
+        """Returns the number of occurrences of each term in the text, counting overlapping occurrences."""
+        transitions, failures, outputs = self._transitions, self._failures, self._outputs
+        counts: Dict[str, int] = {}
+        state = 0
+        for char in text:
+            while state and char not in transitions[state]:
+                state = failures[state]
+            state = transitions[state].get(char, 0)
+            for term in outputs[state]:
+                counts[term] = counts.get(term, 0) + 1
+        return counts
+
+    def expand_term_counts(self, term_counts: Dict[str, int]) -> Dict[str, int]:
+        """Returns the token counts with each token that is not all ASCII, and contains any terms, replaced by the
+        counts of those terms. The order of the tokens is kept, with found terms in place of their tokens."""
+        if all(token.isascii() for token in term_counts):
+            return term_counts
+        expanded: Dict[str, int] = {}
+        for token, count in term_counts.items():
+            found = None if token.isascii() else self.count_terms(token)
+            if found:
+                for term, term_count in found.items():
+                    expanded[term] = expanded.get(term, 0) + term_count * count
+            else:
+                expanded[token] = expanded.get(token, 0) + count
+        return expanded
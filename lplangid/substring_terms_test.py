@@ -0,0 +1,49 @@
+import random
+
+from lplangid import language_classifier as lc
+from lplangid.language_classifier_test import TEST_TEXTS
+from lplangid.substring_terms import SubstringTermMatcher
+
+
+def naive_count_terms(terms, text):
+    counts = {}
+    for start in range(len(text)):
+        for end in range(start + 1, len(text) + 1):
+            if text[start:end] in terms:
+                counts[text[start:end]] = counts.get(text[start:end], 0) + 1
+    return counts
+
+
+def test_count_terms_finds_overlapping_occurrences():
+    matcher = SubstringTermMatcher(["he", "she", "his", "hers", "日本", "本", "日本語"])
+    assert matcher.count_terms("ushers") == {"she": 1, "he": 1, "hers": 1}
+    assert matcher.count_terms("日本語の本") == {"本": 2, "日本": 1, "日本語": 1}
+    assert matcher.count_terms("") == {}
+
+
+def test_count_terms_matches_naive_search():
+    rng = random.Random(5)
+    terms = {"".join(rng.choices("abc", k=rng.randint(1, 4))) for _ in range(20)}
+    matcher = SubstringTermMatcher(terms)
+    for _ in range(500):
+        text = "".join(rng.choices("abcd", k=rng.randint(0, 30)))
+        assert matcher.count_terms(text) == naive_count_terms(terms, text)
+
+
+def test_expand_term_counts():
+    matcher = SubstringTermMatcher(["谢谢", "北京"])
+    assert matcher.expand_term_counts({"ok": 2, "谢谢你去北京": 2, "привет": 1}) == {
+        "ok": 2, "谢谢": 2, "北京": 2, "привет": 1}
+
+
+def test_classifier_with_substring_terms():
+    classifier = lc.RRCLanguageClassifier.default_instance()
+    kanji_text = "東京大学"
+    assert classifier.get_winner(kanji_text) is None
+    classifier.enable_substring_terms()
+    assert "東京" in classifier.substring_matcher.terms
+    assert classifier.get_winner(kanji_text) == "ja"
+    for text, expected in TEST_TEXTS:
+        assert classifier.get_winner(text) == expected
+    classifier.disable_substring_terms()
+    assert classifier.get_winner(kanji_text) is None
@@ -1,4 +1,10 @@
+import random
+import re
+import string
+from typing import List
+
 from lplangid import tokenizer
+from lplangid.language_classifier_test import TEST_TEXTS
 
 
 def test_tokenize_fast():
@@ -17,3 +23,49 @@ def test_tokenize_url():
 def test_remove_html():
     assert tokenizer.remove_html_tags("Hi <br> there") == "Hi  there"
     assert tokenizer.remove_html_tags("Oh dear < This will all be removed >") == "Oh dear "
+
+
+def reference_tokenize(input_text: str) -> List[str]:
+    """The original character-by-character tokenizer, which the faster tokenizer must match token for token."""
+    return reference_strip_most_punctuation(re.sub(re.compile("<.*?>"), "", input_text)).split()
+
+
+def reference_strip_most_punctuation(input_text: str) -> str:
+    chars = [c for c in input_text]
+    for i in range(len(chars)):
+        if chars[i] in string.punctuation:
+            if ((chars[i] in "'./?&=:")
+                    and 0 < i < len(chars) - 1 and not chars[i-1].isspace() and not chars[i+1].isspace()):
+                continue
+            chars[i] = ' '
+    return ''.join(chars)
+
+
+def test_strip_most_punctuation_keeps_length():
+    for text in ["The dog.", "U.S.A.", "a.,b", "..a", "a..", "a.?!b c", "'quoted'", ":", ""]:
+        assert len(tokenizer.strip_most_punctuation(text)) == len(text)
+    assert tokenizer.strip_most_punctuation("a.,b a./b") == "a. b a./b"
+
+
+def test_tokenize_fast_matches_reference_on_edge_cases():
+    texts = ["", " ", ".", "a.", ".a", "a.b", "a..b", "a.,b", "a,.b", "a:/?b", "x'", "'x", "a. b", "a .b",
+             "a.\u00a0b", "a.\u2003", "<", "<>", "<a>b</a>.", "a<b\nc>d", "a.<br>b", "http://x.com/?q=1&r=2.",
+             "İstanbul'da.", "ß'ẞ", "¿Qué?", "«Oui»", "日本語。", "...", "a...", "!!a!!b!!"]
+    for text in texts:
+        assert tokenizer.tokenize_fast(text) == reference_tokenize(text), text
+        assert tokenizer.tokenize_fast(text, lowercase=True) == reference_tokenize(text.lower()), text
+
+
+def test_tokenize_fast_matches_reference_on_random_texts():
+    alphabet = "ab É日\t\n\u00a0\u2003<>" + string.punctuation + "'./?&=:" * 3
+    rng = random.Random(1234)
+    for _ in range(20000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        assert tokenizer.tokenize_fast(text) == reference_tokenize(text), repr(text)
+        assert tokenizer.tokenize_fast(text, lowercase=True) == reference_tokenize(text.lower()), repr(text)
+        assert tokenizer.strip_most_punctuation(text) == reference_strip_most_punctuation(text), repr(text)
+
+
+def test_tokenize_fast_matches_reference_on_test_texts():
+    for text, _ in TEST_TEXTS:
+        assert tokenizer.tokenize_fast(text) == reference_tokenize(text)
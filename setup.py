@@ -11,11 +11,17 @@ setup(
 
     packages=['lplangid', 'training'],  # Note that 'experiments' is not included.
     include_package_data=True,
-    data_files=[('lplangid/freq_data', glob.glob('lplangid/freq_data/*.csv')),
-                ('lplangid/freq_data_bible', glob.glob('lplangid/freq_data_bible/*.csv'))],
+    # Compiled model files are included if they have been built with `python -m lplangid.model_files`. They are
+    # named explicitly, because the optional mapped models and single token results share the .lplangid extension.
+    data_files=[('lplangid/freq_data', glob.glob('lplangid/freq_data/*.csv')
+                 + glob.glob('lplangid/freq_data/compiled_model.lplangid')),
+                ('lplangid/freq_data_bible', glob.glob('lplangid/freq_data_bible/*.csv')
+                 + glob.glob('lplangid/freq_data_bible/compiled_model.lplangid'))],
 
     # No new packages are needed for running lplangid - the below are useful for development.
     # install_requires=['flake', 'pytest'],  # List new package requirements here, but please be sure you need them!
+    extras_require={'matrix': ['numpy', 'scipy']},  # Optional batch scoring backend in lplangid/matrix_scoring.py.
+    entry_points={'console_scripts': ['lplangid=lplangid.cli:main']},
 
     url='https://github.com/dwiddows/lplangid',  # Optional
     author='Dominic Widdows, Chris Brew',  # Optional
@@ -133,11 +133,9 @@ def run_wikipedia_tests(num_trials=10000, restrict_to_wiki_langs=False):
     all_term_ranks, all_char_weights = lc.prepare_scoring_tables(lc.FREQ_DATA_DIR + '_bible')
     wiki_langs = os.listdir(WIKI_TEXT_ROOT)
 
-    if restrict_to_wiki_langs:
-        all_term_ranks = {k: v for k, v in all_term_ranks.items() if k in wiki_langs}
-        all_char_weights = {k: [(lang, score) for lang, score in vals if lang in wiki_langs]
-                            for k, vals in all_char_weights.items()}
     classifier = lc.RRCLanguageClassifier(all_term_ranks, all_char_weights)
+    if restrict_to_wiki_langs:
+        classifier = classifier.restrict_to([lang for lang in wiki_langs if lang in all_term_ranks])
 
     min_line_length = 32
     correct = 0